@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+
+# Trey Rubino
+
+"""
+End-to-end loopback benchmark for the file server.
+
+Starts `src/start_server.py` against a temporary directory on localhost and drives it with concurrent
+headless clients (forked processes using `Utility` directly, no REPL). It measures:
+
+    - `get` and `put` throughput across file sizes and client counts
+    - `ls` latency across directory sizes
+    - connection setup rate (connect, `exit` round trip, close), which includes the server's fork
+    - peak RSS of the server's process tree during every case
+
+Results are written as JSON (stdout, or `--output`) together with the commit and environment, so runs
+can be compared across commits. The defaults cover the full matrix (files up to 1 GB, directories up
+to 1M entries) and take a while; `--quick` runs a small matrix in well under a minute.
+
+Files are read fully into memory on both sides, so a 1 GB case needs about 2 GB of RAM per client.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Utility.Utility import Utility
+from inc.Model.Request import Request
+from inc.Model.Response import Response
+
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+FULL = {"sizes": "1K,64K,1M,16M,256M,1G", "ls_sizes": "10,1000,100000,1000000", "clients": "1,4,16"}
+QUICK = {"sizes": "1K,64K,1M", "ls_sizes": "10,1000,10000", "clients": "1,4"}
+
+def parse_size(text: str) -> int:
+    """
+    Parses a size such as `64K` or `1G` into bytes.
+    """
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1] if text and text[-1] in UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * UNITS[unit])
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of a list of numbers (0 for an empty list).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def latency_summary(latencies: list) -> dict:
+    """
+    Summarizes per-operation latencies, in seconds.
+    """
+    return {"ops": len(latencies),
+            "mean_s": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50_s": percentile(latencies, 0.50),
+            "p95_s": percentile(latencies, 0.95),
+            "p99_s": percentile(latencies, 0.99),
+            "max_s": max(latencies) if latencies else 0.0}
+
+class ServerUnderTest:
+    """
+    A `start_server.py` process serving a temporary directory, with RSS sampling of its process tree.
+    """
+
+    def __init__(self, root: str, extra_args: list = None):
+        self.root = root
+        self.port = self._free_port()
+        self.process = subprocess.Popen([sys.executable, os.path.join(project_root, "src", "start_server.py"),
+                                         "-p", str(self.port), "-d", root] + (extra_args or []),
+                                        cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                        start_new_session=True)
+        deadline = time.time() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port)).close()
+                break
+            except OSError:
+                if time.time() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("Server did not start")
+                time.sleep(0.05)
+        self.peak_rss = 0
+        self.sampling = False
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    def rss(self) -> int:
+        """
+        Sums the resident set size of the server and all of its descendants, from /proc.
+        """
+        parents = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", "r") as file:
+                    fields = file.read().rsplit(")", 1)[1].split()
+                parents[int(entry)] = (int(fields[1]), int(fields[21]))     # ppid, rss in pages
+            except (OSError, IndexError, ValueError):
+                continue
+        tree, frontier = set(), [self.process.pid]
+        while frontier:
+            pid = frontier.pop()
+            tree.add(pid)
+            frontier += [child for child, (ppid, _) in parents.items() if ppid == pid and child not in tree]
+        return sum(parents[pid][1] for pid in tree if pid in parents) * os.sysconf("SC_PAGE_SIZE")
+
+    def start_sampling(self, interval: float = 0.1) -> None:
+        self.peak_rss = self.rss()
+        self.sampling = True
+
+        def sample():
+            while self.sampling:
+                self.peak_rss = max(self.peak_rss, self.rss())
+                time.sleep(interval)
+
+        self.sampler = threading.Thread(target=sample, daemon=True)
+        self.sampler.start()
+
+    def stop_sampling(self) -> int:
+        self.sampling = False
+        self.sampler.join()
+        return self.peak_rss
+
+    def stop(self) -> None:
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)     # the server's SIGINT handler waits 5 seconds
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+def client_loop(port: int, work, duration: float, barrier, results, index: int, codec: str) -> None:
+    """
+    Body of one headless client process: runs `work(utility, conn)` until `duration` has elapsed
+    (at least once) and reports its latencies and bytes moved.
+    """
+    try:
+        utility = Utility()
+        conn = socket.create_connection(("127.0.0.1", port))
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if codec != "json":
+            utility.negotiate(conn, [codec])
+        barrier.wait()
+        latencies, moved = [], 0
+        end = time.perf_counter() + duration
+        while not latencies or time.perf_counter() < end:
+            start = time.perf_counter()
+            moved += work(utility, conn)
+            latencies.append(time.perf_counter() - start)
+        utility.send_all(conn, Request(cmd="exit"))
+        utility.recv_all(conn, Response)
+        conn.close()
+        results.put((index, latencies, moved, None))
+    except Exception as e:
+        results.put((index, [], 0, str(e)))
+
+def run_clients(server: ServerUnderTest, clients: int, work, duration: float, codec: str = "json") -> dict:
+    """
+    Runs `clients` concurrent client processes and aggregates their results.
+    """
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(clients + 1)
+    results = context.Queue()
+    processes = [context.Process(target=client_loop, args=(server.port, work, duration, barrier, results, i, codec))
+                 for i in range(clients)]
+    for process in processes:
+        process.start()
+    server.start_sampling()
+    barrier.wait()
+    start = time.perf_counter()
+    collected = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    peak_rss = server.stop_sampling()
+
+    errors = [error for _, _, _, error in collected if error]
+    latencies = [latency for _, values, _, _ in collected for latency in values]
+    moved = sum(value for _, _, value, _ in collected)
+    summary = latency_summary(latencies)
+    summary.update({"clients": clients, "elapsed_s": elapsed, "bytes": moved,
+                    "throughput_bytes_per_s": moved / elapsed if elapsed else 0.0,
+                    "ops_per_s": len(latencies) / elapsed if elapsed else 0.0,
+                    "server_rss_peak_bytes": peak_rss, "errors": errors})
+    return summary
+
+def write_file(path: str, size: int) -> None:
+    """
+    Writes `size` bytes of random data, one megabyte at a time.
+    """
+    block = os.urandom(min(size, 1024 * 1024))
+    with open(path, "wb") as file:
+        remaining = size
+        while remaining > 0:
+            file.write(block[:remaining])
+            remaining -= len(block)
+
+def bench_transfers(server: ServerUnderTest, sizes: list, clients_list: list, duration: float, scratch: str,
+                    codec: str = "json") -> list:
+    """
+    `get` and `put` throughput for every file size and client count.
+    """
+    results = []
+    data = os.path.join(server.root, "data")
+    os.makedirs(data, exist_ok=True)
+    for size in sizes:
+        name = f"f-{size}.bin"
+        write_file(os.path.join(data, name), size)
+        source = os.path.join(scratch, "source")
+        os.makedirs(source, exist_ok=True)
+        shutil.copyfile(os.path.join(data, name), os.path.join(source, name))
+
+        for clients in clients_list:
+            def get(utility, conn):
+                local = os.path.join(scratch, f"get-{os.getpid()}")
+                os.makedirs(local, exist_ok=True)
+                response = utility.get(conn, Request(cmd="get", remote_path=f"data/{name}", local_path=local))
+                if response.status != "success":
+                    raise RuntimeError(response.message)
+                return size
+
+            def put(utility, conn):
+                remote = os.path.join(server.root, "up", str(os.getpid()))
+                os.makedirs(remote, exist_ok=True)
+                os.chdir(source)                            # `put` sends the local path relative to the cwd
+                response = utility.put(conn, Request(cmd="put", remote_path=f"up/{os.getpid()}", local_path=name))
+                if response.status != "success":
+                    raise RuntimeError(response.message)
+                return size
+
+            for command, work in (("get", get), ("put", put)):
+                result = run_clients(server, clients, work, duration, codec)
+                result.update({"benchmark": command, "file_size": size})
+                results.append(result)
+                print(f"{command:4} {size:>12} B x{clients:<3} {result['throughput_bytes_per_s'] / 1e6:10.1f} MB/s "
+                      f"p50 {result['p50_s'] * 1e3:9.2f} ms", file=sys.stderr)
+            shutil.rmtree(os.path.join(server.root, "up"), ignore_errors=True)
+        os.remove(os.path.join(data, name))
+        shutil.rmtree(source, ignore_errors=True)
+    return results
+
+def bench_ls(server: ServerUnderTest, entries_list: list, duration: float, codec: str = "json") -> list:
+    """
+    `ls` latency for directories of every size, from one client.
+    """
+    results = []
+    for entries in entries_list:
+        directory = os.path.join(server.root, f"ls-{entries}")
+        os.makedirs(directory, exist_ok=True)
+        for i in range(entries):
+            open(os.path.join(directory, f"entry-{i:07d}"), "wb").close()
+
+        def ls(utility, conn):
+            received = utility.bytes_received
+            utility.send_all(conn, Request(cmd="ls", remote_path=f"ls-{entries}"))
+            response = utility.recv_all(conn, Response)
+            if response.status != "success":
+                raise RuntimeError(response.message)
+            return utility.bytes_received - received
+
+        result = run_clients(server, 1, ls, duration, codec)
+        result.update({"benchmark": "ls", "entries": entries,
+                       "response_bytes": result["bytes"] // result["ops"] if result["ops"] else 0})
+        results.append(result)
+        print(f"ls   {entries:>12} entries p50 {result['p50_s'] * 1e3:9.2f} ms", file=sys.stderr)
+        shutil.rmtree(directory)
+    return results
+
+def bench_connections(server: ServerUnderTest, clients_list: list, duration: float) -> list:
+    """
+    Connection setup rate: each operation connects, completes an `exit` round trip and closes.
+    """
+    results = []
+
+    def connect(utility, conn):
+        with socket.create_connection(("127.0.0.1", server.port)) as fresh:
+            session = Utility()
+            session.send_all(fresh, Request(cmd="exit"))
+            session.recv_all(fresh, Response)
+        return 0
+
+    for clients in clients_list:
+        result = run_clients(server, clients, connect, duration)
+        result.update({"benchmark": "connect"})
+        results.append(result)
+        print(f"conn x{clients:<3} {result['ops_per_s']:10.1f} conn/s p50 {result['p50_s'] * 1e3:9.2f} ms", file=sys.stderr)
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=project_root,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Loopback benchmark for the file server")
+    parser.add_argument("--quick", action="store_true", help="Run a small matrix (sizes up to 1M, directories up to 10000 entries)")
+    parser.add_argument("--sizes", type=str, default=None, help=f"Comma separated file sizes for get/put (default {FULL['sizes']})")
+    parser.add_argument("--ls-sizes", type=str, default=None, help=f"Comma separated directory sizes for ls (default {FULL['ls_sizes']})")
+    parser.add_argument("--clients", type=str, default=None, help=f"Comma separated concurrent client counts (default {FULL['clients']})")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds each case runs for (every client completes at least one operation)")
+    parser.add_argument("--only", type=str, default="transfer,ls,connect", help="Comma separated benchmarks to run")
+    parser.add_argument("--codec", type=str, default="json", help="Message codec the clients negotiate (json or binary)")
+    parser.add_argument("--server-args", type=str, default="", help="Extra arguments for start_server.py")
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    matrix = QUICK if args.quick else FULL
+    sizes = [parse_size(size) for size in (args.sizes or matrix["sizes"]).split(",")]
+    ls_sizes = [parse_size(size) for size in (args.ls_sizes or matrix["ls_sizes"]).split(",")]
+    clients = [int(count) for count in (args.clients or matrix["clients"]).split(",")]
+    only = set(args.only.split(","))
+
+    root = tempfile.mkdtemp(prefix="fileserver-bench-root-")
+    scratch = tempfile.mkdtemp(prefix="fileserver-bench-client-")
+    server = ServerUnderTest(root, args.server_args.split())
+    try:
+        idle_rss = server.rss()
+        results = []
+        if "transfer" in only:
+            results += bench_transfers(server, sizes, clients, args.duration, scratch, args.codec)
+        if "ls" in only:
+            results += bench_ls(server, ls_sizes, args.duration, args.codec)
+        if "connect" in only:
+            results += bench_connections(server, clients, args.duration)
+    finally:
+        server.stop()
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {"suite": "loopback",
+              "commit": git_commit(),
+              "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "cpus": os.cpu_count(),
+              "config": {"sizes": sizes, "ls_sizes": ls_sizes, "clients": clients, "duration_s": args.duration,
+                         "codec": args.codec, "server_args": args.server_args},
+              "server_rss_idle_bytes": idle_rss,
+              "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
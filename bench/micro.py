@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+# Trey Rubino
+
+"""
+Micro-benchmarks for the hot pure-Python paths, checked against a stored baseline.
+
+Cases cover `CustomProtocol.encode` and `CustomProtocol.decode` (including the `Content(**item)`
+reconstruction), the same for the binary codec, `Utility.recv_all` framing over an in-memory socket, and `Utility.ls` on synthetic
+trees. Every case is timed with `timeit`.
+
+Each timing is divided by a fixed calibration workload timed alternately with it, and the median ratio
+is compared, so a baseline recorded on one machine remains meaningful on a faster or slower or busier
+one. A case regresses when its ratio exceeds the baseline's by more than its tolerance (it is measured
+a second time before being reported); the script then exits with status 1, so protocol and listing
+changes can be gated on performance as well as correctness:
+
+    python3 bench/micro.py                  # compare against bench/baselines/micro.json
+    python3 bench/micro.py --update         # record a new baseline after an intended change
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import timeit
+import argparse
+import platform
+import tempfile
+import subprocess
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Utility.Utility import Utility
+from inc.Model.CustomProtocol import CustomProtocol
+from inc.Model.Request import Request
+from inc.Model.Response import Response, Content
+from inc.Model.Codec import CODECS
+
+DEFAULT_BASELINE = os.path.join(project_root, "bench", "baselines", "micro.json")
+DEFAULT_TOLERANCE = 0.25
+
+class FakeSocket:
+    """
+    In-memory socket replaying scripted segments. The first segment is readable immediately and every
+    `sendall` releases the next one, like a peer that only sends a payload after the acknowledgement.
+    """
+
+    def __init__(self, segments: list):
+        self.segments = list(segments)
+        self.buffer = memoryview(self.segments.pop(0)) if self.segments else memoryview(b"")
+        self.sent = 0
+
+    def recv(self, size: int) -> bytes:
+        chunk = self.buffer[:size].tobytes()
+        self.buffer = self.buffer[len(chunk):]
+        return chunk
+
+    def recv_into(self, buffer, size: int = 0) -> int:
+        chunk = self.recv(size or len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+    def sendall(self, data: bytes) -> None:
+        self.sent += len(data)
+        if self.segments:
+            self.buffer = memoryview(self.buffer.tobytes() + self.segments.pop(0))
+
+def listing(entries: int) -> Response:
+    """
+    An `ls` response with `entries` synthetic entries.
+    """
+    return Response(status="success", contents=[Content(mode="-rw-r--r--", nlink=1, user="user", group="group",
+                                                        size=i * 37, mtime="2024-11-26 12:00", name=f"file-{i:06d}.txt")
+                                                for i in range(entries)])
+
+def calibration():
+    """
+    Fixed workload that exercises the same interpreter paths as the cases (JSON, dicts, small objects).
+    """
+    data = [{"name": f"entry-{i}", "size": i, "mode": "-rw-r--r--"} for i in range(200)]
+    return len(json.loads(json.dumps(data)))
+
+def build_cases(scratch: str) -> dict:
+    """
+    Returns {name: (callable, tolerance)} for every case. Setup work happens here, outside the timings.
+    """
+    cases = {}
+
+    request = Request(cmd="get", options=["-v"], remote_path="some/remote/file.txt", local_path=".")
+    cases["encode_request"] = (request.encode, DEFAULT_TOLERANCE)
+    for entries in (10, 1000):
+        response = listing(entries)
+        cases[f"encode_ls_response_{entries}"] = (response.encode, DEFAULT_TOLERANCE)
+
+    binary = CODECS["binary"]
+    for entries in (10, 1000):
+        response = listing(entries)
+        encoded = binary.encode(response)
+        cases[f"encode_binary_ls_response_{entries}"] = (lambda response=response: binary.encode(response), DEFAULT_TOLERANCE)
+        cases[f"decode_binary_ls_response_{entries}"] = (lambda encoded=encoded: Response.from_dict(binary.decode(encoded)[0], Response),
+                                                         DEFAULT_TOLERANCE)
+
+    request_bytes = request.encode()
+    cases["decode_request"] = (lambda: CustomProtocol.decode(request_bytes, Request), DEFAULT_TOLERANCE)
+    for entries in (10, 1000):
+        encoded = listing(entries).encode()
+        cases[f"decode_ls_response_{entries}"] = (lambda encoded=encoded: CustomProtocol.decode(encoded, Response),
+                                                  DEFAULT_TOLERANCE)
+
+    encoded_listing = listing(1000).encode()
+    receiver = Utility()                        # every message is consumed whole, so no state carries over
+
+    def recv_listing():
+        receiver.recv_all(FakeSocket([encoded_listing]), Response)
+    cases["recv_all_ls_response_1000"] = (recv_listing, DEFAULT_TOLERANCE)
+
+    for size in (64 * 1024, 1024 * 1024):
+        header = Request(cmd="put", remote_path=".", local_path="upload.bin", size=size).encode()
+        payload = os.urandom(size)
+
+        def recv_upload(header=header, payload=payload):
+            receiver.recv_all(FakeSocket([header, payload]), Request)
+        cases[f"recv_all_put_{size // 1024}k"] = (recv_upload, DEFAULT_TOLERANCE)
+
+    for entries in (100, 2000):
+        directory = os.path.join(scratch, f"tree-{entries}")
+        os.makedirs(directory)
+        for i in range(entries):
+            with open(os.path.join(directory, f"file-{i:06d}.txt"), "wb") as file:
+                file.write(b"x" * (i % 512))
+        utility = Utility()
+        ls_request = Request(cmd="ls", remote_path=directory)
+        cases[f"ls_{entries}"] = (lambda utility=utility, ls_request=ls_request: utility.ls(ls_request),
+                                  0.5)       # touches the file system, so it is noisier
+    return cases
+
+def loops(timer: timeit.Timer, budget: float) -> int:
+    """
+    Number of calls that take roughly `budget` seconds.
+    """
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= budget / 4 or number >= 1 << 20:
+            break
+        number *= 2
+    return max(1, int(number * budget / max(elapsed, 1e-9)))
+
+def measure(function, repeat: int, budget: float) -> tuple:
+    """
+    Times `function` against the calibration workload, alternating the two `repeat` times so both see
+    the same machine conditions.
+
+    Returns:
+        tuple: Best time per call in seconds, and the median ratio of case time to calibration time.
+    """
+    function()                                  # warm caches and lazy imports
+    timer, reference = timeit.Timer(function), timeit.Timer(calibration)
+    number, reference_number = loops(timer, budget), loops(reference, budget / 2)
+    times, ratios = [], []
+    for _ in range(repeat):
+        unit = reference.timeit(reference_number) / reference_number
+        seconds = timer.timeit(number) / number
+        times.append(seconds)
+        ratios.append(seconds / unit)
+    ratios.sort()
+    return min(times), ratios[len(ratios) // 2]
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=project_root,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def regressed(name: str, result: dict, baseline: dict, tolerance: float = None) -> bool:
+    """
+    Whether a measured case is slower than its baseline by more than the allowed tolerance.
+    """
+    if name not in baseline:
+        return False
+    if tolerance is None:
+        tolerance = baseline[name].get("tolerance", DEFAULT_TOLERANCE)
+    return result["normalized"] > baseline[name]["normalized"] * (1 + tolerance)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks with regression baselines")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE, help="Baseline file to compare against or update")
+    parser.add_argument("--update", action="store_true", help="Record the measured timings as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=None, help="Override every case's allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--only", type=str, default=None, help="Comma separated case name prefixes to run")
+    parser.add_argument("--repeat", type=int, default=7, help="Timing repeats per case")
+    parser.add_argument("--budget", type=float, default=0.1, help="Approximate seconds per repeat")
+    parser.add_argument("--output", type=str, default=None, help="Also write the measured results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)["cases"]
+    elif not args.update:
+        print(f"No baseline at {args.baseline}; run with --update to record one.")
+        return 1
+
+    scratch = tempfile.mkdtemp(prefix="fileserver-micro-")
+    try:
+        cases = build_cases(scratch)
+        if args.only:
+            prefixes = tuple(args.only.split(","))
+            cases = {name: case for name, case in cases.items() if name.startswith(prefixes)}
+        measured = {}
+        for name, (function, tolerance) in cases.items():
+            seconds, normalized = measure(function, args.repeat, args.budget)
+            measured[name] = {"seconds": seconds, "normalized": normalized, "tolerance": tolerance}
+            if not args.update and regressed(name, measured[name], baseline, args.tolerance):
+                seconds, normalized = measure(function, args.repeat, args.budget)   # rule out a noisy moment
+                if normalized < measured[name]["normalized"]:
+                    measured[name].update(seconds=seconds, normalized=normalized)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {"suite": "micro", "commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "python": platform.python_version(), "platform": platform.platform(), "cases": measured}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.update:
+        if args.only:                                   # keep the cases that were not run
+            report["cases"] = dict(baseline, **measured)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baseline written to {args.baseline} ({len(report['cases'])} cases)")
+        return 0
+
+    regressions = 0
+    print(f"{'case':30} {'time':>12} {'baseline':>12} {'change':>8}")
+    for name, result in measured.items():
+        if name not in baseline:
+            print(f"{name:30} {result['seconds'] * 1e6:10.1f}us {'(new)':>12}")
+            continue
+        change = result["normalized"] / baseline[name]["normalized"] - 1
+        verdict = "REGRESSION" if regressed(name, result, baseline, args.tolerance) else ""
+        regressions += bool(verdict)
+        print(f"{name:30} {result['seconds'] * 1e6:10.1f}us {baseline[name]['seconds'] * 1e6:10.1f}us {change:+7.1%} {verdict}")
+    if regressions:
+        print(f"{regressions} case(s) regressed beyond tolerance.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
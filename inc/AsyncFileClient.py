@@ -0,0 +1,354 @@
+# Trey Rubino
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional, Type
+
+from .Model.CustomProtocol import CustomProtocol
+from .Model.Request import Request
+from .Model.Response import Response, Content
+from .Model.Codec import JSON, CODECS
+from .Model.Handshake import PROTOCOL_VERSION, CAPABILITIES, supported
+from .FileClient import FileClientError, ConnectionLostError, raise_for_response, require
+
+class AsyncConnection:
+    """
+    One session with the server over asyncio streams, framed exactly like `Utility.send_all`/`recv_message`:
+    a message in the connection's codec, then, for transfers, an acknowledgement and the raw payload.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.buffer = b""                                       # bytes read past the end of the last message
+        self.cwd = None                                         # remote working directory, from `pwd`
+        self.codec = JSON                                       # switched by `negotiate`
+        self.capabilities = None                                # agreed by `negotiate`
+
+    @classmethod
+    async def open(cls, host: str, port: int) -> "AsyncConnection":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, obj: CustomProtocol) -> None:
+        self.writer.write(obj.prepare(self.codec))
+        await self.writer.drain()
+
+    async def send_payload(self, data: bytes) -> None:
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def recv(self, obj_type: Type[CustomProtocol]) -> CustomProtocol:
+        """
+        Reads one message, keeping any bytes after it for the next read.
+        """
+        buffer, self.buffer = self.buffer, b""
+        while True:
+            message = self.codec.decode(buffer) if buffer else None   # same framing as Utility.recv_message
+            if message is not None:
+                raw_data, self.buffer = message
+                return obj_type.from_dict(raw_data, obj_type)
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                raise ConnectionError("Connection closed by peer.")
+            buffer += chunk
+
+    async def recv_payload(self, size: int) -> bytes:
+        """
+        Reads exactly `size` payload bytes.
+        """
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        if len(data) < size:
+            try:
+                data += await self.reader.readexactly(size - len(data))
+            except asyncio.IncompleteReadError:
+                raise ConnectionError("Connection lost while receiving binary data.")
+        return data
+
+    async def negotiate(self) -> Response:
+        """
+        Offers the server every known codec and announces this side's capabilities on a `pwd`, like
+        `Utility.negotiate`.
+        """
+        response = await self.request(Request(cmd="pwd", codecs=list(CODECS), protocol=PROTOCOL_VERSION,
+                                              capabilities=list(CAPABILITIES)))
+        if response.codec in CODECS:
+            self.codec = CODECS[response.codec]
+        if response.status == "success":
+            self.capabilities = set(response.capabilities or [])
+        return response
+
+    async def request(self, request: Request) -> Response:
+        await self.send(request)
+        return await self.recv(Response)
+
+    def abort(self) -> None:
+        """
+        Drops the connection without ending the session, for a stream left in an unknown state.
+        """
+        self.writer.close()
+
+    async def close(self) -> None:
+        try:
+            await self.request(Request(cmd="exit"))
+        except Exception:
+            pass
+        finally:
+            self.writer.close()
+
+class AsyncFileClient:
+    """
+    asyncio client for the file server, wire compatible with `fileserver` through the `inc/Model` classes.
+
+    Operations can be awaited concurrently: each one borrows a connection from a pool of at most
+    `max_connections` sessions, so up to that many run in parallel on the server and the rest wait for a
+    free connection. Every operation takes a `timeout` (defaulting to the client's). An operation that
+    times out or is cancelled drops its connection, since the stream may be mid-message, and a new one is
+    opened when needed. Results and errors are the same as `FileClient`'s.
+
+    Example:
+        async with AsyncFileClient("localhost", 12345) as client:
+            listings = await asyncio.gather(*(client.ls(d) for d in ["a", "b", "c"]))
+    """
+
+    def __init__(self, host: str, port: int, max_connections: int = 4, timeout: Optional[float] = None):
+        """
+        Configures the client. Connections are opened on first use, inside the running event loop.
+
+        Args:
+            host (str): Server host name.
+            port (int): Server port.
+            max_connections (int): Most connections open at once.
+            timeout (float, optional): Default per-operation timeout in seconds, None for no limit.
+        """
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+        self.max_connections = max(1, max_connections)
+        self.cwd = None                                         # remote working directory, None until a `cd`
+        self.idle = []                                          # most recently used last, it is the warmest
+        self.slots = None                                       # created in the event loop that uses it
+        self.closed = False
+        self.legacy = False                                     # the server predates the handshake, see `_open`
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def _open(self) -> AsyncConnection:
+        """
+        Opens a connection and sends the handshake, like `FileClient._hello`: a server from before the
+        handshake drops the connection, which is then opened again without the hello, as are later ones.
+        """
+        connection = await self._connect()
+        try:
+            response = None
+            if not self.legacy:
+                try:
+                    response = await connection.negotiate()
+                except ConnectionError:
+                    connection.abort()
+                    self.legacy = True
+                    connection = await self._connect()
+            if response is None:
+                connection.capabilities = set()
+                response = await connection.request(Request(cmd="pwd"))
+            connection.cwd = raise_for_response(response).message
+        except BaseException:
+            connection.abort()
+            raise
+        return connection
+
+    async def _connect(self) -> AsyncConnection:
+        try:
+            return await AsyncConnection.open(self.host, self.port)
+        except OSError as e:
+            raise ConnectionLostError(f"Could not connect to {self.host}:{self.port}: {e}", "ERR_CONNECTION_LOST")
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Borrows a connection from the pool, in this client's working directory.
+
+        Yields:
+            AsyncConnection: The borrowed connection.
+        """
+        if self.closed:
+            raise FileClientError("Client is closed")
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_connections)
+        async with self.slots:
+            connection = self.idle.pop() if self.idle else await self._open()
+            try:
+                if self.cwd is not None and connection.cwd != self.cwd:    # follow the client's `cd`
+                    raise_for_response(await connection.request(
+                        Request(cmd="cd", remote_path=os.path.relpath(self.cwd, connection.cwd))))
+                    connection.cwd = self.cwd
+                yield connection
+            except (OSError, ValueError, ConnectionLostError, asyncio.CancelledError, asyncio.TimeoutError):
+                connection.abort()
+                raise
+            except BaseException:                              # a complete error reply, the stream is in step
+                self._release(connection)
+                raise
+            else:
+                self._release(connection)
+
+    def _release(self, connection: AsyncConnection) -> None:
+        if self.closed:
+            connection.abort()
+        else:
+            self.idle.append(connection)
+
+    async def _run(self, operation, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        return await asyncio.wait_for(operation, timeout) if timeout is not None else await operation
+
+    async def _request(self, cmd: str, path: Optional[str] = None, options: Optional[list] = None) -> Response:
+        return await self._send(Request(cmd=cmd, options=options or [], remote_path=path))
+
+    async def _send(self, request: Request) -> Response:
+        async with self.connection() as connection:
+            require(connection.capabilities, request.cmd)
+            return raise_for_response(await connection.request(request))
+
+    async def ls(self, path: str = ".", timeout: Optional[float] = None) -> List[Content]:
+        """
+        Lists a remote directory, or describes a remote file.
+        """
+        return (await self._run(self._request("ls", path), timeout)).contents
+
+    async def cat(self, path: str, timeout: Optional[float] = None) -> str:
+        """
+        Returns the contents of a remote text file.
+        """
+        return (await self._run(self._request("cat", path), timeout)).message
+
+    async def mkdir(self, path: str, timeout: Optional[float] = None) -> None:
+        """
+        Creates a remote directory.
+        """
+        await self._run(self._request("mkdir", path), timeout)
+
+    async def rm(self, path: str, recursive: bool = False, timeout: Optional[float] = None) -> None:
+        """
+        Removes a remote file, or a directory if `recursive` is set.
+        """
+        await self._run(self._request("rm", path, ["-r"] if recursive else None), timeout)
+
+    async def cp(self, source: str, destination: str, recursive: bool = False, timeout: Optional[float] = None) -> None:
+        """
+        Copies a remote file, or a directory if `recursive` is set, on the server.
+        """
+        request = Request(cmd="cp", options=["-r"] if recursive else [], remote_path=source, local_path=destination)
+        await self._run(self._send(request), timeout)
+
+    async def mv(self, source: str, destination: str, timeout: Optional[float] = None) -> None:
+        """
+        Moves or renames a remote file or directory on the server.
+        """
+        await self._run(self._send(Request(cmd="mv", remote_path=source, local_path=destination)), timeout)
+
+    async def pwd(self, timeout: Optional[float] = None) -> str:
+        """
+        Returns the remote working directory.
+        """
+        return (await self._run(self._request("pwd"), timeout)).message
+
+    async def cd(self, path: str, timeout: Optional[float] = None) -> str:
+        """
+        Changes the remote working directory of this client (every pooled connection follows).
+        """
+        async def cd():
+            async with self.connection() as connection:
+                raise_for_response(await connection.request(Request(cmd="cd", remote_path=path)))
+                cwd = raise_for_response(await connection.request(Request(cmd="pwd"))).message
+                connection.cwd = self.cwd = cwd
+            return cwd
+        return await self._run(cd(), timeout)
+
+    async def batch(self, requests: List[Request], stop_on_error: bool = False, timeout: Optional[float] = None) -> List[Response]:
+        """
+        Runs several commands in one round trip, like `FileClient.batch`.
+        """
+        async def batch():
+            async with self.connection() as connection:
+                if supported(connection.capabilities, "batch"):
+                    reply = await connection.request(Request(cmd="batch", options=["-e"] if stop_on_error else [],
+                                                             requests=list(requests)))
+                    if reply.code != "ERR_BATCH":
+                        raise_for_response(reply)
+                    responses = reply.responses or []
+                else:                                           # an older server, one round trip each
+                    for request in requests:
+                        require(connection.capabilities, request.cmd)
+                    responses = []
+                    for request in requests:
+                        responses.append(await connection.request(request))
+                        if stop_on_error and responses[-1].status != "success":
+                            break
+                if any(request.cmd == "cd" for request in requests):   # the session moved, follow it
+                    connection.cwd = self.cwd = raise_for_response(await connection.request(Request(cmd="pwd"))).message
+            return responses
+        return await self._run(batch(), timeout)
+
+    async def get(self, path: str, local_dir: str = ".", timeout: Optional[float] = None) -> str:
+        """
+        Downloads a remote file into a local directory.
+
+        Returns:
+            str: The local path of the downloaded file.
+        """
+        local_dir = os.path.abspath(local_dir)
+
+        async def get():
+            async with self.connection() as connection:
+                await connection.send(Request(cmd="get", remote_path=path, local_path=local_dir))
+                reply = raise_for_response(await connection.recv(Response))    # nothing follows an error
+                data = b""
+                if reply.code != "NOT_MODIFIED":
+                    await connection.send(Response(status="success", message="Awaiting binary data..."))
+                    data = await connection.recv_payload(reply.size or 0)
+                raise_for_response(await connection.recv(Response))
+            target = os.path.join(local_dir, reply.contents[0].name if reply.contents else os.path.basename(path))
+            await asyncio.get_running_loop().run_in_executor(None, _write_file, target, data)
+            return target
+        return await self._run(get(), timeout)
+
+    async def put(self, local_path: str, remote_dir: str = ".", timeout: Optional[float] = None) -> str:
+        """
+        Uploads a local file into a remote directory, keeping its name.
+
+        Returns:
+            str: The remote path of the uploaded file, relative to the working directory.
+        """
+        name = os.path.basename(local_path)
+
+        async def put():
+            data = await asyncio.get_running_loop().run_in_executor(None, _read_file, local_path)
+            async with self.connection() as connection:
+                await connection.send(Request(cmd="put", remote_path=remote_dir, local_path=name, size=len(data)))
+                raise_for_response(await connection.recv(Response))
+                await connection.send_payload(data)
+                raise_for_response(await connection.recv(Response))
+            return os.path.join(remote_dir, name)
+        return await self._run(put(), timeout)
+
+    async def close(self) -> None:
+        """
+        Ends every idle session. Connections still borrowed are dropped when they are returned.
+        """
+        self.closed = True
+        idle, self.idle = self.idle, []
+        await asyncio.gather(*(connection.close() for connection in idle), return_exceptions=True)
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as file:
+        file.write(data)
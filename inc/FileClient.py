@@ -0,0 +1,423 @@
+# Trey Rubino
+
+import os
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+from .Model.Request import Request
+from .Model.Response import Response, Content
+from .Model.Handshake import supported
+from .Utility.Utility import Utility
+
+class FileClientError(Exception):
+    """
+    A request that the server (or the client side of a transfer) answered with an error.
+
+    Attributes:
+        code (Optional[str]): The `Response.code`, e.g. "ERR_FILE_NOT_FOUND".
+        message (str): The `Response.message`.
+    """
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class NotFoundError(FileClientError):
+    """The file or directory does not exist."""
+
+class PermissionDeniedError(FileClientError):
+    """The path is outside the served directory or not accessible."""
+
+class AlreadyExistsError(FileClientError):
+    """The directory to create already exists."""
+
+class IsDirectoryError(FileClientError):
+    """A file operation was given a directory."""
+
+class ConnectionLostError(FileClientError):
+    """The connection failed or the server shut down mid-request."""
+
+class UnsupportedError(FileClientError):
+    """The server did not agree to the command in the handshake; it is too old to answer it."""
+
+ERRORS = {
+    "ERR_FILE_NOT_FOUND": NotFoundError,
+    "ERR_DIR_NOT_FOUND": NotFoundError,
+    "ERR_INVALID_DIR": NotFoundError,
+    "ERR_INVALID_PATH": NotFoundError,
+    "ERR_PERMISSION_DENIED": PermissionDeniedError,
+    "ERR_DIR_EXISTS": AlreadyExistsError,
+    "ERR_IS_DIRECTORY": IsDirectoryError,
+    "ERR_CONNECTION_LOST": ConnectionLostError,
+    "ERR_UNSUPPORTED": UnsupportedError,
+}
+
+def raise_for_response(response: Response) -> Response:
+    """
+    Returns a successful response, or raises the `FileClientError` matching its code.
+    """
+    if response.status == "success":
+        return response
+    if response.status == "shutdown":
+        raise ConnectionLostError(response.message, "ERR_CONNECTION_LOST")
+    if response.code in ("ERR_GET_CLIENT", "ERR_PUT_CLIENT"):
+        raise ConnectionLostError(response.message, response.code)         # the transfer broke off mid-stream
+    raise ERRORS.get(response.code, FileClientError)(response.message, response.code)
+
+def require(capabilities, cmd: str) -> None:
+    """
+    Raises `UnsupportedError` unless a connection with the agreed `capabilities` may send `cmd`.
+    """
+    if not supported(capabilities, cmd):
+        raise UnsupportedError(f"The server does not support {cmd}", "ERR_UNSUPPORTED")
+
+class PooledConnection:
+    """
+    One session with the server. Each has its own `Utility`, since receive buffers and byte counters
+    belong to a socket, and remembers the remote working directory its session is in.
+    """
+
+    def __init__(self, host: str, port: int, timeout: Optional[float]):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.sock = None
+        self.connect()
+        self.utility = Utility()
+        self.cwd = None                                         # remote working directory, from `pwd`
+
+    def connect(self) -> None:
+        """
+        Opens the socket, replacing the current one if there is one.
+        """
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def request(self, request: Request) -> Response:
+        """
+        Sends a request without payload and returns the reply.
+        """
+        self.utility.send_all(self.sock, request)
+        return self.utility.recv_all(self.sock, Response)
+
+    def close(self) -> None:
+        """
+        Ends the session with "exit" if possible and closes the socket.
+        """
+        try:
+            self.request(Request(cmd="exit"))
+        except Exception:
+            pass
+        finally:
+            self.sock.close()
+
+class FileClient:
+    """
+    Programmatic client for the file server.
+
+    Methods return typed results and raise `FileClientError` subclasses instead of printing. Requests run
+    on a pool of connections that is safe to share between threads: each call borrows an idle connection
+    (opening one if fewer than `max_connections` exist, otherwise waiting for one) and returns it
+    afterwards, so concurrent callers run in parallel and sequential calls reuse warm sessions instead of
+    paying a TCP connect and a server fork each time.
+
+    The remote working directory set with `cd` applies to the whole client; a pooled connection follows
+    it before its next request.
+
+    Example:
+        with FileClient("localhost", 12345) as client:
+            client.put("report.txt", "uploads")
+            names = [entry.name for entry in client.ls("uploads")]
+    """
+
+    def __init__(self, host: str, port: int, max_connections: int = 4, warm: int = 1,
+                 timeout: Optional[float] = None, cache=None):
+        """
+        Opens the first connections.
+
+        Args:
+            host (str): Server host name.
+            port (int): Server port.
+            max_connections (int): Most connections open at once.
+            warm (int): Connections opened, and checked with a `pwd` round trip, up front.
+            timeout (float, optional): Socket timeout in seconds, None to block.
+            cache (DownloadCache, optional): Download cache shared by all connections for `get`.
+        """
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+        self.cache = cache
+        self.max_connections = max(1, max_connections)
+        self.cwd = None                                         # remote working directory, None until a `cd`
+        self.idle = queue.LifoQueue()                           # most recently used first, it is the warmest
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.closed = False
+        self.legacy = False                                     # the server predates the handshake, see `_hello`
+        for _ in range(min(warm, self.max_connections)):
+            self.idle.put(self._open())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def _open(self) -> PooledConnection:
+        """
+        Opens a connection and warms it up with a `pwd` round trip, which also records where its session is
+        and switches it to the fastest codec the server knows.
+        """
+        with self.lock:
+            self.opened += 1
+        try:
+            connection = PooledConnection(self.host, self.port, self.timeout)
+        except OSError as e:
+            with self.lock:
+                self.opened -= 1
+            raise ConnectionLostError(f"Could not connect to {self.host}:{self.port}: {e}", "ERR_CONNECTION_LOST")
+        try:
+            connection.cwd = raise_for_response(self._hello(connection)).message
+        except Exception as e:
+            self._discard(connection)
+            if isinstance(e, OSError):
+                raise ConnectionLostError(f"Connection to {self.host}:{self.port} failed: {e}", "ERR_CONNECTION_LOST")
+            raise
+        connection.utility.cache = self.cache
+        return connection
+
+    def _hello(self, connection: PooledConnection) -> Response:
+        """
+        Sends the handshake on a new connection. A server from before the handshake cannot decode it and
+        drops the connection; the connection is then opened again without the hello, as are the client's
+        later ones.
+
+        Returns:
+            Response: The server's `pwd` response.
+        """
+        if not self.legacy:
+            try:
+                return connection.utility.negotiate(connection.sock)
+            except ConnectionError:
+                self.legacy = True
+                connection.connect()
+        connection.utility.skip_handshake()
+        return connection.request(Request(cmd="pwd"))
+
+    def _acquire(self) -> PooledConnection:
+        """
+        Takes an idle connection, opens a new one if the pool has room, or waits for one to be returned.
+        """
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                room = self.opened < self.max_connections
+            if room:
+                return self._open()
+            try:
+                return self.idle.get(timeout=0.1)               # recheck for room if connections get discarded
+            except queue.Empty:
+                continue
+
+    def _release(self, connection: PooledConnection) -> None:
+        if self.closed:
+            with self.lock:
+                self.opened -= 1
+            connection.close()
+        else:
+            self.idle.put(connection)
+
+    def _discard(self, connection: PooledConnection) -> None:
+        with self.lock:
+            self.opened -= 1
+        try:
+            connection.sock.close()
+        except OSError:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection from the pool, in this client's working directory.
+
+        A connection that fails mid-request is closed instead of being returned, since its stream may be
+        out of step with the server.
+
+        Yields:
+            PooledConnection: The borrowed connection.
+        """
+        if self.closed:
+            raise FileClientError("Client is closed")
+        connection = self._acquire()
+        try:
+            if self.cwd is not None and connection.cwd != self.cwd:    # follow the client's `cd`
+                raise_for_response(connection.request(Request(cmd="cd", remote_path=os.path.relpath(self.cwd, connection.cwd))))
+                connection.cwd = self.cwd
+            yield connection
+        except (OSError, ValueError, ConnectionLostError):
+            self._discard(connection)
+            raise
+        except BaseException:
+            self._release(connection)
+            raise
+        else:
+            self._release(connection)
+
+    def _request(self, cmd: str, path: Optional[str] = None, options: Optional[list] = None) -> Response:
+        with self.connection() as connection:
+            return raise_for_response(connection.request(Request(cmd=cmd, options=options or [], remote_path=path)))
+
+    def ls(self, path: str = ".") -> List[Content]:
+        """
+        Lists a remote directory, or describes a remote file.
+
+        Returns:
+            List[Content]: One entry per file, sorted by name.
+        """
+        return self._request("ls", path).contents
+
+    def cat(self, path: str) -> str:
+        """
+        Returns the contents of a remote text file.
+        """
+        return self._request("cat", path).message
+
+    def mkdir(self, path: str) -> None:
+        """
+        Creates a remote directory.
+        """
+        self._request("mkdir", path)
+
+    def rm(self, path: str, recursive: bool = False) -> None:
+        """
+        Removes a remote file, or a directory if `recursive` is set.
+        """
+        self._request("rm", path, ["-r"] if recursive else None)
+
+    def cp(self, source: str, destination: str, recursive: bool = False) -> None:
+        """
+        Copies a remote file, or a directory if `recursive` is set, on the server. A destination that is an
+        existing directory receives a copy with the source's name.
+        """
+        with self.connection() as connection:
+            require(connection.utility.capabilities, "cp")
+            raise_for_response(connection.request(Request(cmd="cp", options=["-r"] if recursive else [],
+                                                           remote_path=source, local_path=destination)))
+
+    def mv(self, source: str, destination: str) -> None:
+        """
+        Moves or renames a remote file or directory on the server.
+        """
+        with self.connection() as connection:
+            require(connection.utility.capabilities, "mv")
+            raise_for_response(connection.request(Request(cmd="mv", remote_path=source, local_path=destination)))
+
+    def pwd(self) -> str:
+        """
+        Returns the remote working directory.
+        """
+        return self._request("pwd").message
+
+    def cd(self, path: str) -> str:
+        """
+        Changes the remote working directory of this client (every pooled connection follows).
+
+        Returns:
+            str: The new remote working directory.
+        """
+        with self.connection() as connection:
+            raise_for_response(connection.request(Request(cmd="cd", remote_path=path)))
+            cwd = raise_for_response(connection.request(Request(cmd="pwd"))).message
+            connection.cwd = self.cwd = cwd
+        return cwd
+
+    def batch(self, requests: List[Request], stop_on_error: bool = False) -> List[Response]:
+        """
+        Runs several commands in one round trip. Only commands answered with a single message can be
+        batched: `ls`, `mkdir`, `rm`, `cp`, `mv`, `cat`, `pwd` and `cd`. A `cd` in the batch changes this
+        client's working directory, as `cd` does. A server without `batch` gets the commands one round
+        trip each, with the same results.
+
+        Example:
+            client.batch([Request(cmd="mkdir", remote_path=d) for d in ["a", "a/b", "a/b/c"]], stop_on_error=True)
+
+        Args:
+            requests (List[Request]): The commands, run in order.
+            stop_on_error (bool): Stop at the first command that fails.
+
+        Returns:
+            List[Response]: One response per command that ran, in order. Failed commands are reported in
+            their responses instead of raising.
+        """
+        with self.connection() as connection:
+            if connection.utility.supports("batch"):
+                reply = connection.request(Request(cmd="batch", options=["-e"] if stop_on_error else [], requests=list(requests)))
+                if reply.code != "ERR_BATCH":
+                    raise_for_response(reply)
+                responses = reply.responses or []
+            else:                                               # an older server, one round trip each
+                for request in requests:
+                    require(connection.utility.capabilities, request.cmd)
+                responses = []
+                for request in requests:
+                    responses.append(connection.request(request))
+                    if stop_on_error and responses[-1].status != "success":
+                        break
+            if any(request.cmd == "cd" for request in requests):     # the session moved, follow it
+                connection.cwd = self.cwd = raise_for_response(connection.request(Request(cmd="pwd"))).message
+        return responses
+
+    def get(self, path: str, local_dir: str = ".") -> str:
+        """
+        Downloads a remote file into a local directory.
+
+        Args:
+            path (str): The remote file.
+            local_dir (str): Existing local directory to write it to.
+
+        Returns:
+            str: The local path of the downloaded file.
+        """
+        local_dir = os.path.abspath(local_dir)
+        with self.connection() as connection:
+            raise_for_response(connection.utility.get(connection.sock, Request(cmd="get", remote_path=path, local_path=local_dir)))
+        return os.path.join(local_dir, os.path.basename(path))
+
+    def put(self, local_path: str, remote_dir: str = ".") -> str:
+        """
+        Uploads a local file into a remote directory, keeping its name.
+
+        Args:
+            local_path (str): The local file.
+            remote_dir (str): Existing remote directory to store it in.
+
+        Returns:
+            str: The remote path of the uploaded file, relative to the working directory.
+        """
+        name = os.path.basename(local_path)
+        with self.connection() as connection:
+            raise_for_response(connection.utility.put(connection.sock, Request(cmd="put", remote_path=remote_dir, local_path=name),
+                                               source=os.path.abspath(local_path)))
+        return os.path.join(remote_dir, name)
+
+    def close(self) -> None:
+        """
+        Ends every idle session. Connections still borrowed are closed when they are returned.
+        """
+        self.closed = True
+        while True:
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.opened -= 1
+            connection.close()
@@ -0,0 +1,217 @@
+# Trey Rubino
+
+import json
+import struct
+from typing import List, Optional
+
+from .Response import Content
+
+class JsonCodec:
+    """
+    The original wire format: one JSON object per message, framed by its closing brace.
+    Every peer understands it, so every connection starts with it.
+    """
+
+    name = "json"
+
+    def encode(self, obj) -> bytes:
+        """
+        Encodes a `Request` or `Response` as one framed message.
+        """
+        return obj.encode()
+
+    def decode(self, buffer: bytes) -> Optional[tuple]:
+        """
+        Splits the first message off a receive buffer.
+
+        Args:
+            buffer (bytes): Bytes received so far.
+
+        Returns:
+            tuple: The message's fields (dict) and the bytes after it, or None if the message is incomplete.
+        """
+        if not buffer.rstrip().endswith(b'}'):                  # Only try to parse once the buffer ends with '}'
+            return None
+        text = buffer.decode('utf-8').lstrip()
+        try:
+            raw_data, end = json.JSONDecoder().raw_decode(text)
+        except json.JSONDecodeError:
+            return None                                         # A '}' inside an unfinished message, keep reading
+        return raw_data, text[end:].lstrip().encode('utf-8')
+
+# Binary frames: a magic byte and the body length, then the fields as (name, tagged value) pairs.
+FRAME = struct.Struct("=BI")
+MAGIC = 0xB1
+COUNT = struct.Struct("=I")
+INT = struct.Struct("=q")
+FLOAT = struct.Struct("=d")
+
+class BinaryCodec:
+    """
+    Compact length-prefixed binary format, packed with `struct`.
+
+    Values carry a one-byte type tag: None, booleans, 64-bit integers, doubles, UTF-8 strings, raw bytes,
+    lists and dicts. `Response.contents` is stored by column instead of by entry: the string fields of all
+    entries are joined into one NUL-separated string each and the integer fields packed as arrays, so a
+    listing costs a handful of `join`/`split`/`struct` calls rather than one JSON object per entry, and
+    decoding builds `Content` objects directly. Messages are framed by their length, so no parsing is
+    needed to find where one ends.
+    """
+
+    name = "binary"
+
+    def encode(self, obj) -> bytes:
+        """
+        Encodes a `Request` or `Response` as one framed message. Fields that are None are left out, as in JSON.
+        """
+        out = []
+        fields = list(obj.to_wire().items())
+        out.append(COUNT.pack(len(fields)))
+        for key, value in fields:
+            name = key.encode('utf-8')
+            out.append(bytes((len(name),)) + name)
+            if key == "contents":
+                self._encode_contents(value, out)
+            else:
+                self._encode_value(value, out)
+        body = b"".join(out)
+        return FRAME.pack(MAGIC, len(body)) + body
+
+    def decode(self, buffer: bytes) -> Optional[tuple]:
+        """
+        Splits the first message off a receive buffer.
+
+        Returns:
+            tuple: The message's fields (dict) and the bytes after it, or None if the message is incomplete.
+
+        Raises:
+            ValueError: If the buffer does not start with a binary frame.
+        """
+        if len(buffer) < FRAME.size:
+            return None
+        magic, length = FRAME.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Malformed binary message.")
+        end = FRAME.size + length
+        if len(buffer) < end:
+            return None
+        view = memoryview(buffer)[FRAME.size:end]
+        count, = COUNT.unpack_from(view)
+        offset = COUNT.size
+        fields = {}
+        for _ in range(count):
+            size = view[offset]
+            key = bytes(view[offset + 1:offset + 1 + size]).decode('utf-8')
+            offset += 1 + size
+            fields[key], offset = self._decode_value(view, offset)
+        return fields, buffer[end:]
+
+    def _encode_value(self, value, out: list) -> None:
+        if value is None:
+            out.append(b"N")
+        elif value is True:
+            out.append(b"T")
+        elif value is False:
+            out.append(b"F")
+        elif isinstance(value, int):
+            out.append(b"i" + INT.pack(value))
+        elif isinstance(value, float):
+            out.append(b"f" + FLOAT.pack(value))
+        elif isinstance(value, str):
+            data = value.encode('utf-8')
+            out.append(b"s" + COUNT.pack(len(data)) + data)
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            out.append(b"b" + COUNT.pack(len(value)) + bytes(value))
+        elif isinstance(value, (list, tuple)):
+            out.append(b"l" + COUNT.pack(len(value)))
+            for item in value:
+                self._encode_value(item, out)
+        elif isinstance(value, dict):
+            out.append(b"m" + COUNT.pack(len(value)))
+            for key, item in value.items():
+                self._encode_value(str(key), out)
+                self._encode_value(item, out)
+        else:
+            self._encode_value(value.to_wire(), out)            # nested objects travel as dicts, as in JSON
+
+    def _encode_contents(self, contents: List[Content], out: list) -> None:
+        out.append(b"C" + COUNT.pack(len(contents)))
+        if not contents:
+            return
+        for column in ("mode", "user", "group", "mtime", "name"):
+            data = "\0".join([getattr(entry, column) for entry in contents]).encode('utf-8')
+            out.append(COUNT.pack(len(data)) + data)
+        out.append(struct.pack(f"={len(contents)}q", *[entry.nlink for entry in contents]))
+        out.append(struct.pack(f"={len(contents)}q", *[entry.size for entry in contents]))
+
+    def _decode_value(self, view: memoryview, offset: int) -> tuple:
+        tag = view[offset]
+        offset += 1
+        if tag == 0x4E:                                         # N
+            return None, offset
+        if tag == 0x54:                                         # T
+            return True, offset
+        if tag == 0x46:                                         # F
+            return False, offset
+        if tag == 0x69:                                         # i
+            return INT.unpack_from(view, offset)[0], offset + INT.size
+        if tag == 0x66:                                         # f
+            return FLOAT.unpack_from(view, offset)[0], offset + FLOAT.size
+        if tag in (0x73, 0x62):                                 # s, b
+            size, = COUNT.unpack_from(view, offset)
+            offset += COUNT.size
+            data = bytes(view[offset:offset + size])
+            return (data.decode('utf-8') if tag == 0x73 else data), offset + size
+        if tag == 0x6C:                                         # l
+            count, = COUNT.unpack_from(view, offset)
+            offset += COUNT.size
+            items = []
+            for _ in range(count):
+                item, offset = self._decode_value(view, offset)
+                items.append(item)
+            return items, offset
+        if tag == 0x6D:                                         # m
+            count, = COUNT.unpack_from(view, offset)
+            offset += COUNT.size
+            items = {}
+            for _ in range(count):
+                key, offset = self._decode_value(view, offset)
+                items[key], offset = self._decode_value(view, offset)
+            return items, offset
+        if tag == 0x43:                                         # C
+            return self._decode_contents(view, offset)
+        raise ValueError(f"Unknown value tag {tag:#x} in binary message.")
+
+    def _decode_contents(self, view: memoryview, offset: int) -> tuple:
+        count, = COUNT.unpack_from(view, offset)
+        offset += COUNT.size
+        if not count:
+            return [], offset
+        columns = []
+        for _ in range(5):
+            size, = COUNT.unpack_from(view, offset)
+            offset += COUNT.size
+            columns.append(bytes(view[offset:offset + size]).decode('utf-8').split("\0"))
+            offset += size
+        numbers = struct.Struct(f"={count}q")
+        nlinks = numbers.unpack_from(view, offset)
+        sizes = numbers.unpack_from(view, offset + numbers.size)
+        modes, users, groups, mtimes, names = columns
+        contents = [Content(mode, nlink, user, group, size, mtime, name)
+                    for mode, nlink, user, group, size, mtime, name in zip(modes, nlinks, users, groups, sizes, mtimes, names)]
+        return contents, offset + 2 * numbers.size
+
+JSON = JsonCodec()
+CODECS = {codec.name: codec for codec in (BinaryCodec(), JSON)}   # in order of preference
+
+def negotiate(offered: Optional[list]):
+    """
+    Picks the codec for a connection from the names a client offered, in the client's order of preference.
+
+    Returns:
+        The codec to switch to, or None to stay with JSON.
+    """
+    for name in offered or []:
+        if name in CODECS:
+            return CODECS[name]
+    return None
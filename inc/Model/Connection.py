@@ -4,6 +4,9 @@ from dataclasses import dataclass
 from datetime import datetime
 import os
 
+from .CustomProtocol import with_slots
+
+@with_slots()
 @dataclass
 class Connection:
     """
@@ -1,6 +1,27 @@
 # Trey Rubino
 
 import json
+from dataclasses import fields
+from operator import attrgetter
+
+def with_slots(*extra: str):
+    """
+    Class decorator, applied on top of `@dataclass`, that rebuilds the class with `__slots__` for its
+    fields (plus `extra` attribute names), like `@dataclass(slots=True)` on newer Pythons.
+
+    Instances then have no per-instance `__dict__`, which makes them smaller and faster to build and read.
+    It also records the field names as `WIRE_FIELDS`, the attributes `to_wire`/`from_wire` exchange.
+    """
+    def wrap(cls):
+        names = tuple(field.name for field in fields(cls))
+        body = {key: value for key, value in cls.__dict__.items()
+                if key not in names and key not in ('__dict__', '__weakref__')}   # simple defaults live in `__init__`
+        body['__slots__'] = names + extra
+        body['WIRE_FIELDS'] = names
+        body['WIRE_KEYS'] = frozenset(names)
+        body['_wire_values'] = staticmethod(attrgetter(*names))
+        return type(cls)(cls.__name__, cls.__bases__, body)
+    return wrap
 
 class CustomProtocol:
     """
@@ -11,13 +32,20 @@ class CustomProtocol:
 
     Methods:
         validate(): Abstract method for validation, to be implemented by subclasses.
-        prepare() -> bytes: Validates the instance and encodes it into bytes for transmission.
+        prepare(codec) -> bytes: Validates the instance and encodes it into bytes for transmission.
         encode() -> bytes: Encodes the instance as a JSON-formatted byte string.
         decode(data: bytes, cls): Decodes a JSON-formatted byte string into an instance of the specified class.
+        from_dict(raw_data: dict, cls): Builds an instance of the specified class from parsed JSON data.
+        to_wire() -> dict: The fields to send, without the ones that are None.
+        from_wire(fields: dict): Builds an instance from received fields, ignoring unknown ones.
+        list_from_wire(items: list): Builds a list of instances, for fields holding nested messages.
         attach_binary_data(binary_data: bytes): Attaches binary data to the instance, ensuring size consistency.
         get_binary_data() -> bytes: Retrieves attached binary data, if any.
     """
 
+    __slots__ = ()                                              # subclasses are slotted with `with_slots`
+    WIRE_CONVERTERS = {}                                        # field name -> function applied to received values
+
     def validate(self):
         """
         Abstract method for validation.
@@ -27,24 +55,69 @@ class CustomProtocol:
         """
         raise NotImplementedError("Subclass must implement `validate`.")
 
-    def prepare(self) -> bytes:
+    def prepare(self, codec=None) -> bytes:
         """
         Validates the instance and encodes it into bytes for transmission.
 
+        Args:
+            codec (optional): The connection's codec from `Codec.CODECS`; JSON if not given.
+
         Returns:
-            bytes: The JSON-encoded byte representation of the instance.
+            bytes: The encoded byte representation of the instance.
         """
         self.validate()
+        if codec is not None:
+            return codec.encode(self)
         return self.encode()
 
     def encode(self) -> bytes:
         """
         Encodes the instance as a JSON-formatted byte string.
 
+        Top-level attributes that are `None` are left out, so optional fields that a peer may not know
+        about never reach it unless they are actually used.
+
         Returns:
             bytes: The JSON-encoded byte representation of the instance.
         """
-        return json.dumps(self, default=lambda o: o.__dict__, ensure_ascii=False).encode('utf-8')
+        return json.dumps(self.to_wire(), default=lambda o: o.to_wire(), ensure_ascii=False).encode('utf-8')
+
+    def to_wire(self) -> dict:
+        """
+        Returns the fields to send, leaving out the ones that are None. Nested objects (`Content`) are
+        returned as they are, for the codec to encode.
+
+        Returns:
+            dict: Field name -> value.
+        """
+        return {name: value for name, value in zip(self.WIRE_FIELDS, self._wire_values(self)) if value is not None}
+
+    @classmethod
+    def from_wire(cls, fields: dict):
+        """
+        Builds an instance from received fields. Fields this side does not know about are ignored, so
+        newer peers can add optional fields.
+
+        Args:
+            fields (dict): Field name -> value, as decoded by a codec.
+
+        Returns:
+            An instance of `cls`.
+        """
+        if not fields.keys() <= cls.WIRE_KEYS:
+            fields = {key: value for key, value in fields.items() if key in cls.WIRE_KEYS}
+        for key, convert in cls.WIRE_CONVERTERS.items():
+            if fields.get(key):
+                fields[key] = convert(fields[key])
+        return cls(**fields)
+
+    @classmethod
+    def list_from_wire(cls, items: list) -> list:
+        """
+        Builds instances from a received list of field dicts, for fields that nest messages (`batch`).
+        Items that are already instances are kept.
+        """
+        return [cls.from_wire(item) if isinstance(item, dict) else item for item in items]
 
     @staticmethod
     def decode(data: bytes, cls):
@@ -63,21 +136,24 @@ class CustomProtocol:
         """
         # Decode the bytes to a string and parse the JSON data
         raw_data = json.loads(data.decode('utf-8'))
+        return CustomProtocol.from_dict(raw_data, cls)
+
+    @staticmethod
+    def from_dict(raw_data: dict, cls):
+        """
+        Builds an instance of the specified class from already parsed message fields.
 
-        # Handle the conversion of dictionaries in 'contents' to Content objects
-        if 'contents' in raw_data:
-            from .Response import Content  # Dynamically import Content
-            try:
-                raw_data['contents'] = [Content(**item) for item in raw_data['contents']]
-            except Exception as e:
-                print("Error converting 'contents' to Content objects:", e)  # Debug: Show conversion error
-
-        # Create an instance of the class with the parsed data
-        try:
-            return cls(**raw_data)
-        except Exception as e:
-            print(f"Error creating instance of '{cls.__name__}':", e)  # Debug: Show instantiation error
-            raise
+        Args:
+            raw_data (dict): The parsed JSON object, or the fields decoded by another codec.
+            cls: The class to instantiate with the parsed data.
+
+        Returns:
+            An instance of the specified class.
+
+        Raises:
+            Exception: If there is an error during instantiation.
+        """
+        return cls.from_wire(raw_data)
 
     def attach_binary_data(self, binary_data: bytes):
         """
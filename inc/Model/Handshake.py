@@ -0,0 +1,36 @@
+# Trey Rubino
+
+from typing import Optional
+
+PROTOCOL_VERSION = 2                                            # 1 is the original protocol, which has no handshake
+
+# Optional features a peer may lack. A server that does not know a command never answers it, so a client
+# must not send one the server did not agree to.
+CAPABILITIES = ("batch", "copy", "follow")
+COMMAND_CAPABILITIES = {"batch": "batch", "cp": "copy", "mv": "copy", "follow": "follow"}
+
+def agree(version: Optional[int], offered: Optional[list]) -> tuple:
+    """
+    Server side: answers a client's hello with the protocol version and the capabilities both peers have.
+
+    Args:
+        version (int, optional): The client's `Request.protocol`.
+        offered (list, optional): The client's `Request.capabilities`.
+
+    Returns:
+        tuple: The version to speak (int) and the shared capabilities (list), in `CAPABILITIES` order.
+    """
+    offered = set(offered or [])
+    return min(version or 1, PROTOCOL_VERSION), [name for name in CAPABILITIES if name in offered]
+
+def supported(capabilities: Optional[set], cmd: str) -> bool:
+    """
+    Whether `cmd` may be sent on a connection that agreed to `capabilities`.
+
+    Args:
+        capabilities (set, optional): The connection's shared capabilities, None before (or without) a
+            handshake, when every command is assumed to be supported as before.
+        cmd (str): The command.
+    """
+    capability = COMMAND_CAPABILITIES.get(cmd)
+    return capabilities is None or capability is None or capability in capabilities
@@ -2,8 +2,9 @@
 
 from dataclasses import dataclass, field
 from typing import Optional
-from .CustomProtocol import CustomProtocol
+from .CustomProtocol import CustomProtocol, with_slots
 
+@with_slots('binary_data')
 @dataclass
 class Request(CustomProtocol):
     """
@@ -15,12 +16,28 @@ class Request(CustomProtocol):
         remote_path (Optional[str]): The remote file or directory path for the request.
         local_path (Optional[str]): The local file or directory path for the request.
         size (Optional[int]): The size of the data to be sent or received, in bytes.
+        validator (Optional[dict]): For `get`, the cached validator (`size`, `mtime`, `sha256`) of the file.
+            An empty dict asks for the current validator without making the request conditional.
+        trace_id (Optional[str]): The client's trace ID, so both sides tag their trace events alike.
+        codecs (Optional[list]): Codec names the client can use instead of JSON, most preferred first.
+            Offered on a `pwd` right after connecting; see `Response.codec`.
+        protocol (Optional[int]): The client's protocol version, sent with `codecs` as its hello.
+        capabilities (Optional[list]): Optional features (`Handshake.CAPABILITIES`) the client can use.
+        requests (Optional[list]): For `batch`, the sub-requests (`Request` objects) to run in order. Only
+            commands answered with a single message (`ls`, `mkdir`, `rm`, `cp`, `mv`, `cat`, `pwd`, `cd`)
+            can be batched.
     """
     cmd: str
     options: Optional[list] = field(default_factory=list)
     remote_path: Optional[str] = None
     local_path: Optional[str] = None
     size: Optional[int] = 0
+    validator: Optional[dict] = None
+    trace_id: Optional[str] = None
+    codecs: Optional[list] = None
+    protocol: Optional[int] = None
+    capabilities: Optional[list] = None
+    requests: Optional[list] = None
 
     def validate(self):
         """
@@ -31,3 +48,5 @@ class Request(CustomProtocol):
         """
         if not self.cmd:
             raise ValueError("Command (cmd) cannot be empty")
+
+    WIRE_CONVERTERS = {"requests": lambda items: Request.list_from_wire(items)}   # received sub-requests become `Request` objects
@@ -2,8 +2,16 @@
 
 from dataclasses import dataclass, field
 from typing import List, Optional
-from .CustomProtocol import CustomProtocol
+from .CustomProtocol import CustomProtocol, with_slots
 
+# Every value `Response.code` can take, server and client side; Metrics keeps one counter per code.
+CODES = ("NOT_MODIFIED",
+         "ERR_UNSPECIFIED", "ERR_INVALID_DIR", "ERR_DIR_NOT_FOUND", "ERR_PERMISSION_DENIED", "ERR_DIR_EXISTS",
+         "ERR_GET_SERVER", "ERR_PUT_SERVER", "ERR_GET_CLIENT", "ERR_PUT_CLIENT", "ERR_CONNECTION_LOST", "ERR_CD",
+         "ERR_INVALID_PATH", "ERR_REMOVE", "ERR_IS_DIRECTORY", "ERR_FILE_NOT_FOUND", "ERR_COMMAND_NOT_FOUND",
+         "ERR_BATCH", "ERR_BATCH_UNSUPPORTED", "ERR_COPY", "ERR_MOVE", "ERR_UNSUPPORTED", "ERR_CLEAR", "ERR_HELP")
+
+@with_slots()
 @dataclass
 class Content:
     """
@@ -26,6 +34,25 @@ class Content:
     mtime: str
     name: str
 
+    def to_wire(self) -> dict:
+        """
+        Returns the entry as a dict of its fields, for codecs that send entries as objects.
+        """
+        return {"mode": self.mode, "nlink": self.nlink, "user": self.user, "group": self.group,
+                "size": self.size, "mtime": self.mtime, "name": self.name}
+
+    @staticmethod
+    def list_from_wire(items: list) -> list:
+        """
+        Builds entries from received dicts, positionally rather than through `**kwargs`. Entries that
+        are already `Content` objects (binary codecs build them while decoding) are kept.
+        """
+        if not items or isinstance(items[0], Content):
+            return items
+        return [Content(item["mode"], item["nlink"], item["user"], item["group"], item["size"], item["mtime"], item["name"])
+                for item in items]
+
+@with_slots('binary_data')
 @dataclass
 class Response(CustomProtocol):
     """
@@ -35,14 +62,25 @@ class Response(CustomProtocol):
         status (str): The status of the response (e.g., "success", "error").
         message (Optional[str]): An optional message describing the response.
         contents (Optional[List[Content]]): A list of Content objects representing files or directories.
-        code (Optional[str]): An optional error or status code.
+        code (Optional[str]): An optional error or status code, one of `CODES`.
         size (Optional[int]): Size of the data being sent or received in bytes.
+        validator (Optional[dict]): For `get`, the validator (`size`, `mtime`, `sha256`) of the file being sent.
+        codec (Optional[str]): The codec the server picked from `Request.codecs`. This response is still in
+            JSON; every later message in both directions uses the picked codec.
+        protocol (Optional[int]): The protocol version both peers speak, in reply to `Request.protocol`.
+        capabilities (Optional[list]): The offered capabilities the server has too.
+        responses (Optional[list]): For `batch`, one `Response` per sub-request that ran, in order.
     """
     status: str
     message: Optional[str] = None
     contents: Optional[List[Content]] = field(default_factory=list)
     code: Optional[str] = None
     size: Optional[int] = 0
+    validator: Optional[dict] = None
+    codec: Optional[str] = None
+    protocol: Optional[int] = None
+    capabilities: Optional[list] = None
+    responses: Optional[list] = None
 
     def validate(self):
         """
@@ -53,3 +91,6 @@ class Response(CustomProtocol):
         """
         if not self.status:
             raise ValueError("Status cannot be empty")
+
+    WIRE_CONVERTERS = {"contents": Content.list_from_wire,     # received entries become `Content` objects
+                       "responses": lambda items: Response.list_from_wire(items)}
@@ -11,7 +11,9 @@ import argparse
 # Parameters: 
 #   - args : List of command-line arguments to parse.
 # Return Value: 
-#   - parsedArgs : An object containing the parsed host and port values.
+#   - parsedArgs : An object containing the parsed host and port values, 
+#                  the optional download cache settings, codec and 
+#                  trace dir, and the batch mode settings.
 #########################################################################
 def parseClient(args):
     # Disable the default help flag to make sure it doesnt freak out
@@ -20,6 +22,14 @@ def parseClient(args):
     # Add arguments
     parser.add_argument('-h', '--host', type=str, required=True, help='Host name')
     parser.add_argument('-p', '--port', type=str, required=True, help='Port number')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Directory for the download cache (disabled if not given)')
+    parser.add_argument('--cache-size', type=int, default=512, help='Download cache size limit in MB')
+    parser.add_argument('--codec', type=str, choices=['binary', 'json'], default='json', help='Message codec to ask the server for (json, the default, works with every server)')
+    parser.add_argument('--trace-dir', type=str, default=None, help='Directory for a Chrome trace-event file of this session (disabled if not given)')
+    parser.add_argument('-c', '--command', action='append', default=None, help='Run this command without the REPL (repeatable, runs in order)')
+    parser.add_argument('-b', '--batch', type=str, default=None, help="Run the commands in this file ('-' for stdin) without the REPL, after any -c commands")
+    parser.add_argument('--keep-going', action='store_true', help='In batch mode, continue after a failed command instead of stopping')
+    parser.add_argument('--timings', type=str, default=None, help="In batch mode, write one JSON line of timing per command to this file ('-' for stderr)")
 
     # Parse the arguments from the provided list
     parsedArgs = parser.parse_args(args)
@@ -16,8 +16,9 @@ import os
 #/*     Description:      Parses together the command line arguments for */
 #/*                       later use.                                     */
 #/*     Parameters:       argv - command line arguments                  */
-#/*     Return Value:     tuple of port number, directory, and absolute  */
-#/*                       path of the directory given                    */
+#/*     Return Value:     tuple of port number, directory, absolute      */
+#/*                       path of the directory given, and the parsed    */
+#/*                       arguments for the optional settings            */
 #/************************************************************************/
 def parseArgs(argv):
     '''
@@ -28,12 +29,33 @@ def parseArgs(argv):
     parser = argparse.ArgumentParser(description='Get command line arguments')
     parser.add_argument('-p', required=True, help='Port Number')
     parser.add_argument('-d', required=True, help='Directory')
+    parser.add_argument('--fps', type=float, default=4, help='Maximum session monitor redraws per second')
+    parser.add_argument('--sessions', type=int, default=256, help='Slots in the shared session table')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Local port for the Prometheus metrics exporter (disabled if not given)')
+    parser.add_argument('--profile-dir', type=str, default=None, help='Directory for per-request .pstats files; send SIGUSR2 to a worker to toggle profiling')
+    parser.add_argument('--profile-every', type=int, default=1, help='Profile only every Nth request while profiling is on')
+    parser.add_argument('--mem-threshold', type=float, default=None, help='Trace allocations and log requests whose peak reaches this many MB (disabled if not given); send SIGUSR1 to a worker to dump its top allocations')
+    parser.add_argument('--mem-top', type=int, default=10, help='Number of allocation sites in a memory dump')
+    parser.add_argument('--mem-dir', type=str, default=None, help='Directory for memory logs and dumps (stdout if not given)')
+    parser.add_argument('--limit-session', type=float, default=None, help='File transfer limit per session in MB/s (unlimited if not given)')
+    parser.add_argument('--limit-ip', type=float, default=None, help='File transfer limit per client IP in MB/s, shared by its sessions (unlimited if not given)')
+    parser.add_argument('--limit-global', type=float, default=None, help='File transfer limit across all sessions in MB/s (unlimited if not given)')
+    parser.add_argument('--limit-burst', type=float, default=0.25, help='Seconds of traffic a limit lets through at full speed before pacing')
+    parser.add_argument('--durability', choices=['none', 'fsync', 'async'], default='none', help='How put makes uploads durable: no fsync, fsync per file before replying, or fsync groups of consecutive uploads after replying')
+    parser.add_argument('--async-files', type=int, default=32, help='With --durability async, most acknowledged uploads synced together')
+    parser.add_argument('--async-ms', type=float, default=50, help='With --durability async, most milliseconds an acknowledged upload waits to be synced')
+    parser.add_argument('--write-buffers', type=int, default=4, help='Buffers in flight while a large upload is written to disk as it arrives (0 reads uploads whole before writing)')
+    parser.add_argument('--write-buffer-kb', type=int, default=1024, help='Size of each upload buffer in KB; uploads up to this size are read whole')
+    parser.add_argument('--trash-dir', type=str, default=None, help='Directory outside the served one, on the same file system, that rm -r renames directories into for background deletion (delete in place if not given)')
+    parser.add_argument('--trace-dir', type=str, default=None, help='Directory for per-worker Chrome trace-event files (disabled if not given)')
 
     try:
         args = parser.parse_args(argv) #parse the arguments
         port, directory = args.p, args.d #set variables to arguments
         absDir = os.path.abspath(directory)
+        if args.fps <= 0:
+            parser.error("--fps must be greater than 0")
     except SystemExit:
         sys.exit(1) #failure to parse correctly
 
-    return port, directory, absDir #return the variables
\ No newline at end of file
+    return port, directory, absDir, args #return the variables
\ No newline at end of file
@@ -0,0 +1,187 @@
+# Trey Rubino
+
+import os
+import json
+import shutil
+from collections import OrderedDict
+
+class DownloadCache:
+    """
+    Client-side content cache for `get`, keyed by remote path.
+
+    Each entry stores the validator the server reported for the file (size, mtime in nanoseconds and
+    sha256) and a blob holding the file contents. Blobs are content addressed, so several remote paths
+    with the same contents share one blob. Entries are evicted least recently used first once the total
+    blob size exceeds `max_bytes`.
+
+    The cache never decides on its own that an entry is fresh: the validator is sent with a conditional
+    `get` and the server answers "not modified" only when it still matches the remote file.
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, directory: str, max_bytes: int, namespace: str = ""):
+        """
+        Opens (or creates) a cache in the given directory.
+
+        Args:
+            directory (str): Directory holding the index and blobs.
+            max_bytes (int): Upper bound on the total size of cached blobs.
+            namespace (str): Prefix for keys, typically "host:port", so caches for different servers do not collide.
+        """
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.entries = OrderedDict()                            # key -> entry, least recently used first
+        os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+        try:
+            with open(os.path.join(self.directory, self.INDEX_NAME), "r") as file:
+                self.entries = OrderedDict(json.load(file))
+        except (FileNotFoundError, ValueError):
+            pass                                                # missing or corrupt index, start empty
+
+    def key(self, remote_path: str) -> str:
+        """
+        Builds the cache key for a remote path.
+
+        Args:
+            remote_path (str): The remote path as given to `get`.
+
+        Returns:
+            str: The cache key.
+        """
+        return f"{self.namespace}:{os.path.normpath(remote_path)}"
+
+    def lookup(self, remote_path: str) -> dict:
+        """
+        Returns the entry for a remote path and marks it as recently used.
+
+        Entries whose blob is missing or was modified since it was stored (for example through a
+        hardlinked download that was edited in place) are dropped.
+
+        Args:
+            remote_path (str): The remote path as given to `get`.
+
+        Returns:
+            dict: The entry (with a `validator` key), or None on a miss.
+        """
+        key = self.key(remote_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        try:
+            stats = os.stat(self._blob_path(entry))
+            if stats.st_size != entry["validator"]["size"] or stats.st_mtime_ns != entry["blob_mtime"]:
+                raise FileNotFoundError
+        except FileNotFoundError:
+            self._drop(key)
+            self._save()
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def store(self, remote_path: str, validator: dict, data: bytes) -> dict:
+        """
+        Stores downloaded contents and the validator the server sent with them.
+
+        Args:
+            remote_path (str): The remote path as given to `get`.
+            validator (dict): The server's validator, with `size`, `mtime` and `sha256` keys.
+            data (bytes): The file contents.
+
+        Returns:
+            dict: The new entry, or None if the contents are larger than the whole cache.
+        """
+        key = self.key(remote_path)
+        self._drop(key)
+        if len(data) > self.max_bytes:
+            self._save()
+            return None
+
+        entry = {"validator": validator, "blob_mtime": 0}
+        blob = self._blob_path(entry)
+        if not os.path.exists(blob):
+            temp = f"{blob}.{os.getpid()}.tmp"
+            with open(temp, "wb") as file:
+                file.write(data)
+            os.replace(temp, blob)
+        entry["blob_mtime"] = os.stat(blob).st_mtime_ns
+        for other in self.entries.values():                     # entries sharing the blob must agree on its mtime
+            if other["validator"]["sha256"] == validator["sha256"]:
+                other["blob_mtime"] = entry["blob_mtime"]
+        self.entries[key] = entry
+        self._evict()
+        self._save()
+        return entry
+
+    def revalidate(self, remote_path: str, validator: dict) -> None:
+        """
+        Records a newer validator for an entry whose contents the server confirmed unchanged
+        (for example after a `touch`), so the next conditional `get` can skip hashing again.
+
+        Args:
+            remote_path (str): The remote path as given to `get`.
+            validator (dict): The validator from the server's "not modified" answer.
+        """
+        entry = self.entries.get(self.key(remote_path))
+        if entry is not None and validator and entry["validator"] != validator \
+                and validator.get("sha256") == entry["validator"]["sha256"]:
+            entry["validator"] = validator
+            self._save()
+
+    def materialize(self, entry: dict, target: str) -> None:
+        """
+        Places a cached blob at the target path, as a hardlink where possible and as a copy otherwise.
+
+        Args:
+            entry (dict): An entry returned by `lookup` or `store`.
+            target (str): The local path to create.
+        """
+        blob = self._blob_path(entry)
+        if os.path.lexists(target):
+            os.remove(target)
+        try:
+            os.link(blob, target)
+        except OSError:                                         # cross-device, unsupported filesystem, ...
+            shutil.copyfile(blob, target)
+
+    def _blob_path(self, entry: dict) -> str:
+        return os.path.join(self.directory, "blobs", entry["validator"]["sha256"])
+
+    def _drop(self, key: str) -> None:
+        """
+        Removes an entry, and its blob if no other entry refers to it.
+        """
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        sha = entry["validator"]["sha256"]
+        if not any(other["validator"]["sha256"] == sha for other in self.entries.values()):
+            try:
+                os.remove(self._blob_path(entry))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        """
+        Drops least recently used entries until the distinct blobs fit in `max_bytes`.
+        """
+        blobs = {entry["validator"]["sha256"]: entry["validator"]["size"] for entry in self.entries.values()}
+        total = sum(blobs.values())
+        while total > self.max_bytes and self.entries:
+            key = next(iter(self.entries))
+            entry = self.entries[key]
+            self._drop(key)
+            sha = entry["validator"]["sha256"]
+            if sha not in (other["validator"]["sha256"] for other in self.entries.values()):
+                total -= entry["validator"]["size"]
+
+    def _save(self) -> None:
+        """
+        Writes the index atomically so a crash never leaves a half-written index behind.
+        """
+        index = os.path.join(self.directory, self.INDEX_NAME)
+        temp = f"{index}.{os.getpid()}.tmp"
+        with open(temp, "w") as file:
+            json.dump(self.entries, file)
+        os.replace(temp, index)
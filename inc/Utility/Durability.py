@@ -0,0 +1,142 @@
+# Trey Rubino
+
+import os
+import time
+import select
+import hashlib
+import itertools
+
+MODES = ("none", "fsync", "async")
+NAME_LIMIT = 128                                                # bytes of the destination name kept in a temporary name, well under NAME_MAX
+
+def temporary_name(name: str, tag: str) -> str:
+    """
+    A hidden name for the file written before it is renamed to `name`. `tag` makes it unique to the writer.
+    Names too long to take the extra characters within NAME_MAX (255 bytes) are shortened to a prefix and
+    a hash of the whole name.
+    """
+    encoded = os.fsencode(name)
+    if len(encoded) > NAME_LIMIT:
+        name = os.fsdecode(encoded[:NAME_LIMIT - 17]) + "~" + hashlib.sha1(encoded).hexdigest()[:16]
+    return f".{name}.{tag}.part"
+
+class Durability:
+    """
+    Commits uploaded files: renames the finished temporary file over the destination, so readers only
+    ever see a complete file, and makes it durable according to the server's mode.
+
+    Modes:
+        none: rename only. Fastest; nothing forces the data to disk, so after a crash recent uploads can
+            be missing, or present under their name but empty or incomplete.
+        fsync: `fsync` the file before the rename and its directory after it, before the upload is
+            acknowledged. Every acknowledged upload survives a crash.
+        async: rename and acknowledge at once, and `fsync` later in groups. A worker serves its session's
+            requests one after another, so the group collects consecutive uploads: it is flushed when
+            `group_files` uploads are pending, when the oldest is `group_window` seconds old (checked while
+            the session is idle, see `wait`) and when the session ends. The sync happens after the reply,
+            so up to one group of acknowledged uploads can be lost, or torn as in `none`, in a crash; in
+            exchange there is one `fsync` round per group instead of per file.
+    """
+
+    def __init__(self, mode: str = "none", group_files: int = 32, group_window: float = 0.05, metrics=None):
+        """
+        Args:
+            mode (str): One of `MODES`.
+            group_files (int): Most acknowledged uploads waiting for a group sync.
+            group_window (float): Seconds an acknowledged upload may wait for a group sync.
+            metrics (Metrics, optional): Shared metrics that record the time spent in `fsync`.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown durability mode '{mode}'")
+        self.mode = mode
+        self.group_files = max(1, group_files)
+        self.group_window = group_window
+        self.metrics = metrics
+        self.pending = []                                       # async mode: (file fd, directory fd, size) not yet synced
+        self.oldest = None                                      # when the first pending upload was committed
+        self.counter = itertools.count()
+
+    def temporary_name(self, name: str) -> str:
+        """
+        A hidden name, unique to this worker, for the file an upload is written to before it is committed.
+        """
+        return temporary_name(name, f"{os.getpid()}.{next(self.counter)}")
+
+    def commit(self, fd: int, dir_fd: int, temporary: str, name: str, size: int) -> None:
+        """
+        Renames the written temporary file `temporary` in `dir_fd` to `name`, syncing as the mode requires.
+
+        Args:
+            fd (int): The temporary file, fully written. Still owned by the caller.
+            dir_fd (int): The directory both names are in. Still owned by the caller.
+            temporary (str): The temporary file's name.
+            name (str): The destination name.
+            size (int): Bytes written, for the metrics.
+        """
+        if self.mode == "fsync":
+            start = time.perf_counter()
+            os.fsync(fd)
+            os.rename(temporary, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+            os.fsync(dir_fd)                                    # the rename itself must reach the disk too
+            self._record(1, size, 2, time.perf_counter() - start)
+            return
+
+        os.rename(temporary, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        if self.mode == "none":
+            self._record(1, size, 0, 0.0)
+            return
+
+        self.pending.append((os.dup(fd), os.dup(dir_fd), size))
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+        if len(self.pending) >= self.group_files:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Syncs every pending upload of the group: the files first, then each of their directories once.
+        """
+        if not self.pending:
+            return
+        pending, self.pending, self.oldest = self.pending, [], None
+        start = time.perf_counter()
+        directories = {}
+        calls = 0
+        try:
+            for fd, dir_fd, _ in pending:
+                os.fsync(fd)
+                calls += 1
+                stats = os.fstat(dir_fd)
+                directories.setdefault((stats.st_dev, stats.st_ino), dir_fd)
+            for dir_fd in directories.values():
+                os.fsync(dir_fd)
+                calls += 1
+        finally:
+            for fd, dir_fd, _ in pending:
+                os.close(fd)
+                os.close(dir_fd)
+            self._record(len(pending), sum(size for _, _, size in pending), calls, time.perf_counter() - start)
+
+    def wait(self, conn, buffered: bool = False) -> None:
+        """
+        Called before waiting for the next request: flushes the group if it is due, or as soon as it becomes
+        due while the client sends nothing.
+
+        Args:
+            conn: The client socket.
+            buffered (bool): A request is already buffered, so there is no idle time to wait for.
+        """
+        if not self.pending:
+            return
+        remaining = self.oldest + self.group_window - time.monotonic()
+        if remaining > 0 and not buffered:
+            readable, _, _ = select.select([conn], [], [], remaining)
+            if readable:
+                return                                          # the next request is here, flush once it is due
+            remaining = 0
+        if remaining <= 0:
+            self.flush()
+
+    def _record(self, files: int, size: int, calls: int, seconds: float) -> None:
+        if self.metrics:
+            self.metrics.count_commit(files, size, calls, seconds)
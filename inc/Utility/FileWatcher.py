@@ -0,0 +1,80 @@
+# Trey Rubino
+
+import os
+import ctypes
+import ctypes.util
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+class FileWatcher:
+    """
+    Waits for changes to a single file, using inotify where the platform provides it and
+    falling back to a fixed poll interval otherwise.
+
+    The parent directory is watched rather than the file itself, so the watcher keeps
+    firing when the file is rotated (renamed away and recreated under the same name).
+    Callers always re-stat the file after a wakeup, which makes spurious wakeups harmless.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.5, safety_interval: float = 5.0):
+        """
+        Initializes the watcher for the given file path.
+
+        Args:
+            path (str): The file to watch.
+            poll_interval (float): Seconds between checks when inotify is not available.
+            safety_interval (float): Seconds between checks when inotify is available, as a guard against missed events.
+        """
+        self.path = path
+        self.fd = None                                          # inotify file descriptor (None means polling)
+        self.timeout = poll_interval
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                directory = os.path.dirname(os.path.abspath(path))
+                if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) >= 0:
+                    self.fd = fd
+                    self.timeout = safety_interval
+                else:
+                    os.close(fd)
+        except (OSError, AttributeError):
+            self.fd = None                                      # no libc or no inotify, poll instead
+
+    def fileno(self) -> int:
+        """
+        Returns the inotify file descriptor so the watcher can be passed to `select`.
+
+        Returns:
+            int: The inotify file descriptor, or None when polling.
+        """
+        return self.fd
+
+    def drain(self) -> None:
+        """
+        Discards all pending inotify events. The events only serve as wakeups.
+        """
+        if self.fd is None:
+            return
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        """
+        Releases the inotify file descriptor, if any.
+        """
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
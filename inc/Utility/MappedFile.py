@@ -0,0 +1,112 @@
+# Trey Rubino
+
+import os
+import mmap
+import time
+import errno
+
+MMAP_THRESHOLD = 256 * 1024                                     # smaller files are cheaper to read than to map
+MMAP_SETTLE = 2.0                                               # seconds since the last change before a file is mapped
+READ_CHUNK = 1 << 30                                            # pread returns at most about 2 GB per call
+
+class MappedFile:
+    """
+    Read-only view of a whole file, for payloads that are hashed and sent but never changed.
+
+    Files of at least `MMAP_THRESHOLD` bytes are mapped with `mmap` and exposed as a `memoryview` over the
+    page cache: hashing and `sendall` work on it (or on slices of it) without copying the file into a
+    `bytes` object first, and concurrent downloads of the same file share the same physical pages instead
+    of each holding a private copy. Smaller files are read, since mapping costs a few system calls and a
+    page fault per page.
+
+    A mapping is not a snapshot. If any process truncates the file while it is mapped, touching the lost
+    pages raises SIGBUS, which kills the process. The server does not rewrite files in place: uploads and
+    `cp` write a temporary file and rename it over the old one, which leaves a mapped file intact. Another
+    program writing the file in place still can, so such files are only mapped under two checks. A file
+    changed within the last `MMAP_SETTLE` seconds may still be being written and is read instead. And
+    `recheck`, called right before the view is sent, swaps the mapping for a copy if the file changed
+    after it was mapped. A truncation during the send itself is not caught.
+
+    Example:
+        with MappedFile(fd) as data:
+            digest = hashlib.sha256(data.view).hexdigest()
+            data.recheck()
+            conn.sendall(data.view)
+    """
+
+    def __init__(self, fd: int):
+        """
+        Maps or reads the file from its start. The descriptor is not needed afterwards and stays owned by
+        the caller.
+
+        Args:
+            fd (int): A file descriptor open for reading.
+        """
+        stats = os.fstat(fd)
+        self.size = stats.st_size
+        self.map = None
+        self.fd = None
+        if self.size >= MMAP_THRESHOLD and time.time() - stats.st_mtime >= MMAP_SETTLE:
+            self.map = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)   # the mapping keeps its own reference to the file
+            if hasattr(self.map, "madvise"):
+                self.map.madvise(mmap.MADV_SEQUENTIAL)          # read ahead, it is read front to back (Python 3.8+)
+            self.view = memoryview(self.map)
+            self.fd = os.dup(fd)                                # for `recheck`
+            self.mapped = (stats.st_size, stats.st_mtime_ns)
+        else:
+            self.view = memoryview(self._read(fd, self.size))
+        self.size = len(self.view)                              # what was actually mapped or read
+
+    def recheck(self) -> None:
+        """
+        Called right before the view is sent, which can be a while after the file was mapped (the peer's
+        acknowledgement comes in between). If the file changed since, the mapping is replaced by a copy
+        read now, which a later truncation cannot fault. A file that was read is left alone.
+
+        Raises:
+            OSError: If the file is now shorter than the size already announced to the peer.
+        """
+        if self.map is None:
+            return
+        stats = os.fstat(self.fd)
+        if (stats.st_size, stats.st_mtime_ns) == self.mapped:
+            return
+        data = self._read(self.fd, self.size)
+        self.close()
+        self.view = memoryview(data)
+
+    @staticmethod
+    def _read(fd: int, size: int) -> bytes:
+        chunks = []
+        offset = 0
+        while offset < size:
+            chunk = os.pread(fd, min(size - offset, READ_CHUNK), offset)
+            if not chunk:
+                raise OSError(errno.EIO, "File shrank while being sent")
+            chunks.append(chunk)
+            offset += len(chunk)
+        return b"".join(chunks)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Releases the view and unmaps the file. Slices of `view` must not be used afterwards.
+        """
+        try:
+            self.view.release()
+            if self.map is not None:
+                self.map.close()
+        except BufferError:
+            pass                                                # a slice is still referenced, unmapped when it is freed
+        self.map = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
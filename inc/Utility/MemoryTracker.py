@@ -0,0 +1,109 @@
+# Trey Rubino
+
+import os
+import time
+import resource
+import tracemalloc
+
+from ..Model.Request import Request
+
+class MemoryTracker:
+    """
+    Per-request memory accounting for a server worker, based on `tracemalloc`.
+
+    For every dispatched request it records the peak traced allocation above the level before the
+    request, and the change in resident set size. The window opens with `begin`, before the request is
+    received, so a `put` payload read along with the request counts too. Requests whose peak reaches the threshold are logged
+    with their command, path and size. A snapshot of the top allocation sites can be dumped on demand
+    (see `dump`), which is meant to be installed as a signal handler.
+
+    Tracing every allocation slows the worker down, so this is only enabled on request.
+    """
+
+    def __init__(self, threshold: int, top: int = 10, directory: str = None):
+        """
+        Starts tracing allocations in this process.
+
+        Args:
+            threshold (int): Peak allocation, in bytes, from which a request is logged.
+            top (int): Number of allocation sites listed by `dump`.
+            directory (str, optional): Directory for the log and snapshot files; stdout if not given.
+        """
+        self.threshold = threshold
+        self.top = top
+        self.directory = os.path.abspath(directory) if directory else None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.before = None                                      # traced bytes when the current window began
+        self.rss_before = 0
+        tracemalloc.start()
+
+    def begin(self) -> None:
+        """
+        Opens the accounting window of the next request. Called before the request is received.
+        """
+        if hasattr(tracemalloc, "reset_peak"):                  # Python 3.9+
+            tracemalloc.reset_peak()
+        else:                                                   # older versions can only reset by restarting
+            tracemalloc.stop()
+            tracemalloc.start()
+        self.before, _ = tracemalloc.get_traced_memory()
+        self.rss_before = self.rss()
+
+    def run(self, request: Request, function, *args):
+        """
+        Calls `function(*args)` and accounts the memory it used to `request`, since `begin` if the window
+        is open (receiving the request included), otherwise from now on.
+
+        Args:
+            request (Request): The request being dispatched.
+            function: The dispatch function to call.
+            *args: Arguments for the dispatch function.
+
+        Returns:
+            Whatever `function` returns.
+        """
+        if self.before is None:
+            self.begin()
+        before, rss_before, self.before = self.before, self.rss_before, None
+        try:
+            return function(*args)
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            peak -= before
+            if peak >= self.threshold:
+                self._write("memory.log", f"{time.strftime('%Y-%m-%d %H:%M:%S')} pid={os.getpid()} "
+                                          f"cmd={request.cmd} path={request.remote_path} size={request.size} "
+                                          f"peak={peak} rss_delta={self.rss() - rss_before}\n")
+
+    def dump(self, signum=None, frame=None) -> None:
+        """
+        Writes the top allocation sites currently traced. Has a signal handler's signature.
+        """
+        statistics = tracemalloc.take_snapshot().statistics("lineno")[:self.top]
+        lines = [f"{time.strftime('%Y-%m-%d %H:%M:%S')} pid={os.getpid()} top {self.top} allocation sites:"]
+        lines += [f"  {stat}" for stat in statistics]
+        self._write(f"{os.getpid()}-{int(time.time())}-top.txt", "\n".join(lines) + "\n")
+
+    @staticmethod
+    def rss() -> int:
+        """
+        Returns the current resident set size of this process in bytes.
+
+        Falls back to the peak RSS from `getrusage` where /proc is not available.
+        """
+        try:
+            with open("/proc/self/statm", "r") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _write(self, name: str, text: str) -> None:
+        """
+        Appends text to a file in the output directory, or prints it if there is none.
+        """
+        if self.directory is None:
+            print(text, end="")
+            return
+        with open(os.path.join(self.directory, name), "a") as file:
+            file.write(text)
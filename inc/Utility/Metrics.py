@@ -0,0 +1,255 @@
+# Trey Rubino
+
+import mmap
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from ..Model.Response import Response, CODES as RESPONSE_CODES
+
+# Label values are fixed so every counter has a fixed position in shared memory.
+COMMANDS = ["get", "put", "ls", "cd", "mkdir", "rm", "cp", "mv", "cat", "pwd", "follow", "batch", "other"]
+CODES = ["OK"] + list(RESPONSE_CODES) + ["OTHER"]
+BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]   # seconds, +Inf is implicit
+
+# Per-command block: one count per bucket plus +Inf, latency sum (ns), bytes in, bytes out, one count per code
+COMMAND_BLOCK = len(BUCKETS) + 1 + 3 + len(CODES)
+SUM_OFFSET = len(BUCKETS) + 1
+BYTES_IN_OFFSET = SUM_OFFSET + 1
+BYTES_OUT_OFFSET = SUM_OFFSET + 2
+CODES_OFFSET = SUM_OFFSET + 3
+
+# Shard-wide counters after the command blocks
+SESSIONS_OPENED = len(COMMANDS) * COMMAND_BLOCK
+SESSIONS_CLOSED = SESSIONS_OPENED + 1
+ACCEPTS = SESSIONS_OPENED + 2
+FORKS = SESSIONS_OPENED + 3
+COMMITTED_FILES = SESSIONS_OPENED + 4                           # uploads committed, see Durability
+COMMITTED_BYTES = SESSIONS_OPENED + 5
+COMMIT_ROUNDS = SESSIONS_OPENED + 6                             # commits that called fsync (one per file, or per async group)
+FSYNC_CALLS = SESSIONS_OPENED + 7
+FSYNC_NS = SESSIONS_OPENED + 8
+SHARD_SIZE = SESSIONS_OPENED + 9
+
+class Metrics:
+    """
+    Server metrics aggregated across forked workers, exported in the Prometheus text format.
+
+    Counters live in anonymous shared memory created before the server forks. The memory is split into
+    shards of 64-bit counters: one per session table slot, one for workers that got no slot and one for
+    the acceptor. A process only increments counters in its own shard, so no locking is needed, and the
+    exporter sums all shards. Shards are never reset, so totals keep growing when slots are reused.
+    """
+
+    def __init__(self, slots: int = 256):
+        """
+        Allocates the shared counters.
+
+        Args:
+            slots (int): Number of worker shards, matching the session table size.
+        """
+        self.slots = slots
+        self.memory = mmap.mmap(-1, (slots + 2) * SHARD_SIZE * 8)
+        self.counters = memoryview(self.memory).cast('Q')
+        self.shard = (slots + 1) * SHARD_SIZE                   # acceptor shard until a worker calls `bind`
+        self.durability = None                                  # the server's durability mode, for the exporter
+
+    def bind(self, slot: int) -> None:
+        """
+        Selects the shard a worker writes to. Workers without a session table slot share the overflow
+        shard, where concurrent increments can occasionally be lost.
+
+        Args:
+            slot (int): The worker's session table slot, or None.
+        """
+        self.shard = (slot if slot is not None else self.slots) * SHARD_SIZE
+
+    def count_accept(self) -> None:
+        """
+        Counts an accepted connection. Called by the acceptor.
+        """
+        self.counters[self.shard + ACCEPTS] += 1
+
+    def count_fork(self) -> None:
+        """
+        Counts a forked worker. Called by the acceptor.
+        """
+        self.counters[self.shard + FORKS] += 1
+
+    def session_opened(self) -> None:
+        """
+        Counts a session starting in this worker.
+        """
+        self.counters[self.shard + SESSIONS_OPENED] += 1
+
+    def session_closed(self) -> None:
+        """
+        Counts a session ending in this worker.
+        """
+        self.counters[self.shard + SESSIONS_CLOSED] += 1
+
+    def count_commit(self, files: int, size: int, calls: int, seconds: float) -> None:
+        """
+        Records committed uploads and the `fsync` work it took to make them durable.
+
+        Args:
+            files (int): Uploads committed.
+            size (int): Their total size in bytes.
+            calls (int): `fsync` calls made, 0 when the mode does not sync.
+            seconds (float): Time spent syncing.
+        """
+        base = self.shard
+        self.counters[base + COMMITTED_FILES] += files
+        self.counters[base + COMMITTED_BYTES] += size
+        if calls:
+            self.counters[base + COMMIT_ROUNDS] += 1
+            self.counters[base + FSYNC_CALLS] += calls
+            self.counters[base + FSYNC_NS] += int(seconds * 1e9)
+
+    def observe(self, command: str, seconds: float, bytes_in: int, bytes_out: int, response: Response) -> None:
+        """
+        Records one handled request.
+
+        Args:
+            command (str): The request's command.
+            seconds (float): Time spent handling the request.
+            bytes_in (int): Bytes received for the request, including its payload.
+            bytes_out (int): Bytes sent for the request, including its payload.
+            response (Response): The final response, used for the code label (None counts as unspecified).
+        """
+        index = COMMANDS.index(command) if command in COMMANDS else len(COMMANDS) - 1
+        block = self.shard + index * COMMAND_BLOCK
+        bucket = 0
+        while bucket < len(BUCKETS) and seconds > BUCKETS[bucket]:
+            bucket += 1
+        self.counters[block + bucket] += 1
+        self.counters[block + SUM_OFFSET] += int(seconds * 1e9)
+        self.counters[block + BYTES_IN_OFFSET] += bytes_in
+        self.counters[block + BYTES_OUT_OFFSET] += bytes_out
+
+        if response is None:
+            code = "ERR_UNSPECIFIED"
+        else:
+            code = response.code or ("OK" if response.status == "success" else "ERR_UNSPECIFIED")
+        code_index = CODES.index(code) if code in CODES else len(CODES) - 1
+        self.counters[block + CODES_OFFSET + code_index] += 1
+
+    def totals(self) -> list:
+        """
+        Sums all shards.
+
+        Returns:
+            list: One total per counter position in a shard.
+        """
+        totals = [0] * SHARD_SIZE
+        for shard in range(self.slots + 2):
+            base = shard * SHARD_SIZE
+            for position, value in enumerate(self.counters[base:base + SHARD_SIZE]):
+                totals[position] += value
+        return totals
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        totals = self.totals()
+        lines = ["# HELP fileserver_request_duration_seconds Time spent handling a request, by command.",
+                 "# TYPE fileserver_request_duration_seconds histogram"]
+        for index, command in enumerate(COMMANDS):
+            block = index * COMMAND_BLOCK
+            cumulative = 0
+            for bucket, bound in enumerate(BUCKETS):
+                cumulative += totals[block + bucket]
+                lines.append(f'fileserver_request_duration_seconds_bucket{{command="{command}",le="{bound}"}} {cumulative}')
+            cumulative += totals[block + len(BUCKETS)]
+            lines.append(f'fileserver_request_duration_seconds_bucket{{command="{command}",le="+Inf"}} {cumulative}')
+            lines.append(f'fileserver_request_duration_seconds_sum{{command="{command}"}} {totals[block + SUM_OFFSET] / 1e9}')
+            lines.append(f'fileserver_request_duration_seconds_count{{command="{command}"}} {cumulative}')
+
+        lines += ["# HELP fileserver_requests_total Requests handled, by command.",
+                  "# TYPE fileserver_requests_total counter"]
+        for index, command in enumerate(COMMANDS):
+            block = index * COMMAND_BLOCK
+            lines.append(f'fileserver_requests_total{{command="{command}"}} {sum(totals[block:block + SUM_OFFSET])}')
+
+        lines += ["# HELP fileserver_received_bytes_total Bytes received from clients, by command.",
+                  "# TYPE fileserver_received_bytes_total counter"]
+        for index, command in enumerate(COMMANDS):
+            lines.append(f'fileserver_received_bytes_total{{command="{command}"}} {totals[index * COMMAND_BLOCK + BYTES_IN_OFFSET]}')
+
+        lines += ["# HELP fileserver_sent_bytes_total Bytes sent to clients, by command.",
+                  "# TYPE fileserver_sent_bytes_total counter"]
+        for index, command in enumerate(COMMANDS):
+            lines.append(f'fileserver_sent_bytes_total{{command="{command}"}} {totals[index * COMMAND_BLOCK + BYTES_OUT_OFFSET]}')
+
+        lines += ["# HELP fileserver_responses_total Final responses, by command and Response.code.",
+                  "# TYPE fileserver_responses_total counter"]
+        for index, command in enumerate(COMMANDS):
+            for code_index, code in enumerate(CODES):
+                value = totals[index * COMMAND_BLOCK + CODES_OFFSET + code_index]
+                if value:
+                    lines.append(f'fileserver_responses_total{{command="{command}",code="{code}"}} {value}')
+
+        lines += ["# HELP fileserver_active_sessions Sessions currently open.",
+                  "# TYPE fileserver_active_sessions gauge",
+                  f"fileserver_active_sessions {totals[SESSIONS_OPENED] - totals[SESSIONS_CLOSED]}",
+                  "# HELP fileserver_sessions_total Sessions started.",
+                  "# TYPE fileserver_sessions_total counter",
+                  f"fileserver_sessions_total {totals[SESSIONS_OPENED]}",
+                  "# HELP fileserver_accepts_total Connections accepted.",
+                  "# TYPE fileserver_accepts_total counter",
+                  f"fileserver_accepts_total {totals[ACCEPTS]}",
+                  "# HELP fileserver_forks_total Worker processes forked.",
+                  "# TYPE fileserver_forks_total counter",
+                  f"fileserver_forks_total {totals[FORKS]}",
+                  "# HELP fileserver_committed_files_total Uploads committed (renamed into place).",
+                  "# TYPE fileserver_committed_files_total counter",
+                  f"fileserver_committed_files_total {totals[COMMITTED_FILES]}",
+                  "# HELP fileserver_committed_bytes_total Bytes of committed uploads.",
+                  "# TYPE fileserver_committed_bytes_total counter",
+                  f"fileserver_committed_bytes_total {totals[COMMITTED_BYTES]}",
+                  "# HELP fileserver_commit_rounds_total Commits that synced, one per file in fsync mode and one per group in async mode, where the sync follows the reply.",
+                  "# TYPE fileserver_commit_rounds_total counter",
+                  f"fileserver_commit_rounds_total {totals[COMMIT_ROUNDS]}",
+                  "# HELP fileserver_fsync_calls_total fsync calls made to commit uploads.",
+                  "# TYPE fileserver_fsync_calls_total counter",
+                  f"fileserver_fsync_calls_total {totals[FSYNC_CALLS]}",
+                  "# HELP fileserver_fsync_seconds_total Time spent in fsync to commit uploads, the cost of the durability mode.",
+                  "# TYPE fileserver_fsync_seconds_total counter",
+                  f"fileserver_fsync_seconds_total {totals[FSYNC_NS] / 1e9}"]
+        if self.durability:
+            lines += ["# HELP fileserver_durability_mode The durability mode uploads are committed with.",
+                      "# TYPE fileserver_durability_mode gauge",
+                      f'fileserver_durability_mode{{mode="{self.durability}"}} 1']
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> HTTPServer:
+        """
+        Starts an HTTP exporter in a daemon thread. Any GET path returns the metrics.
+
+        Args:
+            port (int): Local port to listen on.
+            host (str): Address to bind, loopback by default.
+
+        Returns:
+            HTTPServer: The running server.
+        """
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass                                            # keep the monitor screen clean
+
+        server = HTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,150 @@
+# Trey Rubino
+
+import os
+import stat
+import mmap
+import time
+import errno
+import ctypes
+import ctypes.util
+import struct
+import platform
+import itertools
+
+from .SessionRoot import remove_tree
+
+REAPER_POLL = 1.0                                               # seconds between scans of an empty trash directory
+PROGRESS_EVERY = 1000                                           # unlinks between progress updates
+
+# ioprio_set(2) has a different number on each architecture (see the kernel's syscall tables)
+SYS_IOPRIO_SET = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "riscv64": 30, "armv7l": 314,
+                  "ppc64le": 273, "s390x": 282}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+
+# Shared memory written only by the reaper: state (0 idle, 1 deleting), entries waiting, entries and files
+# removed so far, and when the current entry was started. Single aligned 64-bit fields, so readers never
+# see a torn value, only one a moment old.
+PROGRESS_FORMAT = "=qqqqd"
+PROGRESS_SIZE = struct.calcsize(PROGRESS_FORMAT)
+
+class ReaperProgress:
+    """
+    The reaper's progress, in anonymous shared memory created before the server forks, so the session
+    monitor can show it.
+    """
+
+    def __init__(self):
+        self.memory = mmap.mmap(-1, PROGRESS_SIZE)             # anonymous mappings are MAP_SHARED, inherited by fork
+
+    def write(self, deleting: bool, pending: int, entries: int, files: int, started: float) -> None:
+        struct.pack_into(PROGRESS_FORMAT, self.memory, 0, int(deleting), pending, entries, files, started)
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: `deleting` (bool), `pending` (entries waiting in the trash), `entries` and `files`
+                  removed since the server started, and `started` (when the current entry was started).
+        """
+        deleting, pending, entries, files, started = struct.unpack_from(PROGRESS_FORMAT, self.memory, 0)
+        return {"deleting": bool(deleting), "pending": pending, "entries": entries, "files": files, "started": started}
+
+class Trash:
+    """
+    A server-managed directory that `rm -r` renames directories into, so the session can be answered at
+    once while the reaper deletes them in the background.
+
+    The directory must be on the same file system as the served directory, since a rename cannot cross
+    file systems, and must not be inside it, where clients could see it.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens the trash directory, creating it if needed. Called before the server forks, so every worker
+        and the reaper share the descriptor.
+
+        Args:
+            path (str): The trash directory.
+        """
+        self.path = os.path.abspath(path)
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+        self.device = os.fstat(self.fd).st_dev
+        self.counter = itertools.count()
+
+    def move(self, dir_fd: int, name: str) -> None:
+        """
+        Atomically renames `name` in `dir_fd` into the trash under a unique name.
+
+        Raises:
+            OSError: With EXDEV if the entry is on another file system; the caller must delete it itself.
+        """
+        if os.fstat(dir_fd).st_dev != self.device:
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV), name)
+        os.rename(name, f"{os.getpid()}-{time.time_ns()}-{next(self.counter)}", src_dir_fd=dir_fd, dst_dir_fd=self.fd)
+
+class Reaper:
+    """
+    Background process that empties the trash directory, at idle IO priority and lowest CPU priority so
+    deleting millions of files does not slow down the sessions still serving requests.
+    """
+
+    def __init__(self, trash: Trash, progress: ReaperProgress):
+        self.trash = trash
+        self.progress = progress
+        self.entries = 0
+        self.files = 0
+
+    def run(self) -> None:
+        """
+        Deletes everything in the trash, then checks again every `REAPER_POLL` seconds, until the process
+        that started the reaper exits.
+        """
+        parent = os.getppid()
+        lower_priority()
+        while os.getppid() == parent:
+            with os.scandir(self.trash.fd) as scan:
+                names = [entry.name for entry in scan]
+            if not names:
+                self.progress.write(False, 0, self.entries, self.files, 0.0)
+                time.sleep(REAPER_POLL)
+                continue
+            for index, name in enumerate(names):
+                self.progress.write(True, len(names) - index, self.entries, self.files, time.time())
+                try:
+                    if stat.S_ISDIR(os.stat(name, dir_fd=self.trash.fd, follow_symlinks=False).st_mode):
+                        remove_tree(self.trash.fd, name, self._removed)
+                    else:
+                        os.unlink(name, dir_fd=self.trash.fd)
+                        self._removed()
+                    self.entries += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Reaper could not remove {name}: {e}")
+                    time.sleep(REAPER_POLL)                     # do not spin on an entry that keeps failing
+
+    def _removed(self) -> None:
+        self.files += 1
+        if self.files % PROGRESS_EVERY == 0:
+            snapshot = self.progress.snapshot()
+            self.progress.write(True, snapshot["pending"], self.entries, self.files, snapshot["started"])
+
+def lower_priority() -> None:
+    """
+    Moves the calling process to the idle IO scheduling class, so its disk IO only runs when no one else
+    needs the disk, and to the lowest CPU priority. Either step is skipped where it is not available.
+    """
+    try:
+        os.nice(19)
+    except OSError:
+        pass
+    number = SYS_IOPRIO_SET.get(platform.machine())
+    if number is None:
+        return
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.syscall(number, IOPRIO_WHO_PROCESS, 0, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT)
+    except OSError:
+        pass
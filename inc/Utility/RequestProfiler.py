@@ -0,0 +1,62 @@
+# Trey Rubino
+
+import os
+import cProfile
+
+class RequestProfiler:
+    """
+    On-demand `cProfile` capture for a server worker.
+
+    While enabled, every `every`-th dispatched request runs under its own profiler and the stats are
+    dumped to `<directory>/<pid>-<sequence>-<command>.pstats`, ready for `pstats` or snakeviz. Profiling
+    is toggled at runtime with a signal (see `toggle`), so it costs nothing until it is switched on.
+    """
+
+    def __init__(self, directory: str, every: int = 1, enabled: bool = False):
+        """
+        Initializes the profiler.
+
+        Args:
+            directory (str): Directory for the `.pstats` files, created if needed.
+            every (int): Profile only every Nth request while enabled.
+            enabled (bool): Whether profiling starts switched on.
+        """
+        self.directory = os.path.abspath(directory)
+        self.every = max(1, every)
+        self.enabled = enabled
+        self.requests = 0                                       # requests seen while enabled
+        os.makedirs(self.directory, exist_ok=True)
+
+    def toggle(self, signum=None, frame=None) -> None:
+        """
+        Switches profiling on or off. Has a signal handler's signature so it can be installed directly.
+        """
+        self.enabled = not self.enabled
+        self.requests = 0
+        print(f"Worker {os.getpid()}: profiling {'enabled' if self.enabled else 'disabled'}")
+
+    def run(self, command: str, function, *args):
+        """
+        Calls `function(*args)`, under `cProfile` if this request is sampled.
+
+        Args:
+            command (str): The request's command, used in the file name.
+            function: The dispatch function to call.
+            *args: Arguments for the dispatch function.
+
+        Returns:
+            Whatever `function` returns.
+        """
+        if not self.enabled:
+            return function(*args)
+        self.requests += 1
+        if (self.requests - 1) % self.every:
+            return function(*args)
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(function, *args)
+        finally:
+            label = "".join(c for c in command if c.isalnum())[:16] or "unknown"    # cmd comes from the client
+            name = f"{os.getpid()}-{self.requests:06d}-{label}.pstats"
+            profile.dump_stats(os.path.join(self.directory, name))
@@ -12,6 +12,8 @@ class Session():
         Initializes a Session instance with an empty dictionary to store client connections.
         """
         self.connections = {}
+        self.table_clients = set()      # clients whose data comes from the shared session table
+        self.reaper = None              # last progress of the background rm -r reaper, if one runs
 
     def update_connections(self, client_id, connection):
         """
@@ -23,6 +25,55 @@ class Session():
         """
         self.connections[client_id] = connection
 
+    def update_from_table(self, sessions):
+        """
+        Replaces the connections that come from the shared session table with a fresh snapshot.
+        Clients that are no longer in the table are removed.
+
+        Args:
+            sessions (dict): Client ID -> connection details, as returned by `SessionTable.snapshot`.
+
+        Returns:
+            bool: True if any client was added, removed or updated since the last snapshot.
+        """
+        changed = False
+        for client_id in self.table_clients - sessions.keys():
+            self.connections.pop(client_id, None)
+            changed = True
+        for client_id, connection in sessions.items():
+            previous = self.connections.get(client_id)
+            if previous is None or previous.get('seq') != connection['seq']:
+                changed = True
+            self.connections[client_id] = connection
+        self.table_clients = set(sessions)
+        return changed
+
+    def update_reaper(self, progress):
+        """
+        Records the reaper's progress.
+
+        Args:
+            progress (dict): As returned by `ReaperProgress.snapshot`.
+
+        Returns:
+            bool: True if the progress changed since the last update.
+        """
+        changed = progress != self.reaper
+        self.reaper = progress
+        return changed
+
+    def reaper_status(self):
+        """
+        Describes the reaper's progress in one line, or returns None if no reaper runs.
+        """
+        if self.reaper is None:
+            return None
+        totals = f"{self.reaper['entries']} trashed, {self.reaper['files']} entries deleted"
+        if not self.reaper['deleting']:
+            return f"Trash reaper: idle, {totals}"
+        elapsed = (datetime.now() - datetime.fromtimestamp(self.reaper['started'])).total_seconds()
+        return f"Trash reaper: deleting ({self.reaper['pending']} pending, current for {elapsed:.0f}s), {totals}"
+
     def display_clients(self):
         """
         Displays the details of all connected clients, including their connection duration, last command, and current directory.
@@ -35,33 +86,44 @@ class Session():
             - Connection Length (in seconds)
             - Last Command
             - Current Directory
+            - Commands, Bytes In and Bytes Out (for clients tracked in the session table)
             If no clients are connected, prints a message indicating no connections.
+            The reaper's progress follows, if a reaper runs.
         """
         if not self.connections:
             print("\nNo connected clients at the moment.")
+            if self.reaper_status():
+                print(self.reaper_status(), flush=True)
             return
 
-        print("=" * 90)
-        print("{:<10} | {:<20} | {:<12} | {:<12} | {:<20}".format(
-            "Client ID", "IP Address", "Conn Length", "Last Command", "Current Directory"))
-        print("=" * 90)
-        print("-" * 90)
+        # Build the whole table first and print it once, so a redraw is a single write
+        lines = ["=" * 130,
+                 "{:<10} | {:<20} | {:<12} | {:<12} | {:<20} | {:<6} | {:<12} | {:<12}".format(
+                     "Client ID", "IP Address", "Conn Length", "Last Command", "Current Directory",
+                     "Cmds", "Bytes In", "Bytes Out"),
+                 "=" * 130,
+                 "-" * 130]
 
         disconnected_clients = []
+        current_time = datetime.now()  # Get the current time
         for client_id, connection in self.connections.items():
             ip = connection['ip_address']
             start_time = datetime.fromisoformat(connection['start_time'])  # Parse the start_time string
-            current_time = datetime.now()  # Get the current time
             connection_duration = (current_time - start_time).total_seconds()  # Calculate duration in seconds
             last_cmd = connection['last_command']
             current_directory = connection['current_working_directory']
-            print("{:<10} | {:<20} | {:<12} | {:<12} | {:<20}".format(
-                client_id, str(ip), str(connection_duration), str(last_cmd), str(current_directory)))
-            print("-" * 90)
+            lines.append("{:<10} | {:<20} | {:<12} | {:<12} | {:<20} | {:<6} | {:<12} | {:<12}".format(
+                client_id, str(ip), str(connection_duration), str(last_cmd), str(current_directory),
+                str(connection.get('commands', '-')), str(connection.get('bytes_in', '-')),
+                str(connection.get('bytes_out', '-'))))
+            lines.append("-" * 130)
 
             if str(last_cmd) == 'exit':
                 disconnected_clients.append(client_id)
-        print("=" * 90)
+        lines.append("=" * 130)
+        if self.reaper_status():
+            lines.append(self.reaper_status())
+        print("\n".join(lines), flush=True)
 
         for client_id in disconnected_clients:
             del self.connections[client_id]
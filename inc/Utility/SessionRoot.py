@@ -0,0 +1,371 @@
+# Trey Rubino
+
+import os
+import stat
+import fcntl
+import errno
+import ctypes
+import ctypes.util
+import posixpath
+
+from .sec_check import normalize_path
+
+# openat2(2): struct open_how and the resolve flags used here (see linux/openat2.h)
+SYS_OPENAT2 = 437                                               # same number on every Linux architecture
+AT_FDCWD = -100
+RESOLVE_NO_MAGICLINKS = 0x02
+RESOLVE_BENEATH = 0x08
+MAX_SYMLINKS = 40                                               # matches the kernel's limit
+FICLONE = 0x40049409                                            # ioctl sharing a file's extents with another (reflink)
+COPY_CHUNK = 1024 * 1024                                        # bytes per copy_file_range or read/write step
+
+class OpenHow(ctypes.Structure):
+    _fields_ = [("flags", ctypes.c_uint64), ("mode", ctypes.c_uint64), ("resolve", ctypes.c_uint64)]
+
+_libc = None
+_openat2_supported = None                                       # decided by `probe_openat2`
+
+def openat2(dir_fd: int, path: str, flags: int, mode: int = 0) -> int:
+    """
+    Opens `path` relative to `dir_fd` with `RESOLVE_BENEATH`: the kernel refuses any resolution, through
+    "..", an absolute path or a symlink, that would leave the directory, with EXDEV.
+
+    Returns:
+        int: The new file descriptor, or None if the kernel (or a seccomp filter) does not provide openat2,
+             as found by `probe_openat2`.
+    """
+    if _openat2_supported is None:
+        probe_openat2(dir_fd)
+    if not _openat2_supported:
+        return None
+    return _openat2(dir_fd, path, flags, mode)
+
+def probe_openat2(dir_fd: int) -> bool:
+    """
+    Decides once per process whether openat2 can be used, by opening "." beneath `dir_fd`, which cannot
+    fail for a reason of its own. Errors of later calls (EPERM from the protected_regular check on
+    `O_CREAT` in sticky directories, EINVAL for odd flags) are then reported instead of being mistaken for
+    missing support.
+
+    Returns:
+        bool: Whether openat2 is used.
+    """
+    global _libc, _openat2_supported
+    if _openat2_supported is not None:
+        return _openat2_supported
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        os.close(_openat2(dir_fd, ".", os.O_RDONLY | os.O_DIRECTORY))
+        _openat2_supported = True
+    except OSError:
+        _openat2_supported = False                              # old kernel or blocked syscall, walk in user space
+    return _openat2_supported
+
+def _openat2(dir_fd: int, path: str, flags: int, mode: int = 0) -> int:
+    how = OpenHow(flags | os.O_CLOEXEC, mode if flags & os.O_CREAT else 0, RESOLVE_BENEATH | RESOLVE_NO_MAGICLINKS)
+    fd = _libc.syscall(SYS_OPENAT2, ctypes.c_int(dir_fd), os.fsencode(path), ctypes.byref(how),
+                       ctypes.c_size_t(ctypes.sizeof(how)))
+    if fd >= 0:
+        return fd
+    error = ctypes.get_errno()
+    if error == errno.EXDEV:
+        raise PermissionError(errno.EACCES, "Path leaves the served directory", path)
+    raise OSError(error, os.strerror(error), path)
+
+def walk_beneath(dir_fd: int, path: str, flags: int, mode: int = 0o666) -> int:
+    """
+    The `RESOLVE_BENEATH` walk done in user space, for kernels without openat2: each component is opened
+    relative to its parent with `O_NOFOLLOW`, symlinks are expanded by hand, and ".." may not climb above
+    `dir_fd`. Absolute symlink targets are refused, as the kernel does.
+
+    Returns:
+        int: The new file descriptor.
+    """
+    pending = [part for part in path.split('/') if part and part != '.']
+    stack = [os.dup(dir_fd)]                                    # open directories from `dir_fd` down
+    links = 0
+    try:
+        while pending:
+            name = pending.pop(0)
+            if name == '..':
+                if len(stack) == 1:
+                    raise PermissionError(errno.EACCES, "Path leaves the served directory", path)
+                os.close(stack.pop())
+                continue
+            try:
+                if not pending:
+                    return os.open(name, flags | os.O_NOFOLLOW | os.O_CLOEXEC, mode, dir_fd=stack[-1])
+                stack.append(os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW | os.O_CLOEXEC, dir_fd=stack[-1]))
+            except OSError as e:
+                if e.errno not in (errno.ELOOP, errno.ENOTDIR):
+                    raise
+                try:
+                    target = os.readlink(name, dir_fd=stack[-1])
+                except OSError:
+                    raise e                                     # a real ENOTDIR, not a symlink
+                links += 1
+                if links > MAX_SYMLINKS:
+                    raise OSError(errno.ELOOP, os.strerror(errno.ELOOP), path)
+                if target.startswith('/'):
+                    raise PermissionError(errno.EACCES, "Path leaves the served directory", path)
+                pending[:0] = [part for part in target.split('/') if part and part != '.']
+        return os.open('.', flags | os.O_CLOEXEC, mode, dir_fd=stack[-1])
+    finally:
+        for fd in stack:
+            os.close(fd)
+
+def remove_tree(dir_fd: int, name: str, removed=None) -> None:
+    """
+    Removes the directory `name` in `dir_fd` and everything below it, without following symlinks.
+
+    Args:
+        removed (callable, optional): Called with no arguments after each entry is removed, for progress.
+    """
+    fd = os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW | os.O_CLOEXEC, dir_fd=dir_fd)
+    try:
+        with os.scandir(fd) as scan:
+            entries = list(scan)
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                remove_tree(fd, entry.name, removed)
+            else:
+                os.unlink(entry.name, dir_fd=fd)
+                if removed:
+                    removed()
+    finally:
+        os.close(fd)
+    os.rmdir(name, dir_fd=dir_fd)
+    if removed:
+        removed()
+
+def copy_file(src_fd: int, dst_fd: int) -> None:
+    """
+    Copies the contents of one open file to another without passing them through Python where possible:
+    first as a reflink (`FICLONE`, on Btrfs, XFS and other copy-on-write file systems), then with
+    `copy_file_range`, which copies inside the kernel and lets NFS and similar servers copy server-side,
+    and finally with a plain read/write loop.
+    """
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return
+    except OSError:
+        pass                                                    # not supported here, copy the bytes
+    copied = 0
+    if hasattr(os, "copy_file_range"):                          # Python 3.8+ on Linux
+        try:
+            while True:
+                count = os.copy_file_range(src_fd, dst_fd, COPY_CHUNK)
+                if not count:
+                    return
+                copied += count
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP) or copied:
+                raise
+    while True:
+        data = os.read(src_fd, COPY_CHUNK)
+        if not data:
+            return
+        view = memoryview(data)
+        while view:
+            view = view[os.write(dst_fd, view):]
+
+def copy_tree(src_fd: int, dst_dir_fd: int, dst_name: str) -> None:
+    """
+    Copies the open directory `src_fd`, and everything below it, to the new directory `dst_name` in
+    `dst_dir_fd`. Nothing below the source is followed: symlinks are copied as symlinks.
+    """
+    with os.scandir(src_fd) as scan:
+        names = [entry.name for entry in scan]                  # listed first, a copy made inside the source is not copied again
+    os.mkdir(dst_name, stat.S_IMODE(os.fstat(src_fd).st_mode), dir_fd=dst_dir_fd)
+    dst_fd = os.open(dst_name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW | os.O_CLOEXEC, dir_fd=dst_dir_fd)
+    try:
+        for name in names:
+            copy_entry(src_fd, name, dst_fd, name)
+    finally:
+        os.close(dst_fd)
+
+def copy_entry(src_dir_fd: int, src_name: str, dst_dir_fd: int, dst_name: str) -> None:
+    """
+    Copies `src_name` in `src_dir_fd` to the new name `dst_name` in `dst_dir_fd` without following it:
+    a symlink as a symlink, a directory with `copy_tree` and a regular file with `copy_file`. Other file
+    types (devices, sockets, FIFOs) are skipped.
+    """
+    stats = os.stat(src_name, dir_fd=src_dir_fd, follow_symlinks=False)
+    if stat.S_ISLNK(stats.st_mode):
+        os.symlink(os.readlink(src_name, dir_fd=src_dir_fd), dst_name, dir_fd=dst_dir_fd)
+        return
+    if not stat.S_ISDIR(stats.st_mode) and not stat.S_ISREG(stats.st_mode):
+        return
+    src_fd = os.open(src_name, os.O_RDONLY | os.O_NOFOLLOW | os.O_CLOEXEC, dir_fd=src_dir_fd)
+    try:
+        if stat.S_ISDIR(stats.st_mode):
+            copy_tree(src_fd, dst_dir_fd, dst_name)
+            return
+        dst_fd = os.open(dst_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC,
+                         stat.S_IMODE(stats.st_mode), dir_fd=dst_dir_fd)
+        try:
+            copy_file(src_fd, dst_fd)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+class SessionRoot:
+    """
+    Open directory descriptors for the served directory and a session's current directory.
+
+    Request paths are resolved relative to these descriptors instead of being rebuilt into absolute paths,
+    so the kernel only walks the part of the path below the current directory, and containment is enforced
+    by the kernel with openat2 `RESOLVE_BENEATH` (or by an equivalent component-by-component walk where
+    openat2 is not available). That covers symlinks and ".." components that a string check cannot see.
+
+    The current directory is kept as a path relative to the root, like a shell's logical working directory:
+    "cd .." leaves the directory named in the last "cd", even if that was reached through a symlink.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens the root directory; the session starts in it.
+
+        Args:
+            path (str): The served directory.
+        """
+        self.path = normalize_path(path)
+        self.root_fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+        probe_openat2(self.root_fd)
+        self.cwd_fd = os.dup(self.root_fd)
+        self.cwd = ""                                           # current directory relative to the root, "" is the root
+
+    @property
+    def working_directory(self) -> str:
+        """
+        The current directory as an absolute path, for display.
+        """
+        return posixpath.join(self.path, self.cwd) if self.cwd else self.path
+
+    def absolute(self, path: str) -> str:
+        """
+        The absolute path a request path names, for messages. Does not check containment.
+        """
+        return posixpath.normpath(posixpath.join(self.working_directory, path or ''))
+
+    def relative(self, path: str) -> str:
+        """
+        Resolves a request path, absolute or relative to the current directory, to a path relative to the root.
+        This is a string check only; symlinks are checked when the path is opened.
+
+        Raises:
+            PermissionError: If the path names something outside the root.
+        """
+        path = path or ''
+        if posixpath.isabs(path):
+            path = posixpath.normpath(path)
+            if path != self.path and not path.startswith(self.path.rstrip('/') + '/'):
+                raise PermissionError(errno.EACCES, "Path leaves the served directory", path)
+            relative = posixpath.relpath(path, self.path)
+        else:
+            relative = posixpath.normpath(posixpath.join(self.cwd, path))
+        if relative == '..' or relative.startswith('../'):
+            raise PermissionError(errno.EACCES, "Path leaves the served directory", path)
+        return '' if relative == '.' else relative
+
+    def within(self, path: str) -> bool:
+        """
+        Whether a request path names something inside the root, without touching the file system.
+        """
+        try:
+            self.relative(path)
+            return True
+        except PermissionError:
+            return False
+
+    def open(self, path: str, flags: int = os.O_RDONLY, mode: int = 0o666) -> int:
+        """
+        Opens a request path beneath the root.
+
+        Args:
+            path (str): The request path.
+            flags (int): `os.open` flags.
+            mode (int): Permissions for a created file.
+
+        Returns:
+            int: The new file descriptor, owned by the caller.
+
+        Raises:
+            PermissionError: If the path, or a symlink on it, leads outside the root.
+        """
+        return self._open(self.relative(path), flags, mode)
+
+    def parent(self, path: str) -> tuple:
+        """
+        Opens the directory containing a request path, for operations on the last component itself
+        (`mkdir`, `unlink`, `rmdir`) that must not follow it if it is a symlink.
+
+        Returns:
+            tuple: The parent's file descriptor, owned by the caller, and the last component's name.
+
+        Raises:
+            PermissionError: If the path leads outside the root or is the root itself.
+        """
+        return self._parent(self.relative(path))
+
+    def makedirs(self, path: str) -> None:
+        """
+        Creates a directory and any missing parents beneath the root, like `os.makedirs`.
+
+        Raises:
+            FileExistsError: If the directory already exists.
+        """
+        parts = self.relative(path).split('/')
+        for depth in range(1, len(parts) + 1):
+            fd, name = self._parent('/'.join(parts[:depth]))
+            try:
+                os.mkdir(name, dir_fd=fd)
+            except FileExistsError:
+                if depth == len(parts):
+                    raise
+            finally:
+                os.close(fd)
+
+    def chdir(self, path: str) -> str:
+        """
+        Makes a directory beneath the root the current directory. The process also changes into it, so
+        code that still uses plain relative paths agrees with the session.
+
+        Returns:
+            str: The new current directory as an absolute path.
+        """
+        relative = self.relative(path)
+        fd = self._open(relative, os.O_RDONLY | os.O_DIRECTORY)
+        os.fchdir(fd)
+        os.close(self.cwd_fd)
+        self.cwd_fd, self.cwd = fd, relative
+        return self.working_directory
+
+    def close(self) -> None:
+        os.close(self.cwd_fd)
+        os.close(self.root_fd)
+
+    def _open(self, relative: str, flags: int, mode: int = 0o666) -> int:
+        """
+        Opens a root-relative path, walking from the current directory when the path is below it.
+        """
+        if not self.cwd or relative == self.cwd or relative.startswith(self.cwd + '/'):
+            try:
+                return self._open_beneath(self.cwd_fd, relative[len(self.cwd):].lstrip('/'), flags, mode)
+            except PermissionError:
+                if not self.cwd:
+                    raise                                       # a symlink may leave the current directory but not the root
+        return self._open_beneath(self.root_fd, relative, flags, mode)
+
+    def _parent(self, relative: str) -> tuple:
+        if not relative:
+            raise PermissionError(errno.EACCES, "Cannot operate on the served directory itself", self.path)
+        head, name = posixpath.split(relative)
+        return self._open(head, os.O_RDONLY | os.O_DIRECTORY), name
+
+    @staticmethod
+    def _open_beneath(dir_fd: int, path: str, flags: int, mode: int) -> int:
+        fd = openat2(dir_fd, path or '.', flags, mode)
+        return fd if fd is not None else walk_beneath(dir_fd, path, flags, mode)
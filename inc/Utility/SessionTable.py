@@ -0,0 +1,179 @@
+# Trey Rubino
+
+import os
+import mmap
+import time
+import struct
+from datetime import datetime
+
+from ..Model.Connection import Connection
+
+# One fixed-size slot per worker. `seq` is the seqlock counter: odd while the owner is writing.
+# pid 0 means free, -1 means reserved by the acceptor for a worker that has not started yet.
+SLOT_FORMAT = "=Iiqdd16s256s46sHQQ"
+SLOT_SIZE = struct.calcsize(SLOT_FORMAT)
+SEQ_FORMAT = "=I"
+PID_FORMAT = "=i"
+PID_OFFSET = struct.calcsize(SEQ_FORMAT)
+SNAPSHOT_RETRIES = 1000
+
+class SessionTable:
+    """
+    Fixed-slot session table in anonymous shared memory, created before the server forks.
+
+    Each worker owns one slot and updates it in place, so reporting a command costs a few `struct`
+    writes instead of a JSON dump, a pipe write and a parse in the monitor. Writers follow a seqlock
+    protocol (bump `seq` to odd, write, bump to even); readers retry until they copy a slot whose
+    `seq` is even and unchanged across the copy, so they never see a torn update.
+
+    Ownership: only the acceptor reserves slots (`acquire`) and frees slots of reaped workers (`reap`);
+    a worker only writes its own slot (`open`, `update`, `release`).
+    """
+
+    def __init__(self, slots: int = 256):
+        """
+        Allocates the shared table.
+
+        Args:
+            slots (int): Maximum number of sessions tracked at once.
+        """
+        self.slots = slots
+        self.memory = mmap.mmap(-1, slots * SLOT_SIZE)          # anonymous mappings are MAP_SHARED, inherited by fork
+        self.owners = {}                                        # acceptor only: worker pid -> slot
+
+    def acquire(self) -> int:
+        """
+        Reserves a free slot for the next worker. Called by the acceptor before it forks.
+
+        Returns:
+            int: The reserved slot, or None if the table is full.
+        """
+        reserved = set(self.owners.values())
+        for slot in range(self.slots):
+            if slot not in reserved and self._pid(slot) == 0:
+                self._write(slot, -1, 0, 0.0, 0.0, b"", b"", b"", 0, 0, 0)
+                return slot
+        return None
+
+    def assign(self, slot: int, pid: int) -> None:
+        """
+        Records which worker a reserved slot belongs to. Called by the acceptor after it forks.
+
+        Args:
+            slot (int): The slot returned by `acquire`.
+            pid (int): The worker's process ID.
+        """
+        if slot is not None:
+            self.owners[pid] = slot
+
+    def reap(self, pid: int) -> None:
+        """
+        Frees the slot of a worker that has exited, even if it died without releasing it.
+
+        Args:
+            pid (int): The process ID returned by `waitpid`.
+        """
+        slot = self.owners.pop(pid, None)
+        if slot is not None:
+            self.release(slot)
+
+    def open(self, slot: int, connection: Connection) -> None:
+        """
+        Publishes a new session in the worker's slot.
+
+        Args:
+            slot (int): The worker's slot.
+            connection (Connection): The client connection handled by this worker.
+        """
+        ip, port = self._address(connection)
+        self._write(slot, os.getpid(), 0, connection.start_time.timestamp(), time.time(),
+                    b"", b"", ip, port, 0, 0)
+
+    def update(self, slot: int, connection: Connection, bytes_in: int, bytes_out: int) -> None:
+        """
+        Records a finished command in the worker's slot.
+
+        Args:
+            slot (int): The worker's slot.
+            connection (Connection): The connection, with its last command and directory already updated.
+            bytes_in (int): Total bytes received on the connection so far.
+            bytes_out (int): Total bytes sent on the connection so far.
+        """
+        offset = slot * SLOT_SIZE
+        (_, pid, commands, start, _, _, _, ip, port, _, _) = struct.unpack_from(SLOT_FORMAT, self.memory, offset)
+        self._write(slot, pid, commands + 1, start, time.time(),
+                    (connection.last_command or "").encode('utf-8')[:16],
+                    (connection.current_working_directory or "").encode('utf-8')[:256],
+                    ip, port, bytes_in, bytes_out)
+
+    def release(self, slot: int) -> None:
+        """
+        Marks a slot as free.
+
+        Args:
+            slot (int): The slot to free.
+        """
+        self._write(slot, 0, 0, 0.0, 0.0, b"", b"", b"", 0, 0, 0)
+
+    def snapshot(self) -> dict:
+        """
+        Returns a consistent copy of every active session.
+
+        Returns:
+            dict: Client ID (worker pid) -> connection data, with the same keys as `Connection.to_dict`
+                  plus `commands`, `bytes_in`, `bytes_out` and `seq`.
+        """
+        sessions = {}
+        for slot in range(self.slots):
+            offset = slot * SLOT_SIZE
+            raw = None
+            for _ in range(SNAPSHOT_RETRIES):
+                seq = struct.unpack_from(SEQ_FORMAT, self.memory, offset)[0]
+                if seq & 1:
+                    continue                                    # writer in progress
+                copy = self.memory[offset:offset + SLOT_SIZE]
+                if struct.unpack_from(SEQ_FORMAT, self.memory, offset)[0] == seq:
+                    raw = copy
+                    break
+            if raw is None:
+                continue                                        # owner died mid-write, `reap` will clean up
+            (seq, pid, commands, start, _, command, cwd, ip, port,
+             bytes_in, bytes_out) = struct.unpack(SLOT_FORMAT, raw)
+            if pid <= 0:
+                continue
+            sessions[pid] = {
+                "client_id": pid,
+                "ip_address": [ip.rstrip(b"\0").decode('utf-8'), port],
+                "start_time": datetime.fromtimestamp(start).isoformat(),
+                "last_command": command.rstrip(b"\0").decode('utf-8', 'replace') or None,
+                "current_working_directory": cwd.rstrip(b"\0").decode('utf-8', 'replace') or None,
+                "commands": commands,
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "seq": seq,
+            }
+        return sessions
+
+    def _pid(self, slot: int) -> int:
+        return struct.unpack_from(PID_FORMAT, self.memory, slot * SLOT_SIZE + PID_OFFSET)[0]
+
+    def _write(self, slot: int, *fields) -> None:
+        """
+        Writes a whole slot under the seqlock.
+        """
+        offset = slot * SLOT_SIZE
+        seq = struct.unpack_from(SEQ_FORMAT, self.memory, offset)[0]
+        begin = seq if seq & 1 else (seq + 1) & 0xFFFFFFFF     # an odd seq left behind by a dead writer stays odd
+        struct.pack_into(SEQ_FORMAT, self.memory, offset, begin)
+        struct.pack_into(SLOT_FORMAT, self.memory, offset, begin, *fields)
+        struct.pack_into(SEQ_FORMAT, self.memory, offset, (begin + 1) & 0xFFFFFFFF)
+
+    @staticmethod
+    def _address(connection: Connection):
+        """
+        Splits the connection's address into an encoded IP and a port.
+        """
+        address = connection.ip_address
+        if isinstance(address, (tuple, list)):
+            return str(address[0]).encode('utf-8')[:46], int(address[1])
+        return str(address).encode('utf-8')[:46], 0
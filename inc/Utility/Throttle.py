@@ -0,0 +1,188 @@
+# Trey Rubino
+
+import mmap
+import time
+import zlib
+import struct
+import multiprocessing
+
+THROTTLE_CHUNK = 64 * 1024                                      # largest slice of payload sent per reservation
+LOCK_TIMEOUT = 1.0                                              # seconds to wait for the shared lock before skipping it
+
+# Shared memory: the global bucket, then one slot per client IP. A bucket is stored as the time at which
+# it will be full again, so a slot whose time has passed holds no state and can be reused for another IP.
+GLOBAL_FORMAT = "=d"
+GLOBAL_SIZE = struct.calcsize(GLOBAL_FORMAT)
+IP_SLOT_FORMAT = "=46sd"
+IP_SLOT_SIZE = struct.calcsize(IP_SLOT_FORMAT)
+
+def charge(full_at: float, size: int, now: float, rate: float, burst: float) -> tuple:
+    """
+    Takes `size` tokens from a token bucket and says how long to wait before using them.
+
+    The bucket holds `burst` bytes and refills at `rate` bytes per second. Instead of a token count it is
+    stored as the time at which it will be full again, which needs no refill step and fits in one double.
+    The tokens are reserved immediately, even when the caller has to wait, so concurrent callers queue up
+    in order instead of racing for the refill.
+
+    Args:
+        full_at (float): When the bucket will be full again, on the `time.monotonic` clock.
+        size (int): Bytes to take.
+        now (float): The current `time.monotonic`.
+        rate (float): Refill rate in bytes per second.
+        burst (float): Bucket capacity in bytes.
+
+    Returns:
+        tuple: The bucket's new `full_at`, and the seconds to wait before sending (0 or less means now).
+    """
+    full_at = max(full_at, now) + size / rate
+    return full_at, full_at - now - burst / rate
+
+class TokenBucket:
+    """
+    Token bucket owned by a single worker, for the per-session limit.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate (float): Refill rate in bytes per second.
+            burst (float): Bucket capacity in bytes.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.full_at = 0.0
+
+    def reserve(self, size: int, now: float) -> float:
+        """
+        Takes `size` tokens and returns the seconds to wait before using them.
+        """
+        self.full_at, delay = charge(self.full_at, size, now, self.rate, self.burst)
+        return delay
+
+class SharedBuckets:
+    """
+    Global and per-client-IP token buckets in anonymous shared memory, created before the server forks.
+
+    Every worker charges the same buckets, so the limits hold across all sessions. Updates take a
+    process-shared lock held only for a few `struct` reads and writes. If a worker dies holding it, other
+    workers stop waiting after `LOCK_TIMEOUT` and send without the shared limits rather than stall.
+
+    IPs are tracked in a fixed number of slots. A slot is reused once its bucket has refilled; if every
+    slot is busy, IPs hashing to the same slot share one bucket, which only makes their limit stricter.
+    """
+
+    def __init__(self, global_rate: float = None, ip_rate: float = None, burst: float = 0.25, slots: int = 256):
+        """
+        Allocates the shared buckets.
+
+        Args:
+            global_rate (float, optional): Bytes per second across all sessions, unlimited if not given.
+            ip_rate (float, optional): Bytes per second per client IP, unlimited if not given.
+            burst (float): Seconds of traffic a full bucket lets through at once.
+            slots (int): Number of client IPs tracked at once.
+        """
+        self.global_rate = global_rate
+        self.ip_rate = ip_rate
+        self.global_burst = global_rate * burst if global_rate else 0
+        self.ip_burst = ip_rate * burst if ip_rate else 0
+        self.slots = slots
+        self.memory = mmap.mmap(-1, GLOBAL_SIZE + slots * IP_SLOT_SIZE)   # anonymous mappings are MAP_SHARED, inherited by fork
+        self.lock = multiprocessing.Lock()                                  # a semaphore, also inherited by fork
+
+    def reserve(self, ip: bytes, size: int, now: float) -> float:
+        """
+        Takes `size` tokens from the global bucket and the IP's bucket.
+
+        Args:
+            ip (bytes): The client's encoded IP address.
+            size (int): Bytes to take.
+            now (float): The current `time.monotonic`.
+
+        Returns:
+            float: The seconds to wait before using them, the longest of the two.
+        """
+        if not self.lock.acquire(timeout=LOCK_TIMEOUT):
+            return 0.0
+        try:
+            delay = 0.0
+            if self.global_rate:
+                full_at, wait = charge(struct.unpack_from(GLOBAL_FORMAT, self.memory, 0)[0],
+                                       size, now, self.global_rate, self.global_burst)
+                struct.pack_into(GLOBAL_FORMAT, self.memory, 0, full_at)
+                delay = max(delay, wait)
+            if self.ip_rate:
+                offset = self._slot(ip, now)
+                full_at, wait = charge(struct.unpack_from(IP_SLOT_FORMAT, self.memory, offset)[1],
+                                       size, now, self.ip_rate, self.ip_burst)
+                struct.pack_into(IP_SLOT_FORMAT, self.memory, offset, ip, full_at)
+                delay = max(delay, wait)
+            return delay
+        finally:
+            self.lock.release()
+
+    def _slot(self, ip: bytes, now: float) -> int:
+        """
+        Finds the offset of the IP's slot, claiming a refilled one if it has none. Called under the lock.
+        """
+        free = None
+        for slot in range(self.slots):
+            offset = GLOBAL_SIZE + slot * IP_SLOT_SIZE
+            owner, full_at = struct.unpack_from(IP_SLOT_FORMAT, self.memory, offset)
+            if owner.rstrip(b"\0") == ip:
+                return offset
+            if free is None and full_at <= now:
+                free = offset
+        if free is None:
+            return GLOBAL_SIZE + zlib.crc32(ip) % self.slots * IP_SLOT_SIZE
+        struct.pack_into(IP_SLOT_FORMAT, self.memory, free, ip, 0.0)
+        return free
+
+class Throttle:
+    """
+    Paces one worker's payload bytes against its session bucket and the shared IP and global buckets.
+    Only file payloads are paced; protocol messages are never delayed, so metadata commands stay fast.
+    """
+
+    def __init__(self, ip_address, session_rate: float = None, shared: SharedBuckets = None, burst: float = 0.25):
+        """
+        Args:
+            ip_address: The client's address, as returned by `accept`.
+            session_rate (float, optional): Bytes per second for this session, unlimited if not given.
+            shared (SharedBuckets, optional): The server's global and per-IP buckets.
+            burst (float): Seconds of traffic a full session bucket lets through at once.
+        """
+        address = ip_address[0] if isinstance(ip_address, (tuple, list)) else ip_address
+        self.ip = str(address).encode('utf-8')[:46]
+        self.session = TokenBucket(session_rate, session_rate * burst) if session_rate else None
+        self.shared = shared
+        self.waited = 0.0                                       # total seconds spent throttled
+
+    def wait(self, size: int) -> None:
+        """
+        Takes `size` tokens from every bucket, sleeping until the slowest of them allows it.
+
+        Args:
+            size (int): Bytes about to be sent, or just received.
+        """
+        now = time.monotonic()
+        delay = self.session.reserve(size, now) if self.session else 0.0
+        if self.shared:
+            delay = max(delay, self.shared.reserve(self.ip, size, now))
+        if delay > 0:
+            time.sleep(delay)
+            self.waited += delay
+
+    def sendall(self, conn, data: bytes) -> None:
+        """
+        Sends a payload in slices of at most `THROTTLE_CHUNK` bytes, each one paced by `wait`.
+
+        Args:
+            conn: The socket to send on.
+            data (bytes): The payload.
+        """
+        view = memoryview(data)
+        for start in range(0, len(view), THROTTLE_CHUNK):
+            chunk = view[start:start + THROTTLE_CHUNK]
+            self.wait(len(chunk))
+            conn.sendall(chunk)
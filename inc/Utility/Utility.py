@@ -2,16 +2,28 @@
 
 import os
 import stat
+import errno
 import grp
 import pwd
-import shutil
+import select
+import socket
+import hashlib
 from datetime import datetime
 from typing import Type
 
 from ..Model.Request import Request
 from ..Model.Response import Response, Content
 from ..Model.CustomProtocol import CustomProtocol
+from ..Model.Codec import JSON, CODECS
+from ..Model.Handshake import PROTOCOL_VERSION, CAPABILITIES, supported
 from .sec_check import normalize_path
+from .FileWatcher import FileWatcher
+from .Tracer import Tracer
+from .SessionRoot import remove_tree, copy_file, copy_tree, copy_entry
+from .Durability import temporary_name
+from .MappedFile import MappedFile
+
+FOLLOW_CHUNK_SIZE = 64 * 1024                                   # largest slice of appended bytes pushed per message
 
 class Utility:
     """
@@ -24,6 +36,20 @@ class Utility:
         Constructor that sets the current local working directory.
         """
         self.local_working_directory = os.getcwd()
+        self.recv_buffer = b""                                  # bytes received past the end of the last message
+        self.cache = None                                       # optional DownloadCache used by `get`
+        self.bytes_sent = 0                                     # running totals for session monitoring
+        self.bytes_received = 0
+        self.tracer = Tracer()                                  # disabled unless replaced by an enabled Tracer
+        self.throttle = None                                    # optional Throttle pacing file payloads
+        self.root = None                                        # optional SessionRoot, paths then resolve beneath it
+        self.codec = JSON                                       # message format, until `negotiate` picks another
+        self.protocol = None                                    # protocol version agreed by `negotiate`
+        self.capabilities = None                                # capabilities agreed by `negotiate`, None if unknown
+        self.trash = None                                       # optional Trash, `rm -r` then defers the deletion
+        self.durability = None                                  # optional Durability committing uploads
+        self.write_behind = None                                # optional WriteBehind streaming large uploads to disk
+        self.pending_payload = 0                                # upload bytes announced but left on the socket for `receive_file`
 
     def help(self, request: Request = None) -> Response:
         """
@@ -49,6 +75,9 @@ class Utility:
                 "lls": "Display local directory listing of 'path' or the current directory if 'path' is not specified.",
                 "lmkdir": "Create a local directory specified by 'path'.",
                 "lpwd": "Print the local working directory.",
+                "cp": "Copy 'source' to 'destination' on the remote machine, into it if it is a directory. If the -r flag is specified, directories are copied recursively.",
+                "mv": "Move or rename 'source' to 'destination' on the remote machine, into it if it is a directory.",
+                "follow": "Stream data appended to the remote file 'path' as it grows, like 'tail -f'. Press Ctrl-C to stop following.",
             }
 
             if request and request.remote_path:
@@ -85,25 +114,29 @@ class Utility:
         """
         Removes a file or directory specified in the request object.
 
+        With a `trash` set, a directory removed with '-r' is renamed into the trash and deleted later by the
+        reaper, so the reply does not wait for every file below it to be unlinked.
+
         Args:
             request (Request): The request object containing the path to remove.
 
         Returns:
             Response: A success or error response indicating the result of the operation.
         """
+        target = request.local_path or request.remote_path
+        path = self._path(target)
         try:
-            path = os.path.abspath(os.path.join(self.local_working_directory, ((request.local_path or request.remote_path) or '')))
-
-            # Check if the path exists and handle file vs directory
-            if os.path.isfile(path):
-                os.remove(path)
-            elif os.path.isdir(path):
-                if '-r' in request.options:
-                    shutil.rmtree(path)
+            dir_fd, name = self._parent(target)
+            try:
+                # Check if the path exists and handle file vs directory (a symlink is removed, not followed)
+                if stat.S_ISDIR(os.stat(name, dir_fd=dir_fd, follow_symlinks=False).st_mode):
+                    if '-r' not in request.options:
+                        return Response(status="error", message=f"Cannot remove directory '{path}' without '-r' option.", code="ERR_IS_DIRECTORY")
+                    self._remove_tree(dir_fd, name)
                 else:
-                    return Response(status="error", message=f"Cannot remove directory '{path}' without '-r' option.", code="ERR_IS_DIRECTORY")
-            else:
-                return Response(status="error", message=f"Invalid path {path}", code="ERR_INVALID_PATH")
+                    os.unlink(name, dir_fd=dir_fd)
+            finally:
+                os.close(dir_fd)
 
             return Response(status="success", message=f"Removed: {request.local_path or request.remote_path}")
         except FileNotFoundError:
@@ -113,6 +146,161 @@ class Utility:
         except Exception as e:
             return Response(status="error", message=f"Failed to remove {path}: {str(e)}", code="ERR_REMOVE")
 
+    def _remove_tree(self, dir_fd: int, name: str) -> None:
+        """
+        Removes a directory tree, through the trash when there is one.
+        """
+        if self.trash:
+            try:
+                self.trash.move(dir_fd, name)
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        remove_tree(dir_fd, name)                                   # no trash, or on another file system than it
+
+    def cp(self, request: Request) -> Response:
+        """
+        Copies a file, or a directory with the '-r' option, on this side of the connection. The source is
+        `remote_path` and the destination `local_path`; a destination that is an existing directory receives
+        a copy with the source's name. The bytes never cross the network and, where the file system allows,
+        are cloned or copied inside the kernel (see `copy_file`). A file is written beside the destination
+        and renamed over it (see `_copy_over`), so copying a file onto itself is refused rather than
+        truncating it.
+
+        Args:
+            request (Request): The request object containing the source and destination paths.
+
+        Returns:
+            Response: A success or error response indicating the result of the operation.
+        """
+        source, destination = request.remote_path, request.local_path
+        path = self._path(source)
+        try:
+            if not source or not destination:
+                return Response(status="error", message="Usage: cp [-r] source destination", code="ERR_INVALID_PATH")
+            src_fd = self._open(source, os.O_RDONLY | os.O_NONBLOCK)   # a symlink named directly is copied as its target
+            try:
+                is_dir = stat.S_ISDIR(os.fstat(src_fd).st_mode)
+                if is_dir:
+                    if '-r' not in request.options:
+                        return Response(status="error", message=f"Cannot copy directory '{path}' without '-r' option.", code="ERR_IS_DIRECTORY")
+                    target = self._path(destination)
+                    if target == path or target.startswith(path.rstrip('/') + '/'):
+                        return Response(status="error", message=f"Cannot copy '{path}' into itself.", code="ERR_COPY")
+                dst_dir, dst_name = self._destination(destination, os.path.basename(path))
+                try:
+                    if is_dir:
+                        copy_tree(src_fd, dst_dir, dst_name)
+                    else:
+                        self._copy_over(src_fd, dst_dir, dst_name)
+                finally:
+                    os.close(dst_dir)
+            finally:
+                os.close(src_fd)
+            return Response(status="success", message=f"Copied {source} to {destination}")
+        except FileNotFoundError:
+            return Response(status="error", message=f"Invalid path {path}", code="ERR_INVALID_PATH")
+        except FileExistsError:
+            return Response(status="error", message=f"'{self._path(destination)}' already exists", code="ERR_DIR_EXISTS")
+        except PermissionError:
+            return Response(status="error", message=f"Permission denied for {path}.", code="ERR_PERMISSION_DENIED")
+        except Exception as e:
+            return Response(status="error", message=f"Failed to copy {path}: {str(e)}", code="ERR_COPY")
+
+    def _copy_over(self, src_fd: int, dst_dir: int, dst_name: str) -> None:
+        """
+        Copies the open file `src_fd` to `dst_name` in `dst_dir` through a hidden temporary file that is
+        renamed over the destination once complete, like an upload. An existing destination is therefore
+        never truncated: a failed copy leaves it as it was, and a reader (or a `get` sending it from a
+        mapping) keeps the old contents until the rename.
+
+        Raises:
+            OSError: If the destination is the source itself, under the same or another name (a hard
+                     link), or a symlink, which is not written through.
+        """
+        source = os.fstat(src_fd)
+        try:
+            existing = os.stat(dst_name, dir_fd=dst_dir, follow_symlinks=False)
+        except FileNotFoundError:
+            existing = None
+        if existing and (existing.st_dev, existing.st_ino) == (source.st_dev, source.st_ino):
+            raise OSError(errno.EINVAL, "Source and destination are the same file")
+        if existing and stat.S_ISLNK(existing.st_mode):
+            raise OSError(errno.ELOOP, "Destination is a symbolic link")
+        temporary = self._temporary_name(dst_name)
+        dst_fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC,
+                         stat.S_IMODE(source.st_mode), dir_fd=dst_dir)
+        try:
+            if existing:
+                os.fchmod(dst_fd, stat.S_IMODE(existing.st_mode))   # a replaced file keeps its permissions
+            copy_file(src_fd, dst_fd)
+            os.rename(temporary, dst_name, src_dir_fd=dst_dir, dst_dir_fd=dst_dir)
+        except BaseException:
+            try:
+                os.unlink(temporary, dir_fd=dst_dir)
+            except OSError:
+                pass
+            raise
+        finally:
+            os.close(dst_fd)
+
+    def mv(self, request: Request) -> Response:
+        """
+        Moves or renames a file or directory with `os.rename`, on this side of the connection. The source is
+        `remote_path` and the destination `local_path`; a destination that is an existing directory receives
+        the source under its own name. Moves across file systems fall back to a copy and remove.
+
+        Args:
+            request (Request): The request object containing the source and destination paths.
+
+        Returns:
+            Response: A success or error response indicating the result of the operation.
+        """
+        source, destination = request.remote_path, request.local_path
+        path = self._path(source)
+        try:
+            if not source or not destination:
+                return Response(status="error", message="Usage: mv source destination", code="ERR_INVALID_PATH")
+            src_dir, src_name = self._parent(source)
+            try:
+                dst_dir, dst_name = self._destination(destination, src_name)
+                try:
+                    try:
+                        os.rename(src_name, dst_name, src_dir_fd=src_dir, dst_dir_fd=dst_dir)
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        copy_entry(src_dir, src_name, dst_dir, dst_name)  # another file system, rename cannot cross
+                        if stat.S_ISDIR(os.stat(src_name, dir_fd=src_dir, follow_symlinks=False).st_mode):
+                            self._remove_tree(src_dir, src_name)
+                        else:
+                            os.unlink(src_name, dir_fd=src_dir)
+                finally:
+                    os.close(dst_dir)
+            finally:
+                os.close(src_dir)
+            return Response(status="success", message=f"Moved {source} to {destination}")
+        except FileNotFoundError:
+            return Response(status="error", message=f"Invalid path {path}", code="ERR_INVALID_PATH")
+        except PermissionError:
+            return Response(status="error", message=f"Permission denied for {path}.", code="ERR_PERMISSION_DENIED")
+        except Exception as e:
+            return Response(status="error", message=f"Failed to move {path}: {str(e)}", code="ERR_MOVE")
+
+    def _destination(self, path: str, name: str) -> tuple:
+        """
+        Opens the directory a `cp` or `mv` writes into: `path` itself if it is an existing directory,
+        keeping the source's `name`, otherwise the directory containing `path`.
+
+        Returns:
+            tuple: The directory's file descriptor, owned by the caller, and the name to create in it.
+        """
+        try:
+            return self._open(path, os.O_RDONLY | os.O_DIRECTORY), name
+        except (FileNotFoundError, NotADirectoryError):
+            return self._parent(path)
+
     def cat(self, request: Request) -> Response:
         """
         Reads and returns the contents of a file specified in the request object.
@@ -123,13 +311,15 @@ class Utility:
         Returns:
             Response: A success response containing file contents or an error response if reading fails.
         """
+        target = request.local_path or request.remote_path
+        path = self._path(target)
         try:
-            path = os.path.abspath(os.path.join(self.local_working_directory, ((request.local_path or request.remote_path) or ''))); 
-            if os.path.isdir(path): 
-                return Response(status="error", message=f"'{path}' is a directory, not a file.", code="ERR_IS_DIRECTORY"); 
-        
-            with open(path, "r") as file: 
-                contents = file.read(); 
+            fd = self._open(target, os.O_RDONLY | os.O_NONBLOCK)
+            if stat.S_ISDIR(os.fstat(fd).st_mode):                 # `open` would refuse the descriptor
+                os.close(fd)
+                return Response(status="error", message=f"'{path}' is a directory, not a file.", code="ERR_IS_DIRECTORY")
+            with open(fd, "r") as file:
+                contents = file.read()
             return Response(status="success", message=contents)
         except FileNotFoundError: 
             return Response(status="error", message=f"File '{path}' not found.", code="ERR_FILE_NOT_FOUND")
@@ -146,29 +336,21 @@ class Utility:
         Returns:
             Response: A success response containing directory or file details, or an error response if listing fails.
         """
+        target = request.local_path or request.remote_path
+        path = self._path(target)
         try:
-            path = os.path.abspath(os.path.join(self.local_working_directory, ((request.local_path or request.remote_path) or '')))
             entries = []
-
-            if os.path.isfile(path):            # handle file
-                stats = os.stat(path)
-                mode = stat.filemode(stats.st_mode)
-                nlink = stats.st_nlink
-                user = pwd.getpwuid(stats.st_uid).pw_name
-                group = grp.getgrgid(stats.st_gid).gr_name
-                size = stats.st_size
-                mtime = datetime.fromtimestamp(stats.st_mtime).strftime("%Y-%m-%d %H:%M")
-                entries.append(Content(mode=mode, nlink=nlink, user=user, group=group, size=size, mtime=mtime, name=os.path.basename(path)))
-            else:                               # handle directory
-                for entry in os.scandir(path):
-                    stats = entry.stat()
-                    mode = stat.filemode(stats.st_mode)
-                    nlink = stats.st_nlink
-                    user = pwd.getpwuid(stats.st_uid).pw_name
-                    group = grp.getgrgid(stats.st_gid).gr_name
-                    size = stats.st_size
-                    mtime = datetime.fromtimestamp(stats.st_mtime).strftime("%Y-%m-%d %H:%M")
-                    entries.append(Content(mode=mode, nlink=nlink, user=user, group=group, size=size, mtime=mtime, name=entry.name))
+            fd = self._open(target, os.O_RDONLY | os.O_NONBLOCK)
+            try:
+                stats = os.fstat(fd)
+                if not stat.S_ISDIR(stats.st_mode):         # handle file
+                    entries.append(self._content(stats, os.path.basename(path)))
+                else:                                       # handle directory
+                    with os.scandir(fd) as scan:
+                        for entry in scan:              # beneath a root, never stat through a symlink to outside it
+                            entries.append(self._content(entry.stat(follow_symlinks=self.root is None), entry.name))
+            finally:
+                os.close(fd)
 
             entries = sorted(entries, key=lambda x: x.name.lower())
             return Response(status="success", contents=entries)
@@ -177,6 +359,18 @@ class Utility:
         except PermissionError:
             return Response(status="error", message=f"Permission denied for {path}", contents=[], code="ERR_PERMISSION_DENIED")
 
+    def _content(self, stats: os.stat_result, name: str) -> Content:
+        """
+        Builds the `ls -l` style entry for one file.
+        """
+        mode = stat.filemode(stats.st_mode)
+        nlink = stats.st_nlink
+        user = pwd.getpwuid(stats.st_uid).pw_name
+        group = grp.getgrgid(stats.st_gid).gr_name
+        size = stats.st_size
+        mtime = datetime.fromtimestamp(stats.st_mtime).strftime("%Y-%m-%d %H:%M")
+        return Content(mode=mode, nlink=nlink, user=user, group=group, size=size, mtime=mtime, name=name)
+
     def pwd(self) -> Response:
         """
         Returns the current working directory.
@@ -196,10 +390,17 @@ class Utility:
         Returns:
             Response: A success or error response indicating the result of the operation.
         """
+        target = request.local_path or request.remote_path
+        path = self._path(target)
         try:
-            path = os.path.abspath(os.path.join(self.local_working_directory, ((request.local_path or request.remote_path) or '')))
             if '-r' not in request.options:
-                os.mkdir(path)
+                dir_fd, name = self._parent(target)
+                try:
+                    os.mkdir(name, dir_fd=dir_fd)
+                finally:
+                    os.close(dir_fd)
+            elif self.root:
+                self.root.makedirs(target)
             else:
                 os.makedirs(path)
             return Response(status="success", message=f"Directory '{request.local_path or request.remote_path}' created")
@@ -221,6 +422,15 @@ class Utility:
             Response: A success or error response indicating the result of the operation.
         """
         try:
+            if self.root:
+                try:
+                    self.local_working_directory = self.root.chdir(request.local_path or request.remote_path)
+                    return Response(status="success", message=f"Changed directory to {self.local_working_directory}")
+                except (FileNotFoundError, NotADirectoryError):
+                    return Response(status="error", message=f"{self._path(request.local_path or request.remote_path)} is not a valid directory", code="ERR_INVALID_DIR")
+                except PermissionError as e:
+                    return Response(status="error", message=f"Permission denied: {e.strerror}", code="ERR_PERMISSION_DENIED")
+
             path = normalize_path(self.local_working_directory + '/' + (request.local_path or request.remote_path))
             if os.path.isdir(path):
                 os.chdir(path)
@@ -235,6 +445,9 @@ class Utility:
         """
         Sends a `Request` to the server, receives the `Response`, and writes binary data (if any) to a local file.
 
+        When a `DownloadCache` is set, the request carries the cached validator for the remote path. If the
+        server answers "not modified", the cached contents are placed at the local path instead of downloading.
+
         Args:
             conn: The connection object used to communicate with the server.
             request (Request): The `Request` object containing the file retrieval details.
@@ -244,70 +457,158 @@ class Utility:
         """
         try:
             path = os.path.abspath(os.path.join(self.local_working_directory, request.local_path))
+            cached = None
+            if self.cache:
+                cached = self.cache.lookup(request.remote_path)
+                request.validator = cached["validator"] if cached else {}   # empty asks the server for a validator
+
             self.send_all(conn, request)                          # Send the `Request` to the server
             response = self.recv_all(conn, Response)              # Receive the `Response` from the server
+            if response.status != "success":                      # The server sends nothing after an error
+                return response
 
             if response.status == "success":
                 for entry in response.contents:
                     path += '/' + entry.name
-                    if (response.size > 0):
-                        with open(path, "wb") as file:
+                    if response.code == "NOT_MODIFIED" and cached:
+                        self.cache.materialize(cached, path)
+                        self.cache.revalidate(request.remote_path, response.validator)
+                    elif (response.size > 0):
+                        with self.tracer.span("fs_write", path=path), open(path, "wb") as file:
                             file.write(response.get_binary_data())
+                        if self.cache and response.validator:
+                            self.cache.store(request.remote_path, response.validator, response.get_binary_data())
                     else: 
                        return Response(status="error", message=f"No data received for {entry.name}.")
             return self.recv_all(conn, Response)  # Return the server's response
         except Exception as e:
             return Response(status="error", message=f"Failed to download file {request.remote_path}: {str(e)}", code="ERR_GET_CLIENT")
 
-    def put(self, conn, request: Request) -> Response:
+    def put(self, conn, request: Request, source: str = None) -> Response:
         """
         Sends a file to the server by attaching binary data to the `Request`.
 
         Args:
             conn: The connection object used to communicate with the server.
             request (Request): The `Request` object containing the file upload details.
+            source (str, optional): File to read instead of `request.local_path`, so the name the server
+                stores (`local_path`, relative to `remote_path`) can differ from where the file is read.
 
         Returns:
             Response: The server's response or an error response if the operation fails.
         """
         try:
-            path = normalize_path(request.local_path)
+            path = normalize_path(source or request.local_path)
 
-            with open(path, "rb") as file:          # Open the file in binary mode for reading
-                binary_data = file.read()                         # Read the file's binary data
-            request.size = len(binary_data)                       # Set the size property in the `Request`
-            self.send_all(conn, request)                          # Send the `Request` with metadata and binary data
+            with self.tracer.span("fs_read", path=path), open(path, "rb") as file:   # Open the file in binary mode for reading
+                payload = MappedFile(file.fileno())               # Map (or, if small, read) the file's binary data
+            with payload:
+                request.size = len(payload)                       # Set the size property in the `Request`
+                self.send_all(conn, request)                      # Send the `Request` with metadata and binary data
+
+                with self.tracer.span("wait_ack"):
+                    response = self.recv_all(conn, Response)      # Receive the `Response` from the server
+                if response.status == 'success':
+                    self._send_payload(conn, payload)             # Send the binary data the server is now waiting for
 
-            response = self.recv_all(conn, Response)              # Receive the `Response` from the server
-            if response.status == 'success':
-                conn.sendall(binary_data)
-        
             return self.recv_all(conn, Response)
         except Exception as e:
             return Response(status="error", message=f"Failed to send file {request.local_path}: {str(e)}", code="ERR_PUT_CLIENT")
 
-    def receive_file(self, request: Request) -> Response:
+    def receive_file(self, conn, request: Request) -> Response:
         """
         Handles file reception on the server, saving the binary data to the specified path.
+        The payload itself was already read, and paced by `throttle`, in `recv_all`, unless it is larger
+        than a `write_behind` buffer: then it is still on the socket and is read here, straight into the
+        file, while earlier parts of it are being written.
+
+        The data is written to a hidden temporary file in the destination directory, which is then renamed
+        over the destination by `durability` (or directly without it), so readers never see a partly written
+        file and a failed upload leaves the previous version in place.
 
         Args:
+            conn: The connection object the payload arrives on, when it was not read yet.
             request (Request): The `Request` object containing file metadata and binary data.
 
         Returns:
             Response: A success response if the file is saved successfully or an error response otherwise.
         """
+        path = None
         try:
-            path = normalize_path(request.remote_path + '/' + request.local_path)
+            target = request.remote_path + '/' + request.local_path
+            path = self._path(target)
             if request.size <= 0:
                 raise ValueError("Invalid file size in the request.")
 
-            with open(path, "wb") as file:           # open received path in write binary mode
-                file.write(request.get_binary_data())               # write binary data to file
-            
+            dir_fd, name = self._parent(target)
+            try:
+                try:
+                    mode = stat.S_IMODE(os.stat(name, dir_fd=dir_fd).st_mode)   # a replaced file keeps its permissions
+                except FileNotFoundError:
+                    mode = 0o666
+                temporary = self._temporary_name(name)
+                fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, mode, dir_fd=dir_fd)
+                try:
+                    if self.pending_payload:
+                        self._receive_payload(conn, fd)
+                    else:
+                        with self.tracer.span("fs_write", path=path), open(fd, "wb", closefd=False) as file:
+                            file.write(request.get_binary_data())   # write binary data to the temporary file
+                    if mode != 0o666:
+                        os.fchmod(fd, mode)
+                    with self.tracer.span("commit", path=path):
+                        if self.durability:
+                            self.durability.commit(fd, dir_fd, temporary, name, request.size)
+                        else:
+                            os.rename(temporary, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+                except BaseException:
+                    try:
+                        os.unlink(temporary, dir_fd=dir_fd)
+                    except OSError:
+                        pass
+                    raise
+                finally:
+                    os.close(fd)
+            finally:
+                os.close(dir_fd)
+
             return Response(status="success", message=f"File {request.local_path} received successfully.")
         except Exception as e:
+            try:
+                self.discard_payload(conn)                        # keep the connection in step with the client
+            except OSError:
+                pass
             return Response(status="error", message=f"Failed to save file '{path}': {str(e)}", code="ERR_PUT_SERVER")
 
+    def _receive_payload(self, conn, fd: int) -> None:
+        """
+        Reads the upload left on the socket by `recv_all` into `fd` through `write_behind`.
+        """
+        payload_start = Tracer.now()
+        size, self.pending_payload = self.pending_payload, 0
+        initial, self.recv_buffer = self.recv_buffer[:size], self.recv_buffer[size:]
+        self.bytes_received += self.write_behind.receive(conn, fd, size, initial, self.throttle)
+        self.tracer.complete("recv_payload", payload_start, size=size)
+
+    def discard_payload(self, conn) -> None:
+        """
+        Reads and drops an upload that `recv_all` left on the socket, for a `put` refused or failed before
+        its payload was read, so the next message is read from the right place.
+        """
+        size, self.pending_payload = self.pending_payload, 0
+        skipped = min(len(self.recv_buffer), size)
+        self.recv_buffer = self.recv_buffer[skipped:]
+        size -= skipped
+        buffer = bytearray(65536)
+        while size > 0:
+            count = conn.recv_into(buffer, min(len(buffer), size))
+            if not count:
+                raise ConnectionError("Connection lost while receiving binary data.")
+            self.bytes_received += count
+            if self.throttle:
+                self.throttle.wait(count)
+            size -= count
+
     def send_file(self, conn, request: Request) -> Response:
         """
         Handles file sending on the server, transmitting binary data to the client.
@@ -318,49 +619,347 @@ class Utility:
 
         Returns:
             Response: A success response if the file is sent successfully or an error response otherwise.
+
+        Raises:
+            ConnectionError: If the connection failed, or was shut down because the file could not be sent
+                whole after its size was announced.
         """
         try:
-            path = os.path.abspath(os.path.join(self.local_working_directory, request.remote_path))
+            path = self._path(request.remote_path)
             request.local_path = None
-            res = self.ls(request)
+            with self.tracer.span("fs_stat", path=path):
+                res = self.ls(request)
             if res.status != 'success':
-                raise
-
-            with open(path, "rb") as file:                          # open requested path in read binary mode
-               binary_data = file.read()                           # read binary data from file
-
-            ack = Response(status="success", contents=res.contents, size=len(binary_data))
-            self.send_all(conn, ack)
-            response = self.recv_all(conn, Response)
-
-            if response.status == "success":
-                conn.sendall(binary_data)
+                return res                                          # e.g. ERR_DIR_NOT_FOUND for a missing file
+
+            validator = None
+            with self.tracer.span("fs_read", path=path), open(self._open(request.remote_path), "rb") as file:   # open requested path in read binary mode
+                stats = os.fstat(file.fileno())
+                if request.validator and request.validator.get("size") == stats.st_size \
+                        and request.validator.get("mtime") == stats.st_mtime_ns:
+                    return self._not_modified(conn, request, res, request.validator)
+                payload = MappedFile(file.fileno())                 # large files are mapped, not copied
+
+            with payload:
+                if request.validator is not None:                   # the client caches, send a validator along
+                    with self.tracer.span("hash", size=len(payload)):
+                        validator = {"size": stats.st_size, "mtime": stats.st_mtime_ns,
+                                     "sha256": hashlib.sha256(payload.view).hexdigest()}
+                    if request.validator.get("sha256") == validator["sha256"]:
+                        return self._not_modified(conn, request, res, validator)
+
+                ack = Response(status="success", contents=res.contents, size=len(payload), validator=validator)
+                self.send_all(conn, ack)
+                with self.tracer.span("wait_ack"):
+                    response = self.recv_all(conn, Response)
+
+                if response.status == "success":
+                    self._send_payload(conn, payload)
 
             return Response(status="success", message=f"File {request.remote_path} sent successfully.")
+        except ConnectionError:
+            raise                                                   # the stream is out of step, the session ends
         except Exception as e:
             return Response(status="error", message=f"Failed to send file '{request.remote_path}': {str(e)}", code="ERR_GET_SERVER")
 
+    def _send_payload(self, conn, payload: MappedFile) -> None:
+        """
+        Sends a payload whose size the peer has already acknowledged. Nothing may be sent in its place, since
+        the peer reads the next `len(payload)` bytes as data whatever they are. So if the file can no longer
+        be sent whole (it shrank after it was mapped, or the send fails part way), the connection is shut
+        down rather than answered with an error the peer would take for payload.
+
+        Args:
+            conn: The connection object the payload was announced on.
+            payload (MappedFile): The announced payload.
+
+        Raises:
+            ConnectionError: If the payload could not be sent; the connection is no longer usable.
+        """
+        try:
+            payload.recheck()                                   # the file may have changed during the round trip
+            with self.tracer.span("send_payload", size=len(payload)):
+                if self.throttle:
+                    self.throttle.sendall(conn, payload.view)
+                else:
+                    conn.sendall(payload.view)
+        except OSError as e:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass                                            # already closed by the peer
+            raise ConnectionError(f"Aborted after announcing {len(payload)} bytes: {e}") from e
+        self.bytes_sent += len(payload)
+
+    def _not_modified(self, conn, request: Request, listing: Response, validator: dict) -> Response:
+        """
+        Tells the client its cached copy is still current, without sending a payload.
+
+        Args:
+            conn: The connection object used to communicate with the client.
+            request (Request): The conditional `get` request.
+            listing (Response): The `ls` response describing the file.
+            validator (dict): The current validator of the file.
+
+        Returns:
+            Response: The final response for the `get`.
+        """
+        ack = Response(status="success", contents=listing.contents, code="NOT_MODIFIED", validator=validator)
+        self.send_all(conn, ack)
+        return Response(status="success", message=f"File {request.remote_path} not modified.", code="NOT_MODIFIED")
+
+    def follow(self, conn, request: Request) -> Response:
+        """
+        Streams bytes appended to a file to the client as the file grows, like `tail -f`.
+
+        Each batch of new bytes is announced with a `Response` whose `size` is the batch length and is sent
+        once the client acknowledges it. Any message from the client while the server is waiting for the file
+        to change, or a non-success acknowledgement, stops the stream. Rotation is detected by an inode change,
+        truncation by the file shrinking below the current offset; both restart reading from the beginning.
+
+        Args:
+            conn: The connection object used to communicate with the client.
+            request (Request): The `Request` object specifying the file to follow.
+
+        Returns:
+            Response: A final response with `size` 0 ending the stream, or an error response if the file cannot be followed.
+        """
+        path = self._path(request.remote_path)
+        watcher = None
+        file = None
+        try:
+            fd = self._open(request.remote_path, os.O_RDONLY | os.O_NONBLOCK)
+            stats = os.fstat(fd)
+            if stat.S_ISDIR(stats.st_mode):                         # `open` would refuse the descriptor
+                os.close(fd)
+                return Response(status="error", message=f"'{path}' is a directory, not a file.", code="ERR_IS_DIRECTORY")
+            file = open(fd, "rb")
+
+            file.seek(0, os.SEEK_END)                                 # only push what is appended from now on
+            inode = stats.st_ino
+            watcher = FileWatcher(path)
+            waitables = [conn] if watcher.fileno() is None else [conn, watcher]
+
+            while True:
+                readable, _, _ = select.select(waitables, [], [], watcher.timeout)
+                if conn in readable:
+                    self.recv_message(conn, Response)                 # the client cancelled while we were idle
+                    break
+                watcher.drain()
+
+                if not self._follow_send(conn, file):                 # finish whatever the open file still holds
+                    break
+
+                try:
+                    stats = self._stat(request.remote_path)
+                except FileNotFoundError:
+                    continue                                          # rotated away, wait for the new file
+                if stats.st_ino != inode:                             # rotated, start over on the new file
+                    file.close()
+                    file = open(self._open(request.remote_path, os.O_RDONLY | os.O_NONBLOCK), "rb")
+                    inode = os.fstat(file.fileno()).st_ino
+                    if not self._follow_send(conn, file):
+                        break
+                elif stats.st_size < file.tell():                     # truncated in place
+                    file.seek(0)
+
+            return Response(status="success", message=f"Stopped following {request.remote_path}.")
+        except FileNotFoundError:
+            return Response(status="error", message=f"File '{path}' not found.", code="ERR_FILE_NOT_FOUND")
+        except PermissionError:
+            return Response(status="error", message=f"Permission denied for '{path}'.", code="ERR_PERMISSION_DENIED")
+        finally:
+            if watcher:
+                watcher.close()
+            if file:
+                file.close()
+
+    def _follow_send(self, conn, file) -> bool:
+        """
+        Sends everything between the current offset of `file` and its end to the client.
+
+        Args:
+            conn: The connection object used to communicate with the client.
+            file: The open file being followed.
+
+        Returns:
+            bool: False if the client cancelled instead of acknowledging a batch, True otherwise.
+        """
+        chunk = file.read(FOLLOW_CHUNK_SIZE)
+        while chunk:
+            self.send_all(conn, Response(status="success", size=len(chunk)))
+            ack = self.recv_message(conn, Response)
+            if ack.status != "success":
+                return False
+            if self.throttle:
+                self.throttle.sendall(conn, chunk)              # followed bytes count against the limits too
+            else:
+                conn.sendall(chunk)
+            self.bytes_sent += len(chunk)
+            chunk = file.read(FOLLOW_CHUNK_SIZE)
+        return True
+
+    def _path(self, path: str) -> str:
+        """
+        The absolute path a request path names, for messages. Does not check that it is allowed.
+        """
+        if self.root:
+            return self.root.absolute(path)
+        return os.path.abspath(os.path.join(self.local_working_directory, path or ''))
+
+    def _open(self, path: str, flags: int = os.O_RDONLY, mode: int = 0o666) -> int:
+        """
+        Opens a request path, beneath the session root when one is set.
+
+        Returns:
+            int: The new file descriptor, owned by the caller.
+        """
+        if self.root:
+            return self.root.open(path, flags, mode)
+        return os.open(self._path(path), flags | os.O_CLOEXEC, mode)
+
+    def _parent(self, path: str) -> tuple:
+        """
+        Opens the directory containing a request path.
+
+        Returns:
+            tuple: The directory's file descriptor, owned by the caller, and the last component's name.
+        """
+        if self.root:
+            return self.root.parent(path)
+        path = self._path(path)
+        return os.open(os.path.dirname(path), os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC), os.path.basename(path)
+
+    def _temporary_name(self, name: str) -> str:
+        """
+        The hidden name a file is written to before it is renamed to `name`, see `Durability.temporary_name`.
+        """
+        return self.durability.temporary_name(name) if self.durability else temporary_name(name, str(os.getpid()))
+
+    def _stat(self, path: str) -> os.stat_result:
+        fd = self._open(path, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            return os.fstat(fd)
+        finally:
+            os.close(fd)
+
     def send_all(self, conn, obj: CustomProtocol) -> None:
         """
         Sends a `CustomProtocol` object (either `Request` or `Response`) over the socket.
 
         Args:
             conn: The connection object used to communicate.
-            obj (CustomProtocol): The object to be sent, encoded as JSON.
+            obj (CustomProtocol): The object to be sent, encoded with the connection's codec (`codec`).
 
         Raises:
             Exception: If an error occurs during sending.
         """
         try:
-            json_payload = obj.prepare()                         # Prepare the object (validate and encode to JSON)
-            conn.sendall(json_payload)                           # Send the JSON payload over the socket
+            if self.tracer.enabled and isinstance(obj, Request) and obj.trace_id is None:
+                obj.trace_id = self.tracer.trace_id              # Let the peer tag its spans with our trace ID
+            with self.tracer.span("send_header"):
+                payload = obj.prepare(self.codec)                # Prepare the object (validate and encode with the connection's codec)
+                conn.sendall(payload)                            # Send the encoded message over the socket
+            self.bytes_sent += len(payload)
         except Exception as e:
             print(f"Error sending data: {e}")
             raise
 
+    def recv_message(self, conn, obj_type: Type[CustomProtocol]) -> CustomProtocol:
+        """
+        Receives a single message from the socket and constructs the specified object type,
+        without acknowledging or reading any binary data that the message announces.
+
+        Bytes that arrive after the end of the message are kept in `recv_buffer` and used by the next read.
+
+        Args:
+            conn: The connection object used to communicate.
+            obj_type (Type[CustomProtocol]): The type of object to construct (e.g., `Request` or `Response`).
+
+        Returns:
+            CustomProtocol: The constructed object.
+
+        Raises:
+            ConnectionError: If the peer closes the connection before a full message arrives.
+        """
+        buffer = self.recv_buffer                                # Start with anything left over from the last message
+        self.recv_buffer = b""
+        first_byte = Tracer.now() if buffer else None            # Waiting for the peer to start is not receiving
+        while True:
+            decode_start = Tracer.now()
+            message = self.codec.decode(buffer) if buffer else None   # None until the whole message has arrived
+            if message is not None:
+                raw_data, self.recv_buffer = message
+                obj = obj_type.from_dict(raw_data, obj_type)
+                if self.tracer.enabled and getattr(obj, "trace_id", None):
+                    self.tracer.trace_id = obj.trace_id          # Server side: join the client's trace
+                self.tracer.complete("decode", decode_start, size=len(buffer))
+                self.tracer.complete("recv_header", first_byte, size=len(buffer))
+                return obj
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("Connection closed by peer.")
+            if first_byte is None:
+                first_byte = Tracer.now()
+            buffer += chunk
+            self.bytes_received += len(chunk)
+
+    def negotiate(self, conn, codecs: list = None) -> Response:
+        """
+        Client side: the hello right after connecting. Offers the server faster message codecs than JSON
+        and announces this side's protocol version and capabilities.
+
+        The hello rides on a `pwd`, which every server answers, in JSON. A server that knows codecs names
+        the one it picked in `Response.codec` and both sides use it from the next message on, or answers
+        without one and the connection stays on JSON. A server that knows the handshake answers with the
+        version both speak and the capabilities both have; one that only ignores unknown fields answers
+        without them, which makes them version 1 and none, and `supports` then turns down commands it would
+        never answer.
+
+        A server from before both cannot decode a request with fields it does not know and drops the
+        connection, so this raises `ConnectionError`. Clients then connect again and call `skip_handshake`
+        instead of sending the hello. `codecs` is left out when no codec is offered.
+
+        Args:
+            conn: The connection object used to communicate with the server.
+            codecs (list, optional): Codec names to offer, most preferred first; every known codec if not
+                given, none (JSON only) if empty.
+
+        Returns:
+            Response: The server's `pwd` response.
+
+        Raises:
+            ConnectionError: If the server closed the connection instead of answering.
+        """
+        self.send_all(conn, Request(cmd="pwd", codecs=list(CODECS if codecs is None else codecs) or None,
+                                    protocol=PROTOCOL_VERSION, capabilities=list(CAPABILITIES)))
+        response = self.recv_all(conn, Response)
+        if response.codec in CODECS:
+            self.codec = CODECS[response.codec]
+        if response.status == "success":
+            self.protocol = response.protocol or 1
+            self.capabilities = set(response.capabilities or [])
+        return response
+
+    def skip_handshake(self) -> None:
+        """
+        Client side: sets up a new connection to a server that dropped the one carrying the hello, as one
+        from before the handshake does. The connection stays on JSON with version 1 and no capabilities.
+        """
+        self.recv_buffer = b""
+        self.codec = JSON
+        self.protocol = 1
+        self.capabilities = set()
+
+    def supports(self, cmd: str) -> bool:
+        """
+        Whether the peer agreed, in `negotiate`, to the capability `cmd` needs. Always True without a handshake.
+        """
+        return supported(self.capabilities, cmd)
+
     def recv_all(self, conn, obj_type: Type[CustomProtocol]) -> CustomProtocol:
         """
-        Receives JSON metadata and optional binary data from the socket and constructs the specified object type.
+        Receives a message and optional binary data from the socket and constructs the specified object type.
 
         Args:
             conn: The connection object used to communicate.
@@ -373,29 +972,34 @@ class Utility:
             Exception: If an error occurs during reception or object construction.
         """
         try:
-            buffer = b""                                         # Allocate space for the buffer
-            while not buffer.decode('utf-8').strip().endswith('}'):  # Read bytes until the message ends with '}'
-                buffer += conn.recv(4096)
-
-            obj = obj_type.decode(buffer, obj_type)              # Decode the buffer into the given obj_type
+            obj = self.recv_message(conn, obj_type)              # Receive and decode the JSON metadata
 
             if hasattr(obj, 'size') and obj.size > 0: # Check if the size property indicates incoming binary data
                 response = Response(status="success", message="Awaiting binary data...")
                 self.send_all(conn, response)
 
-                binary_data = b""                                # Allocate space for the binary data buffer
-                size = obj.size 
-                bytes_remaining = size                   # Determine the number of bytes to receive
-                while bytes_remaining > 0:
-                    chunk = conn.recv(min(4096, bytes_remaining)) # Receive data in chunks
-                    if not chunk:
-                        raise ConnectionError("Connection lost while receiving binary data.")
-                    binary_data += chunk
-                    bytes_remaining -= len(chunk)               # Update the remaining bytes to receive
-                obj.attach_binary_data(binary_data)             # Attach the received binary data to the object
-
-                if len(binary_data) != size:                # Validate the binary data size
-                    raise ValueError(f"Binary data size mismatch: expected {obj.size}, got {len(binary_data)}.")
+                if self.write_behind and isinstance(obj, Request) and obj.cmd == "put" \
+                        and obj.size > self.write_behind.buffer_size:
+                    self.pending_payload = obj.size              # `receive_file` reads it straight into the file
+                else:
+                    payload_start = Tracer.now()
+                    size = obj.size
+                    binary_data = bytearray(size)                # Allocate space for the binary data buffer
+                    view = memoryview(binary_data)
+                    received = min(len(self.recv_buffer), size)  # Bytes that arrived with the message
+                    view[:received] = self.recv_buffer[:received]
+                    self.recv_buffer = self.recv_buffer[received:]
+                    while received < size:
+                        count = conn.recv_into(view[received:], min(4096, size - received)) # Receive data in chunks
+                        if not count:
+                            raise ConnectionError("Connection lost while receiving binary data.")
+                        self.bytes_received += count
+                        if self.throttle:
+                            self.throttle.wait(count)           # Pace uploads by holding back further reads
+                        received += count
+                    view.release()
+                    obj.attach_binary_data(binary_data)         # Attach the received binary data to the object
+                    self.tracer.complete("recv_payload", payload_start, size=size)
 
             obj.validate()
 
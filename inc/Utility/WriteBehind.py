@@ -0,0 +1,111 @@
+# Trey Rubino
+
+import os
+import queue
+import threading
+
+from .Throttle import THROTTLE_CHUNK
+
+class WriteBehind:
+    """
+    Receives an upload straight into its file, overlapping network and disk IO.
+
+    The payload is read from the socket into one of `buffers` fixed buffers while a writer thread writes the
+    previously filled ones to the file, so a `put` takes about as long as the slower of the two instead of
+    their sum. At most `buffers` buffers are in flight: when the disk falls behind, the reader waits for a
+    buffer to be written and returned, which in turn holds back the sender through TCP flow control, and
+    memory stays bounded at `buffers * buffer_size` bytes per session however large the upload is.
+
+    Uploads no larger than one buffer gain nothing from a second thread and are read whole, as before
+    (see `Utility.recv_all`).
+    """
+
+    def __init__(self, buffers: int = 4, buffer_size: int = 1024 * 1024):
+        """
+        Args:
+            buffers (int): Buffers in flight, at least two so one can be filled while another is written.
+            buffer_size (int): Bytes per buffer.
+        """
+        self.buffers = max(2, buffers)
+        self.buffer_size = max(THROTTLE_CHUNK, buffer_size)
+        self.free = queue.Queue()                               # allocated once, reused by every upload of the session
+        for _ in range(self.buffers):
+            self.free.put(bytearray(self.buffer_size))
+
+    def receive(self, conn, fd: int, size: int, initial: bytes = b"", throttle=None) -> int:
+        """
+        Reads `size` payload bytes from `conn` and writes them to `fd`.
+
+        Args:
+            conn: The socket the payload arrives on.
+            fd (int): The file to write to, at its current offset. Still owned by the caller.
+            size (int): Payload bytes announced by the request.
+            initial (bytes): Payload bytes already received with the request.
+            throttle (Throttle, optional): Paces the reads, as `Utility.recv_all` does.
+
+        Returns:
+            int: Bytes read from the socket, not counting `initial`.
+
+        Raises:
+            ConnectionError: If the peer closes the connection before the whole payload arrived.
+            OSError: If writing the file failed. The rest of the payload has still been read, so the
+                     connection is ready for the next message.
+        """
+        filled = queue.Queue()                                  # (buffer, length), None once the payload is complete
+        errors = []
+        writer = threading.Thread(target=self._write, args=(fd, filled, errors), daemon=True)
+        writer.start()
+        received = 0
+        remaining = size
+        buffer = None                                           # held by the reader, not yet queued for writing
+        try:
+            initial = memoryview(initial)[:size]
+            while remaining > 0:
+                buffer = self.free.get()                        # blocks while every buffer is still being written
+                view = memoryview(buffer)
+                length = min(remaining, self.buffer_size)
+                offset = 0
+                if initial:
+                    offset = min(len(initial), length)
+                    view[:offset] = initial[:offset]
+                    initial = initial[offset:]
+                while offset < length:
+                    limit = min(length - offset, THROTTLE_CHUNK) if throttle else length - offset
+                    count = conn.recv_into(view[offset:], limit)
+                    if not count:
+                        raise ConnectionError("Connection lost while receiving binary data.")
+                    if throttle:
+                        throttle.wait(count)                    # pace uploads by holding back further reads
+                    offset += count
+                    received += count
+                remaining -= length
+                filled.put((buffer, length))
+                buffer = None
+        finally:
+            if buffer is not None:
+                self.free.put(buffer)
+            filled.put(None)
+            writer.join()
+        if errors:
+            raise errors[0]
+        return received
+
+    def _write(self, fd: int, filled: queue.Queue, errors: list) -> None:
+        """
+        Writer thread: writes each filled buffer to `fd` and hands it back to the reader. After a failed
+        write the remaining buffers are only handed back, so the reader can finish draining the socket.
+        """
+        while True:
+            item = filled.get()
+            if item is None:
+                return
+            buffer, length = item
+            try:
+                if not errors:
+                    view = memoryview(buffer)[:length]
+                    while view:
+                        view = view[os.write(fd, view):]
+            except OSError as e:
+                errors.append(e)
+            finally:
+                self.free.put(buffer)
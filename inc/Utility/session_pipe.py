@@ -3,34 +3,95 @@
 import json
 import time
 import os
+import select
 
 from ..Model.Connection import Connection
 
-def read_pipe(read_fd, session):
+CLEAR_SCREEN = "\033[H\033[2J"                                  # ANSI home + clear, avoids forking `clear`
+
+def read_pipe(read_fd, session, fps=4, table=None, reaper=None):
+    """
+    Runs the session monitor: waits for updates on the pipe, applies them to the session in batches
+    and redraws the client table at most `fps` times per second.
+
+    Updates are newline-delimited JSON objects, so several updates written back to back, or one update
+    split across reads, are handled correctly. When a shared `SessionTable` is given, a snapshot of it is
+    also merged into the session once per frame. The loop returns once every writer has closed the pipe.
+
+    Args:
+        read_fd (int): The read end of the session pipe.
+        session (Session): The session to update and display.
+        fps (float): Maximum number of redraws per second.
+        table (SessionTable, optional): Shared session table written by the workers.
+        reaper (ReaperProgress, optional): Progress of the background `rm -r` reaper, shown under the table.
+    """
+    interval = 1.0 / fps
+    buffer = b""
+    dirty = False
+    last_frame = 0.0
     while True:
         try:
-            raw_data = os.read(read_fd, 1024).decode('utf-8')
-            if raw_data:
-                connection_data = json.loads(raw_data)
-                client_id = connection_data['client_id']
-                session.update_connections(client_id, connection_data)
-                os.system("clear")
-                session.display_clients()
+            # Sleep until there is data, or until the next frame if there is something to check or draw
+            if dirty or table is not None or reaper is not None:
+                timeout = max(0.0, last_frame + interval - time.monotonic())
             else:
-                # No data this instant, just wait briefly
-                time.sleep(0.1)
-        except BlockingIOError:
-            # No data right now, keep trying
-            time.sleep(0.1)
+                timeout = None
+            readable, _, _ = select.select([read_fd], [], [], timeout)
+
+            if readable:
+                chunk = os.read(read_fd, 65536)
+                if not chunk:
+                    break                                   # every writer is gone, the server has stopped
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")       # keep an unfinished line for the next read
+                for line in lines:
+                    if line:
+                        connection_data = json.loads(line.decode('utf-8'))
+                        session.update_connections(connection_data['client_id'], connection_data)
+                        dirty = True
+
+            if time.monotonic() - last_frame >= interval:
+                if table is not None:
+                    dirty = session.update_from_table(table.snapshot()) or dirty
+                if reaper is not None:
+                    dirty = session.update_reaper(reaper.snapshot()) or dirty
+                if dirty:
+                    print(CLEAR_SCREEN, end="")
+                    session.display_clients()
+                    dirty = False
+                last_frame = time.monotonic()
+        except InterruptedError:
+            continue
         except Exception as e:
             print(f"Error reading from pipe: {e}")
 
 def update_session(write_fd, connection: Connection):
+    """
+    Sends a connection update to the session monitor as one JSON line.
+
+    The write end is expected to be non-blocking: when the monitor falls behind and the pipe is full,
+    the update is dropped instead of stalling the worker, since the next one supersedes it. Once part of
+    a line is in the pipe the rest is always written, waiting for room if needed, so a line longer than
+    PIPE_BUF (written in pieces) never corrupts the framing. An `exit` update is never dropped, since no
+    later update would remove the client's row.
+
+    Args:
+        write_fd (int): The write end of the session pipe.
+        connection (Connection): The connection to report.
+    """
     try:
         if write_fd:  # Ensure write_fd is valid
-            serialized_data = json.dumps(connection.to_dict())
-            os.write(write_fd, serialized_data.encode('utf-8'))
+            serialized_data = (json.dumps(connection.to_dict()) + "\n").encode('utf-8')
+            required = connection.last_command == "exit"
+            view = memoryview(serialized_data)
+            while view:
+                try:
+                    view = view[os.write(write_fd, view):]
+                except BlockingIOError:
+                    if len(view) == len(serialized_data) and not required:
+                        return  # Monitor is behind; the next update supersedes this one
+                    select.select([], [write_fd], [])  # finish the line once the monitor makes room
     except BrokenPipeError:
         print("Pipe is broken; unable to send data to parent.")
     except Exception as e:
-        print(f"Error sending connection to parent: {e}")
\ No newline at end of file
+        print(f"Error sending connection to parent: {e}")
@@ -8,17 +8,27 @@ import socket
 import readline
 import os
 import signal
+import select
+import selectors
+import threading
+import uuid
+import time
+import json
 
 from .Model.Request import Request
 from .Model.Response import Response
 from .Utility.Utility import Utility
+from .Utility.DownloadCache import DownloadCache
+from .Utility.Tracer import Tracer
 
 
 class Client:
     #########################################################################
     # Function name: __init__
     # Description: Initializes the Client object with parsed command-line 
-    #              arguments and a utility instance for operations.
+    #              arguments and a utility instance for operations. Sets up 
+    #              the download cache if a cache directory was given and 
+    #              the tracer if a trace directory was given.
     # Parameters: 
     #   - parsedArguments : Parsed arguments containing host and port details.
     # Return Value: None
@@ -26,6 +36,13 @@ class Client:
     def __init__(self, parsedArguments): #attributes
         self.parsedArgs = parsedArguments
         self.utility = Utility()
+        if getattr(parsedArguments, "cache_dir", None): #optional download cache
+            self.utility.cache = DownloadCache(parsedArguments.cache_dir, parsedArguments.cache_size * 1024 * 1024,
+                                               namespace=f"{parsedArguments.host}:{parsedArguments.port}")
+        if getattr(parsedArguments, "trace_dir", None): #optional tracing, the server joins this trace ID
+            trace_id = uuid.uuid4().hex
+            self.utility.tracer = Tracer(os.path.join(parsedArguments.trace_dir, f"client-{trace_id}.json"),
+                                         trace_id=trace_id, process_name="fileclient")
 
     #########################################################################
     # Function name: shutdown_signal_handler
@@ -52,12 +69,47 @@ class Client:
     def startClient(self):
         try:
             mySock = socket.getaddrinfo(self.parsedArgs.host, self.parsedArgs.port, socket.AF_INET, socket.SOCK_STREAM)[0][4] #get ip
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s: #create socket
-                s.connect(mySock) #connect socket       
+            with self.connect(mySock) as s: #connect and agree on the protocol and message format
                 self.startREPL(s) #start REPL interface
         except Exception as e: #deal with errors
             print(f"Fatal Error: {e}")
             sys.exit(1)
+        finally:
+            self.utility.tracer.close() #write any remaining trace events
+
+    #########################################################################
+    # Function name: connect
+    # Description: Connects to the server and exchanges protocol versions 
+    #              and capabilities with it, asking it to switch the 
+    #              connection from JSON to the codec given with --codec. 
+    #              Servers that do not know the codec answer in JSON and 
+    #              the connection stays on JSON. Servers from before the 
+    #              handshake cannot decode it and drop the connection; the 
+    #              client then connects again without it and sends them 
+    #              no commands they cannot answer.
+    # Parameters: 
+    #   - address : The server address from getaddrinfo.
+    # Return Value: The connected socket.
+    #########################################################################
+    def connect(self, address):
+        codec = getattr(self.parsedArgs, "codec", "json")
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM) #create socket
+        try:
+            s.connect(address) #connect socket
+            try:
+                response = self.utility.negotiate(s, [] if codec == "json" else [codec]) #json is always spoken
+            except ConnectionError: #dropped by a server from before the handshake
+                s.close()
+                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                s.connect(address)
+                self.utility.skip_handshake()
+                return s
+            if response.status == "shutdown":
+                raise ConnectionError(response.message)
+            return s
+        except BaseException:
+            s.close()
+            raise
 
     #########################################################################
     # Function name: startREPL
@@ -68,60 +120,140 @@ class Client:
     # Return Value: None
     #########################################################################
     def startREPL(self, s):
+        idle = threading.Event() #set while the prompt waits for input, the listener may read only then
+        socketLock = threading.Lock() #held by whoever reads the socket
         try:
             # Set up a signal handler to catch SIGUSR1 for server shutdown
             signal.signal(signal.SIGUSR1, self.shutdown_signal_handler)
+            idle.set()
+            listener = threading.Thread(target=self.listenForServer, args=(s, idle, socketLock), daemon=True)
+            listener.start() # one thread for the whole session instead of a process per prompt
 
             while True:  # Loop indefinitely until exit is typed
-                pid = os.fork()  # Create two processes to listen for server shutdown
-
-                if pid == 0:  # Child process to deal with server shutdown
-                    try:
-                        response = self.utility.recv_all(s, Response)  # Listen for server shutdown
-                        if response.status == "shutdown":  # If server shuts down
-                            # Send shutdown signal to parent, but don't raise SystemExit here
-                            os.kill(os.getppid(), signal.SIGUSR1)  # Send shutdown signal to parent
-                            os._exit(0)  # Exit the child process gracefully
-                    except Exception as e:
-                        print(f"Error in child process: {e}")
-                        os._exit(1)  # Ensure child exits on any exception
-
-                elif pid > 0:  # Parent process to deal with REPL commands
-                    try:
-                        message = input(">>> ")  # Read user input
-                        if not message.strip():
-                            continue
-
-                        # Reap the child process before restarting the loop
-                        os.kill(pid, signal.SIGTERM)  # Signal the child to terminate
-                        os.waitpid(pid, 0)  # Reap the child process
-
-                        # Handle REPL commands
-                        exitFound = self.executeCommand(s, message)  # Prepare and execute the correct command
-                        if exitFound:  # If exit command is typed
-                            break  # Exit the REPL loop
-
-                    except Exception as e:
-                        print(f"Error in parent process: {e}")
-                        os.kill(pid, signal.SIGTERM)  # Signal the child to terminate
-                        os.waitpid(pid, 0)  # Reap the child process
-                        break
-
-                else:  # In case of fork failure
-                    print("Fork failed. Exiting REPL.")  # Inform the user
-                    break  # Break out of the loop
+                message = input(">>> ")  # Read user input
+                if not message.strip():
+                    continue
+
+                with socketLock: # wait out a push the listener is reading
+                    idle.clear()
+                try:
+                    exitFound = self.executeCommand(s, message)  # Prepare and execute the correct command
+                finally:
+                    idle.set()
+                if exitFound:  # If exit command is typed
+                    break  # Exit the REPL loop
 
         except KeyboardInterrupt: #in case of ctrl+C
-            if pid == 0:
+            if idle.is_set() and socketLock.acquire(blocking=False): #only if no command was cut off mid-reply
+                idle.clear()
                 response = self.utility.clear() #formatting
                 request = Request(cmd="exit")
                 self.exitCmd(s, request)
-                print("\nExiting REPL...") #tell user 
+            print("\nExiting REPL...") #tell user 
         except EOFError:
             print("\nExiting REPL...")
+        except Exception as e:
+            print(f"Error: {e}")
         finally:
+            idle.clear() # stop the listener from reading
             readline.clear_history()
 
+    #########################################################################
+    # Function name: listenForServer
+    # Description: Runs in a thread for the whole REPL session. While the 
+    #              prompt is idle, waits for the socket to become readable; 
+    #              anything the server sends then is a push, not a reply. 
+    #              A shutdown notice, or the server closing the connection, 
+    #              signals the main thread with SIGUSR1.
+    # Parameters: 
+    #   - s          : The socket connected to the server.
+    #   - idle       : Event set while no command is running.
+    #   - socketLock : Lock held while reading the socket.
+    # Return Value: None
+    #########################################################################
+    def listenForServer(self, s, idle, socketLock):
+        selector = selectors.DefaultSelector()
+        selector.register(s, selectors.EVENT_READ)
+        try:
+            while True:
+                idle.wait()
+                if not self.utility.recv_buffer and not selector.select(timeout=0.2): # nothing pushed yet
+                    continue
+                with socketLock:
+                    if not idle.is_set(): # a command started, the data was its reply
+                        continue
+                    try:
+                        response = self.utility.recv_message(s, Response)
+                    except (ConnectionError, OSError, ValueError):
+                        response = Response(status="shutdown", message="Connection closed by server")
+                    if response.status == "shutdown":  # If server shuts down
+                        os.kill(os.getpid(), signal.SIGUSR1)  # Interrupt the prompt in the main thread
+                        return
+        finally:
+            selector.close()
+
+    #########################################################################
+    # Function name: startBatch
+    # Description: Connects to the server and executes commands back to back 
+    #              without the REPL. Blank lines and lines starting with 
+    #              '#' are skipped. Stops at the first failed command unless 
+    #              keepGoing is set, and ends the session with "exit" if the 
+    #              commands did not.
+    # Parameters: 
+    #   - commands    : Iterable of command strings.
+    #   - keepGoing   : Continue after a failed command.
+    #   - timingsPath : File for one JSON line of timing per command ('-' 
+    #                   for stderr), or None.
+    # Return Value: 
+    #   - int: 0 if every command succeeded, 1 if a command failed, 2 if 
+    #          the connection failed or the server shut down.
+    #########################################################################
+    def startBatch(self, commands, keepGoing=False, timingsPath=None):
+        status = 0
+        timings = None
+        try:
+            if timingsPath:
+                timings = sys.stderr if timingsPath == '-' else open(timingsPath, 'w')
+            mySock = socket.getaddrinfo(self.parsedArgs.host, self.parsedArgs.port, socket.AF_INET, socket.SOCK_STREAM)[0][4] #get ip
+            with self.connect(mySock) as s: #connect and agree on the protocol and message format
+                exited = False
+                for number, message in enumerate(commands, 1):
+                    message = message.strip()
+                    if not message or message.startswith('#'): #skip blank lines and comments
+                        continue
+                    request = self.parseCommand(message)
+                    sent, received = self.utility.bytes_sent, self.utility.bytes_received
+                    start = time.perf_counter()
+                    response = self.runCommand(s, request)
+                    seconds = time.perf_counter() - start
+                    if timings:
+                        timings.write(json.dumps({"line": number, "command": message, "status": response.status,
+                                                  "code": response.code, "seconds": seconds,
+                                                  "bytes_sent": self.utility.bytes_sent - sent,
+                                                  "bytes_received": self.utility.bytes_received - received}) + "\n")
+                        timings.flush()
+                    if request.cmd == "exit":
+                        exited = True
+                        break
+                    if response.status == "shutdown": #the server is going away, nothing more can run
+                        print(f"Error: {response.message}", file=sys.stderr)
+                        return 2
+                    if response.status != "success":
+                        status = 1
+                        if not keepGoing:
+                            break
+                if not exited: #end the session cleanly
+                    self.utility.send_all(s, Request(cmd="exit"))
+                    self.utility.recv_all(s, Response)
+        except Exception as e: #deal with errors
+            print(f"Fatal Error: {e}", file=sys.stderr)
+            status = 2
+        finally:
+            if timings and timings is not sys.stderr:
+                timings.close()
+            self.utility.tracer.close() #write any remaining trace events
+        return status
+
     #########################################################################
     # Function name: executeCommand
     # Description: Parses the user's input and executes the corresponding 
@@ -133,6 +265,20 @@ class Client:
     #   - bool: True if the user inputs "exit," otherwise False.
     #########################################################################
     def executeCommand(self, s, message):
+        request = self.parseCommand(message) #build the request
+        self.runCommand(s, request)
+        return request.cmd == "exit"
+
+    #########################################################################
+    # Function name: parseCommand
+    # Description: Builds a Request from a command line, splitting options 
+    #              from paths.
+    # Parameters: 
+    #   - message : The command string.
+    # Return Value: 
+    #   - request : The Request for the command.
+    #########################################################################
+    def parseCommand(self, message):
         command, *args = message.split() #split line by space
 
         options = [] #hold all things that start with '-'
@@ -147,75 +293,116 @@ class Client:
 
         if (request.cmd.startswith('l') and request.cmd != 'ls') or request.cmd == 'put': #switch under certain contditions
             request.local_path, request.remote_path = request.remote_path, request.local_path
+        return request
+
+    #########################################################################
+    # Function name: runCommand
+    # Description: Executes a parsed command, timing it when tracing is on.
+    # Parameters: 
+    #   - s       : The socket connected to the server.
+    #   - request : The Request built from the command line.
+    # Return Value: 
+    #   - response : The Response for the command.
+    #########################################################################
+    def runCommand(self, s, request):
+        with self.utility.tracer.span(f"command:{request.cmd}"): #time the whole command, round trips included
+            response = self.dispatchCommand(s, request)
+        self.utility.tracer.flush()
+        return response
+
+    #########################################################################
+    # Function name: dispatchCommand
+    # Description: Invokes the function for the request's command.
+    # Parameters: 
+    #   - s       : The socket connected to the server.
+    #   - request : The Request built from the user's input.
+    # Return Value: 
+    #   - response : The Response for the command (an error for an 
+    #                unknown command, or one the server does not 
+    #                support).
+    #########################################################################
+    def dispatchCommand(self, s, request):
+        #commands the server did not agree to in the handshake
+        if not self.utility.supports(request.cmd):
+            print(f"Error: The server does not support {request.cmd}")
+            return Response(status="error", message=f"The server does not support {request.cmd}", code="ERR_UNSUPPORTED")
 
         #exit command
-        if request.cmd == "exit": 
-            self.exitCmd(s, request) #call correct function
-            return True
+        elif request.cmd == "exit": 
+            return self.exitCmd(s, request) #call correct function
 
         #clear command
         elif request.cmd == "clear":
-            self.clearCmd(s, request) #call correct function
+            return self.clearCmd(s, request) #call correct function
 
         #help command
         elif request.cmd == "help": 
-            self.helpCmd(s, request) #call correct function
+            return self.helpCmd(s, request) #call correct function
 
         #cd command
         elif request.cmd == "cd": 
-            self.cdCmd(s, request) #call correct function
+            return self.cdCmd(s, request) #call correct function
 
         #get command
         elif request.cmd == "get": 
-            self.getCmd(s, request) #call correct function
+            return self.getCmd(s, request) #call correct function
 
         #lcd command
         elif request.cmd == "lcd": 
-            self.lcdCmd(s, request) #call correct function
+            return self.lcdCmd(s, request) #call correct function
 
         #lls command
         elif request.cmd == "lls": 
-            self.llsCmd(s, request) #call correct function
+            return self.llsCmd(s, request) #call correct function
 
         #lmkdir command
         elif request.cmd == "lmkdir": 
-            self.lmkdirCmd(s, request) #call correct function
+            return self.lmkdirCmd(s, request) #call correct function
 
         #lpwd command
         elif request.cmd == "lpwd": 
-            self.lpwdCmd(s, request) #call correct function
+            return self.lpwdCmd(s, request) #call correct function
 
         #ls command
         elif request.cmd == "ls": 
-            self.lsCmd(s, request) #call correct function
+            return self.lsCmd(s, request) #call correct function
 
         #mkdir command
         elif request.cmd == "mkdir": 
-            self.mkdirCmd(s, request) #call correct function
+            return self.mkdirCmd(s, request) #call correct function
 
         #put command
         elif request.cmd == "put": 
-            self.putCmd(s, request) #call correct function
+            return self.putCmd(s, request) #call correct function
 
         #pwd command
         elif request.cmd == "pwd": 
-            self.pwdCmd(s, request) #call correct function
+            return self.pwdCmd(s, request) #call correct function
 
         elif request.cmd == "rm":
-            self.rmCmd(s, request)
+            return self.rmCmd(s, request)
 
         elif request.cmd == "lrm":
-            self.lrmCmd(s, request)
+            return self.lrmCmd(s, request)
+
+        elif request.cmd == "cp":
+            return self.cpCmd(s, request)
+
+        elif request.cmd == "mv":
+            return self.mvCmd(s, request)
 
         elif request.cmd == "cat":
-            self.catCmd(s, request)
+            return self.catCmd(s, request)
 
         elif request.cmd == "lcat":
-            self.lcatCmd(s, request)
+            return self.lcatCmd(s, request)
+
+        elif request.cmd == "follow":
+            return self.followCmd(s, request)
 
         else: #print error
             print(f"Command not found: {request.cmd}")
-        return False #continue REPL
+            return Response(status="error", message=f"Command not found: {request.cmd}", code="ERR_COMMAND_NOT_FOUND")
 
     #########################################################################
     # Function name: exitCmd
@@ -224,13 +411,15 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the exit command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def exitCmd(self, s, request):
         self.utility.send_all(s, request) #send command to exit
         response = self.utility.recv_all(s, Response)
         if response.status == "success":
             print("Disconnecting from server and exiting REPL.")
+        return response
 
     #########################################################################
     # Function name: clearCmd
@@ -239,7 +428,8 @@ class Client:
     # Parameters: 
     #   - s        : The socket connected to the server.
     #   - request  : The Request object containing the clear command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def clearCmd(self, s, requeset):
         response = self.utility.clear() #get the response
@@ -247,6 +437,7 @@ class Client:
             pass #continue - no output
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: helpCmd
@@ -255,7 +446,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the help command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def helpCmd(self, s, request):
         response = self.utility.help() #get the response
@@ -263,6 +455,7 @@ class Client:
             print(response.message) #print help instructions
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: cdCmd
@@ -271,7 +464,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the cd command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def cdCmd(self, s, request):
         self.utility.send_all(s, request) #send command to change directory
@@ -280,6 +474,7 @@ class Client:
             pass #continue - no output
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: getCmd
@@ -288,7 +483,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the get command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def getCmd(self, s, request):
         response = self.utility.get(s, request)
@@ -296,6 +492,7 @@ class Client:
             print(response.message)
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: lcdCmd
@@ -304,7 +501,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the lcd command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def lcdCmd(self, s, request):
         response = self.utility.cd(request) #get the response
@@ -312,6 +510,7 @@ class Client:
             pass #continue - no output
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: llsCmd
@@ -320,7 +519,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the lls command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def llsCmd(self, s, request):
         response = self.utility.ls(request) #get the response
@@ -335,6 +535,7 @@ class Client:
                 print("")
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: lmkdirCmd
@@ -343,7 +544,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the lmkdir command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def lmkdirCmd(self, s, request):
         response = self.utility.mkdir(request) #get response
@@ -351,6 +553,7 @@ class Client:
             pass #continue - no output
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: lpwdCmd
@@ -359,7 +562,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the lpwd command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def lpwdCmd(self, s, request):
         response = self.utility.pwd() #get response
@@ -367,7 +571,8 @@ class Client:
             print(response.message) #print working directory
         else: #errors
             print(f"Error: {response.message}")
-        
+        return response
+
     #########################################################################
     # Function name: lsCmd
     # Description: Executes the "ls" command to list the contents of the 
@@ -375,7 +580,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the ls command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def lsCmd(self, s, request):
         self.utility.send_all(s, request) #send command 
@@ -391,6 +597,7 @@ class Client:
                 print("")
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: mkdirCmd
@@ -399,7 +606,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the mkdir command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def mkdirCmd(self, s, request):
         self.utility.send_all(s, request) #send command 
@@ -408,6 +616,7 @@ class Client:
             pass #continue - no output
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: putCmd
@@ -415,7 +624,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the put command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def putCmd(self, s, request):
         response = self.utility.put(s, request)
@@ -423,6 +633,7 @@ class Client:
             print(response.message)
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: pwdCmd
@@ -431,7 +642,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket connected to the server.
     #   - request : The Request object containing the pwd command.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def pwdCmd(self, s, request):
         self.utility.send_all(s, request) #send command 
@@ -440,6 +652,7 @@ class Client:
             print(response.message) #print working directory
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: lrmCmd
@@ -450,7 +663,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket object used for communication.
     #   - request : The request data to be sent for the "rm" operation.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def lrmCmd(self, s, request):
         response = self.utility.rm(request) #get the response
@@ -458,6 +672,7 @@ class Client:
             pass #continue - no output
         else: #errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: lcatCmd
@@ -468,7 +683,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket object used for communication.
     #   - request : The request data to be sent for the "cat" operation.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def lcatCmd(self, s, request):
         response = self.utility.cat(request)  # get the response
@@ -476,6 +692,7 @@ class Client:
             print(response.message)
         else:  # errors
             print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: rmCmd
@@ -485,7 +702,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket object used for communication.
     #   - request : The request data to be sent for the "rm" operation.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def rmCmd(self, s, request):
         self.utility.send_all(s, request)  # send command
@@ -494,6 +712,50 @@ class Client:
             pass  # continue - no output
         else:  # errors
             print(f"Error: {response.message}")
+        return response
+
+    #########################################################################
+    # Function name: cpCmd
+    # Description: Handles the "cp" command by sending a request via socket 
+    #              and receiving the response. The server copies the file 
+    #              itself, so no data crosses the network. If successful, 
+    #              there is no output. In case of an error, the error 
+    #              message is printed.
+    # Parameters: 
+    #   - s       : The socket object used for communication.
+    #   - request : The request data to be sent for the "cp" operation.
+    # Return Value: 
+    #   - response : The Response for the command.
+    #########################################################################
+    def cpCmd(self, s, request):
+        self.utility.send_all(s, request)  # send command
+        response = self.utility.recv_all(s, Response)  # get response
+        if response.status == "success":  # if successful
+            pass  # continue - no output
+        else:  # errors
+            print(f"Error: {response.message}")
+        return response
+
+    #########################################################################
+    # Function name: mvCmd
+    # Description: Handles the "mv" command by sending a request via socket 
+    #              and receiving the response. If successful, there is no 
+    #              output. In case of an error, the error message is 
+    #              printed.
+    # Parameters: 
+    #   - s       : The socket object used for communication.
+    #   - request : The request data to be sent for the "mv" operation.
+    # Return Value: 
+    #   - response : The Response for the command.
+    #########################################################################
+    def mvCmd(self, s, request):
+        self.utility.send_all(s, request)  # send command
+        response = self.utility.recv_all(s, Response)  # get response
+        if response.status == "success":  # if successful
+            pass  # continue - no output
+        else:  # errors
+            print(f"Error: {response.message}")
+        return response
 
     #########################################################################
     # Function name: catCmd
@@ -504,7 +766,8 @@ class Client:
     # Parameters: 
     #   - s       : The socket object used for communication.
     #   - request : The request data to be sent for the "cat" operation.
-    # Return Value: None
+    # Return Value: 
+    #   - response : The Response for the command.
     #########################################################################
     def catCmd(self, s, request):
         self.utility.send_all(s, request)  # send command
@@ -513,3 +776,43 @@ class Client:
             print(response.message)
         else:  # errors
             print(f"Error: {response.message}")
+        return response
+
+    #########################################################################
+    # Function name: followCmd
+    # Description: Handles the "follow" command by streaming data appended 
+    #              to a remote file until the user presses Ctrl-C. Ctrl-C 
+    #              only cancels the stream, the session stays connected.
+    # Parameters: 
+    #   - s       : The socket object used for communication.
+    #   - request : The request data to be sent for the "follow" operation.
+    # Return Value: 
+    #   - response : The Response that ended the stream.
+    #########################################################################
+    def followCmd(self, s, request):
+        cancelled = [] #set by the SIGINT handler instead of raising
+        previousHandler = signal.signal(signal.SIGINT, lambda signum, frame: cancelled.append(signum))
+        try:
+            self.utility.send_all(s, request)  # send command
+            while not cancelled:
+                if not self.utility.recv_buffer: #wait in short steps so Ctrl-C is noticed
+                    readable, _, _ = select.select([s], [], [], 0.2)
+                    if not readable:
+                        continue
+                response = self.utility.recv_all(s, Response)  # acknowledge and read appended bytes
+                if response.status != "success":  # errors
+                    print(f"Error: {response.message}")
+                    return response
+                if response.size == 0:  # the server ended the stream
+                    return response
+                sys.stdout.buffer.write(response.get_binary_data())
+                sys.stdout.flush()
+
+            self.utility.send_all(s, Response(status="cancel", message="Follow cancelled"))
+            response = self.utility.recv_message(s, Response)
+            while response.size > 0:  # skip announcements sent before the server saw the cancel
+                response = self.utility.recv_message(s, Response)
+            print("")
+            return response
+        finally:
+            signal.signal(signal.SIGINT, previousHandler)
@@ -5,6 +5,9 @@
 
 import sys
 import os
+import time
+import signal
+import functools
 
 from .Utility.Utility import Utility
 from .Model.Response import Response
@@ -12,7 +15,17 @@ from .Model.Request import Request
 from .Model.Connection import Connection
 
 from .Utility.session_pipe import update_session
-from .Utility.sec_check import normalize_path, is_within_root
+from .Utility.RequestProfiler import RequestProfiler
+from .Utility.MemoryTracker import MemoryTracker
+from .Utility.Tracer import Tracer
+from .Utility.Throttle import Throttle
+from .Utility.SessionRoot import SessionRoot
+from .Utility.Durability import Durability
+from .Utility.WriteBehind import WriteBehind
+from .Model.Codec import negotiate
+from .Model.Handshake import agree
+
+BATCH_COMMANDS = ("ls", "mkdir", "cd", "rm", "cp", "mv", "cat", "pwd")  # answered with a single message, so they can be batched
 
 #Citation:
 # Author: Python Docs
@@ -28,32 +41,78 @@ from .Utility.sec_check import normalize_path, is_within_root
 #/*                       directoryAbs - absolute path of the current    */
 #/*                                      directory                       */
 #/*                       write_fd - write end of session pipe           */
+#/*                       table - shared session table (SessionTable)    */
+#/*                       metrics - shared server metrics (Metrics)      */
+#/*                       buckets - shared global and per-IP transfer    */
+#/*                                 limits (SharedBuckets), or None      */
+#/*                       trash - trash directory for background rm -r   */
+#/*                               (Trash), or None                       */
+#/*                       options - parsed optional server settings      */
 #/*     Return Value:     none                                           */
 #/************************************************************************/
-def socketInfo(s, directoryAbs, write_fd):
+def socketInfo(s, directoryAbs, write_fd, table, metrics, buckets, trash, options):
     try:
         while True:
             clientConn, clientAdd = s.accept()  # Accept a new client connection
+            metrics.count_accept()
             clientConnection = Connection(clientAdd, clientConn)
+            slot = table.acquire()  # Reserve a session table slot (None if the table is full)
 
             pid = os.fork()  # Fork a new process
             if pid > 0:  # Parent process
+                metrics.count_fork()
                 clientConn.close()  # Close client socket in parent
-                while os.waitpid(-1, os.WNOHANG) > (0, 0):  # Clean up zombie processes
-                    pass
+                table.assign(slot, pid)
+                reapChildren(table)  # Clean up zombie processes
 
             elif pid == 0:  # Child process
+                pipe_info = {
+                    'connection': clientConnection,
+                    'write_fd'  : write_fd,
+                    'table'     : table,
+                    'slot'      : slot,
+                    'metrics'   : metrics,
+                    'profiler'  : None,
+                    'memory'    : None,
+                    'tracer'    : None,
+                    'throttle'  : None,
+                    'trash'     : trash,
+                    'options'   : options
+                }
                 try:
                     s.close()
-                    # Send connection object to the parent process
-                    update_session(write_fd=write_fd, connection=clientConnection)
+                    metrics.bind(slot)
+                    metrics.session_opened()
+                    if options.profile_dir:  # SIGUSR2 toggles profiling in this worker
+                        pipe_info['profiler'] = RequestProfiler(options.profile_dir, options.profile_every)
+                        signal.signal(signal.SIGUSR2, pipe_info['profiler'].toggle)
+                    if options.mem_threshold is not None:  # SIGUSR1 dumps this worker's top allocations
+                        pipe_info['memory'] = MemoryTracker(int(options.mem_threshold * 1024 * 1024),
+                                                            options.mem_top, options.mem_dir)
+                        signal.signal(signal.SIGUSR1, pipe_info['memory'].dump)
+                    if options.trace_dir:  # one trace file per worker, joined to the client's trace ID
+                        pipe_info['tracer'] = Tracer(os.path.join(options.trace_dir, f"server-{os.getpid()}-{int(time.time())}.json"),
+                                                     process_name=f"fileserver worker {os.getpid()}")
+                    if buckets or options.limit_session:  # pace file payloads, never protocol messages
+                        pipe_info['throttle'] = Throttle(clientAdd, options.limit_session and options.limit_session * 1024 * 1024,
+                                                         buckets, options.limit_burst)
+                    # Publish the new connection to the session monitor
+                    if slot is not None:
+                        table.open(slot, clientConnection)
+                    else:
+                        update_session(write_fd=write_fd, connection=clientConnection)
 
                     # Handle client requests in the child process
-                    childProcess(clientConnection.fd, directoryAbs, clientConnection, write_fd)
+                    childProcess(clientConnection.fd, directoryAbs, clientConnection, pipe_info)
                 except Exception as e:
                     print(f"Error in child process: {e}")
                 finally:
                     clientConnection.fd.close()
+                    if pipe_info['tracer']:
+                        pipe_info['tracer'].close()
+                    metrics.session_closed()
+                    if slot is not None:
+                        table.release(slot)
                 os._exit(0)
             else:
                 print("Fork failed")
@@ -64,6 +123,23 @@ def socketInfo(s, directoryAbs, write_fd):
     finally:
         pass
 
+#/************************************************************************/
+#/*     Function Name:    reapChildren                                   */
+#/*     Description:      Reaps finished workers without blocking and    */
+#/*                       frees their session table slots                */
+#/*     Parameters:       table - shared session table (SessionTable)    */
+#/*     Return Value:     none                                           */
+#/************************************************************************/
+def reapChildren(table):
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:  # No children left
+            break
+        if pid == 0:  # Remaining children are still running
+            break
+        table.reap(pid)
+
 #/************************************************************************/
 #/*     Function Name:    childProcess                                   */
 #/*     Description:      All client things are done through this        */
@@ -74,39 +150,98 @@ def socketInfo(s, directoryAbs, write_fd):
 #/*                                      directory                       */
 #/*                       connection - object of the Connection class to */
 #/*                                    keep track of each client         */
-#/*                       write_fd - write end of session pipe           */
+#/*                       pipe_info - session pipe write end, session    */
+#/*                                   table, this worker's slot, the     */
+#/*                                   shared metrics, instrumentation    */
+#/*                                   (profiler, memory tracker, tracer),*/
+#/*                                   the transfer throttle, trash and   */
+#/*                                   the server options                 */
 #/*     Return Value:     none                                           */
 #/************************************************************************/
-def childProcess(clientConn, directoryAbs, connection, write_fd):
+def childProcess(clientConn, directoryAbs, connection, pipe_info):
+    utility = Utility()
     try:
-        utility = Utility()
-        utility.local_working_directory = directoryAbs
+        utility.root = SessionRoot(directoryAbs)  # every path this session uses resolves beneath the served directory
+        utility.local_working_directory = utility.root.chdir("")  # start in the served directory
+        if pipe_info['tracer']:
+            utility.tracer = pipe_info['tracer']
+        utility.throttle = pipe_info['throttle']
+        utility.trash = pipe_info['trash']  # rm -r hands directories to the reaper
+        options = pipe_info['options']
+        utility.durability = Durability(options.durability, options.async_files, options.async_ms / 1000.0, pipe_info['metrics'])
+        if options.write_buffers > 0:
+            utility.write_behind = WriteBehind(options.write_buffers, options.write_buffer_kb * 1024)  # overlap upload network and disk IO
 
         while True:
+            utility.durability.wait(clientConn, bool(utility.recv_buffer))  # sync a due group of uploads while idle
+            received, sent = utility.bytes_received, utility.bytes_sent
+            waitStart = time.perf_counter()
+            if pipe_info['memory']:
+                pipe_info['memory'].begin()  # the upload payload is read with the request
             clientRequest = utility.recv_all(clientConn, Request)
-
-            if clientRequest.cmd != "cd":
-                connection.update_connection(command=clientRequest.cmd, pwd=utility.local_working_directory)
-                update_session(write_fd=write_fd, connection=connection)    # update the session
+            start = time.perf_counter()
+            if clientRequest.size > 0:  # time spent receiving an upload is part of the request
+                start = waitStart
 
             if clientRequest.cmd == "exit":
+                connection.update_connection(command=clientRequest.cmd, pwd=utility.local_working_directory)
+                reportSession(utility, pipe_info)    # the monitor removes the client's row
                 break
 
-            pipe_info = {
-                'connection': connection,
-                'write_fd'  : write_fd 
-            }
-
-            getCommand(utility, directoryAbs, clientRequest, clientConn, pipe_info)
+            with utility.tracer.span(f"request:{clientRequest.cmd}", path=clientRequest.remote_path):
+                response = dispatchRequest(utility, directoryAbs, clientRequest, clientConn, pipe_info)
+            connection.update_connection(command=clientRequest.cmd, pwd=utility.local_working_directory)
+            reportSession(utility, pipe_info)    # after the command, so its bytes and a cd's new directory count
+            pipe_info['metrics'].observe(clientRequest.cmd, time.perf_counter() - start,
+                                         utility.bytes_received - received, utility.bytes_sent - sent, response)
+            utility.tracer.flush()  # one write per request keeps the trace readable if the worker dies
 
-        os.close(write_fd)
+        utility.durability.flush()
+        os.close(pipe_info['write_fd'])
         cleanUp(utility, clientConn)
     except KeyboardInterrupt:
         response = Response(status="shutdown", message="Server shutting down in 5 seconds....")
-        clientConn.sendall(response.prepare())
+        clientConn.sendall(response.prepare(utility.codec))
     except Exception as e: #catch all other errors
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        if utility.durability:
+            utility.durability.flush()  # acknowledged uploads still waiting for their sync
+
+#/************************************************************************/
+#/*     Function Name:    reportSession                                  */
+#/*     Description:      Publishes this client's connection details to  */
+#/*                       the session monitor, through the shared        */
+#/*                       session table or the pipe if it has no slot    */
+#/*     Parameters:       utility - object of Utility class, holds the   */
+#/*                                 connection's byte counters           */
+#/*                       pipe_info - session pipe write end, session    */
+#/*                                   table and this worker's slot       */
+#/*     Return Value:     none                                           */
+#/************************************************************************/
+def reportSession(utility, pipe_info):
+    if pipe_info['slot'] is not None:
+        pipe_info['table'].update(pipe_info['slot'], pipe_info['connection'],
+                                  utility.bytes_received, utility.bytes_sent)
+    else:
+        update_session(write_fd=pipe_info['write_fd'], connection=pipe_info['connection'])
+
+#/************************************************************************/
+#/*     Function Name:    dispatchRequest                                */
+#/*     Description:      Runs getCommand under the worker's optional    */
+#/*                       instrumentation (profiler, memory tracker)     */
+#/*     Parameters:       same as getCommand                             */
+#/*     Return Value:     response - the final response sent, or None    */
+#/*                                  for an unknown command              */
+#/************************************************************************/
+def dispatchRequest(utility, directory, request, clientConn, pipe_info):
+    dispatch = getCommand
+    if pipe_info['profiler']:
+        dispatch = functools.partial(pipe_info['profiler'].run, request.cmd, dispatch)
+    if pipe_info['memory']:
+        dispatch = functools.partial(pipe_info['memory'].run, request, dispatch)
+    return dispatch(utility, directory, request, clientConn, pipe_info)
 
 #/************************************************************************/
 #/*     Function Name:    getCommand                                     */
@@ -116,62 +251,112 @@ def childProcess(clientConn, directoryAbs, connection, write_fd):
 #/*                       directory - user given directory               */
 #/*                       request - the client request for a command     */
 #/*                       clientConn - client socket file descriptor     */
-#/*                       connection - object of the Connection class to */
-#/*                                    keep track of each client         */
-#/*                       write_fd - write end of session pipe           */
-#/*     Return Value:     none                                           */
+#/*                       pipe_info - connection, session pipe write     */
+#/*                                   end, session table and slot        */
+#/*     Return Value:     response - the final response sent, or None    */
+#/*                                  for an unknown command              */
 #/************************************************************************/
 def getCommand(utility, directory, request, clientConn, pipe_info):
+    response = None
     if request.cmd == "get":
-        secPass = security(request.remote_path, directory)
+        with utility.tracer.span("security"):
+            secPass = security(request.remote_path, utility.root)
         if not secPass:
-            failureResponse(utility, clientConn)
+            response = failureResponse(utility, clientConn)
         else:
             response = utility.send_file(clientConn, request)
             utility.send_all(clientConn, response)
-    elif request.cmd == "ls":
-        response = utility.ls(request)
-        utility.send_all(clientConn, response)
-    elif request.cmd == "mkdir":
-        secPass = security(request.remote_path,directory)
-        if not secPass:
-            failureResponse(utility, clientConn)
-        else:
-            response = utility.mkdir(request)
-            utility.send_all(clientConn, response)
     elif request.cmd == "put":
-        secPass = security(request.remote_path,directory)
-        if not secPass:
-            failureResponse(utility, clientConn)
-        else:
-            response = utility.receive_file(request)
-            utility.send_all(clientConn, response)
-    elif request.cmd == "cd":
-        secPass = security(request.remote_path, directory)
+        with utility.tracer.span("security"):
+            secPass = security(request.remote_path, utility.root)
         if not secPass:
-            failureResponse(utility, clientConn)
+            utility.discard_payload(clientConn)  # a large upload is still on the socket
+            response = failureResponse(utility, clientConn)
         else:
-            response = utility.cd(request)
-            pipe_info['connection'].update_connection(command=request.cmd, pwd=utility.local_working_directory)           # update this clients last command
-            update_session(write_fd=pipe_info['write_fd'], connection=pipe_info['connection'])    # update the session
+            response = utility.receive_file(clientConn, request)
             utility.send_all(clientConn, response)
     elif request.cmd == "pwd":
         response = utility.pwd()
+        codec = negotiate(request.codecs)  # a client offering codecs switches right after this reply
+        if codec:
+            response.codec = codec.name
+        if request.protocol:  # the client's hello, answer with what both sides speak
+            utility.protocol, capabilities = agree(request.protocol, request.capabilities)
+            utility.capabilities = set(capabilities)
+            response.protocol, response.capabilities = utility.protocol, capabilities
+        utility.send_all(clientConn, response)
+        if codec:
+            utility.codec = codec
+    elif request.cmd in BATCH_COMMANDS:
+        response = runCommand(utility, request)
+        utility.send_all(clientConn, response)
+    elif request.cmd == "batch":
+        response = runBatch(utility, request)
         utility.send_all(clientConn, response)
-    elif request.cmd == "rm":
-        secPass = security(request.remote_path, directory)
+    elif request.cmd == "follow":
+        with utility.tracer.span("security"):
+            secPass = security(request.remote_path, utility.root)
         if not secPass:
-            failureResponse(utility, clientConn)
+            response = failureResponse(utility, clientConn)
         else:
-            response = utility.rm(request)
+            response = utility.follow(clientConn, request)
             utility.send_all(clientConn, response)
-    elif request.cmd == "cat":
-        secPass = security(request.remote_path, directory)
-        if not secPass:
-            failureResponse(utility, clientConn)
+    return response
+
+#/************************************************************************/
+#/*     Function Name:    runCommand                                     */
+#/*     Description:      Runs a command answered with a single message  */
+#/*                       (ls, mkdir, cd, pwd, rm, cp, mv, cat) after    */
+#/*                       the security check of both of its paths,       */
+#/*                       without sending the reply, so                  */
+#/*                       a batch can collect the replies of many        */
+#/*     Parameters:       utility - object of Utility class              */
+#/*                       request - the request for one command          */
+#/*     Return Value:     response - the reply to send                   */
+#/************************************************************************/
+def runCommand(utility, request):
+    if request.cmd == "pwd":
+        return utility.pwd()
+
+    with utility.tracer.span("security"):
+        secPass = security(request.remote_path, utility.root) and security(request.local_path, utility.root)
+    if not secPass:
+        return deniedResponse()
+
+    with utility.tracer.span(f"fs_{request.cmd}", path=request.remote_path):
+        response = getattr(utility, request.cmd)(request)
+    return response
+
+#/************************************************************************/
+#/*     Function Name:    runBatch                                       */
+#/*     Description:      Runs the sub-requests of a batch in order and  */
+#/*                       collects one reply per sub-request, so a       */
+#/*                       series of commands costs one round trip. With  */
+#/*                       the -e option the batch stops at the first     */
+#/*                       failed sub-request                             */
+#/*     Parameters:       utility - object of Utility class              */
+#/*                       request - the batch request                    */
+#/*     Return Value:     response - the batch reply, carrying the       */
+#/*                                  sub-request replies in responses    */
+#/************************************************************************/
+def runBatch(utility, request):
+    responses = []
+    failed = 0
+    for item in request.requests or []:
+        if not isinstance(item, Request) or item.cmd not in BATCH_COMMANDS:  # payloads and streams need their own round trips
+            command = item.cmd if isinstance(item, Request) else item
+            itemResponse = Response(status="error", message=f"Command '{command}' cannot run in a batch", code="ERR_BATCH_UNSUPPORTED")
         else:
-            response = utility.cat(request)
-            utility.send_all(clientConn, response)
+            itemResponse = runCommand(utility, item)
+        responses.append(itemResponse)
+        if itemResponse.status != "success":
+            failed += 1
+            if '-e' in request.options:
+                break
+
+    if failed:
+        return Response(status="error", message=f"{failed} of {len(responses)} requests failed", code="ERR_BATCH", responses=responses)
+    return Response(status="success", message=f"{len(responses)} requests succeeded", responses=responses)
 
 #/************************************************************************/
 #/*     Function Name:    cleanUp                                        */
@@ -189,19 +374,18 @@ def cleanUp(utility, clientConn):
 #/************************************************************************/
 #/*     Function Name:    security                                       */
 #/*     Description:      Check to see that the client is not trying to  */
-#/*                       get into an ancestor directory                 */
+#/*                       get into an ancestor directory. A string check */
+#/*                       only; symlinks are refused by the kernel when  */
+#/*                       the session root opens the path                */
 #/*     Parameters:       filePath - path from client                    */
-#/*                       directory - user given directory               */
+#/*                       root - the session's SessionRoot               */
 #/*     Return Value:     secCheck - boolean value if passed security    */
 #/*                                  check                               */
 #/************************************************************************/
-def security(filePath, directory):
+def security(filePath, root):
     secCheck = True
 
-    root = normalize_path(directory)
-    target = normalize_path(filePath)
-
-    if not is_within_root(root, target):
+    if not root.within(filePath):
         secCheck = False
 
     return secCheck
@@ -212,8 +396,19 @@ def security(filePath, directory):
 #/*     Parameters:       utility - object of Utility class to send and  */
 #/*                                 recieve responses and requests       */
 #/*                       clientConn - client socket file descriptor     */
-#/*     Return Value:     none                                           */
+#/*     Return Value:     failure - the response that was sent           */
 #/************************************************************************/
 def failureResponse(utility, clientConn):
-    failure = Response(status="error", message="Permission Denied")
-    utility.send_all(clientConn, failure)
\ No newline at end of file
+    failure = deniedResponse()
+    utility.send_all(clientConn, failure)
+    return failure
+
+#/************************************************************************/
+#/*     Function Name:    deniedResponse                                 */
+#/*     Description:      Builds the response to a security failure      */
+#/*                       without sending it                             */
+#/*     Parameters:       none                                           */
+#/*     Return Value:     the permission denied response                 */
+#/************************************************************************/
+def deniedResponse():
+    return Response(status="error", message="Permission Denied", code="ERR_PERMISSION_DENIED")
\ No newline at end of file
@@ -15,7 +15,8 @@ from inc.Parser.clientParser import parseClient
 # Function name: main
 # Description: The main entry point for the client application. It parses 
 #              command-line arguments and initializes the Client object, 
-#              then starts the client connection.
+#              then starts the client connection, or runs the commands 
+#              given with -c/--batch and exits with the batch status.
 # Parameters: None
 # Return Value: None
 #########################################################################
@@ -23,6 +24,18 @@ def main():
     parsedArgs = parseClient(sys.argv[1:]) #get command line values
     
     client1 = Client(parsedArgs)
+    if parsedArgs.command or parsedArgs.batch: #batch mode, no REPL
+        commands = list(parsedArgs.command or [])
+        if parsedArgs.batch == '-':
+            commands += sys.stdin.readlines()
+        elif parsedArgs.batch:
+            try:
+                with open(parsedArgs.batch, 'r') as file:
+                    commands += file.readlines()
+            except OSError as e:
+                print(f"Fatal Error: {e}", file=sys.stderr)
+                sys.exit(2)
+        sys.exit(client1.startBatch(commands, parsedArgs.keep_going, parsedArgs.timings))
     client1.startClient()
 
 if __name__ == "__main__":
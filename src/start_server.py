@@ -16,6 +16,10 @@ from inc.Parser.serverP import parseArgs
 from inc.fileserver import socketInfo
 from inc.Utility.Session import Session
 from inc.Utility.session_pipe import read_pipe
+from inc.Utility.SessionTable import SessionTable
+from inc.Utility.Metrics import Metrics
+from inc.Utility.Throttle import SharedBuckets
+from inc.Utility.Reaper import Trash, Reaper, ReaperProgress
 
 #/************************************************************************/
 #/*     Function Name:    main                                           */
@@ -26,7 +30,17 @@ from inc.Utility.session_pipe import read_pipe
 #/************************************************************************/
 def main():
     try:
+        port, _, directoryAbs, args = parseArgs(sys.argv[1:])
         read_fd, write_fd = os.pipe()
+        os.set_blocking(write_fd, False)  # Workers drop monitor updates rather than block on a full pipe
+        table = SessionTable(args.sessions)  # Shared memory, must exist before forking
+        metrics = Metrics(args.sessions)
+        metrics.durability = args.durability
+        buckets = None
+        if args.limit_ip or args.limit_global:  # Global and per-IP limits are shared by every worker
+            buckets = SharedBuckets(args.limit_global and args.limit_global * 1024 * 1024,
+                                    args.limit_ip and args.limit_ip * 1024 * 1024, args.limit_burst, args.sessions)
+        trash, progress = startReaper(args.trash_dir, directoryAbs) if args.trash_dir else (None, None)
 
         pid = os.fork()  # Fork the process
         if pid == 0:
@@ -34,16 +48,17 @@ def main():
             # Child process: handle reading from the pipe
             os.close(write_fd)  # Close unused write end
             session = Session()
-            read_pipe(read_fd, session)
+            if args.metrics_port:  # Serve metrics from the monitor process, away from the acceptor
+                metrics.serve(args.metrics_port)
+            read_pipe(read_fd, session, args.fps, table, progress)
             os._exit(0)
         else:
             # Parent process: handle socket communication
             os.close(read_fd)  # Close unused read end
-            port, _, directoryAbs = parseArgs(sys.argv[1:])
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.bind(('', int(port)))  # Bind to the host and port
                 s.listen()  # Start listening for incoming connections
-                socketInfo(s, directoryAbs, write_fd)
+                socketInfo(s, directoryAbs, write_fd, table, metrics, buckets, trash, args)
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
@@ -51,6 +66,36 @@ def main():
         #sys.exit(0)
         pass
 
+#/************************************************************************/
+#/*     Function Name:    startReaper                                    */
+#/*     Description:      Opens the trash directory that rm -r renames   */
+#/*                       directories into and forks the reaper that     */
+#/*                       deletes them in the background                 */
+#/*     Parameters:       trashDir - the --trash-dir directory           */
+#/*                       directoryAbs - absolute path of the served     */
+#/*                                      directory                       */
+#/*     Return Value:     tuple of the Trash and the ReaperProgress the  */
+#/*                       session monitor shows                          */
+#/************************************************************************/
+def startReaper(trashDir, directoryAbs):
+    served = os.path.realpath(directoryAbs)
+    trashReal = os.path.realpath(trashDir)
+    if trashReal == served or trashReal.startswith(served.rstrip('/') + '/') or served.startswith(trashReal.rstrip('/') + '/'):
+        raise ValueError(f"--trash-dir must be outside the served directory: {trashReal}")
+    trash = Trash(trashReal)
+    if os.stat(served).st_dev != trash.device:
+        print(f"Warning: {trash.path} is on another file system, rm -r will delete in place")
+    progress = ReaperProgress()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            Reaper(trash, progress).run()
+        except KeyboardInterrupt:
+            pass
+        os._exit(0)
+    return trash, progress
+
 #/************************************************************************/
 #/*     Function Name:    killNicely                                     */
 #/*     Description:      Signal Handler to kill the server              */
@@ -0,0 +1,70 @@
+# Trey Rubino
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.fileserver import runBatch
+from inc.Model.Request import Request
+from inc.Utility.SessionRoot import SessionRoot
+from inc.Utility.Utility import Utility
+
+@pytest.fixture
+def utility(tmp_path, monkeypatch):
+    # A session as childProcess sets it up; `chdir` moves the process, so it is restored afterwards
+    monkeypatch.chdir(tmp_path)
+    served = tmp_path / "served"
+    served.mkdir()
+    (served / "a.txt").write_text("inside\n")
+    (tmp_path / "secret").write_text("outside\n")
+    os.symlink("../secret", served / "escape")
+    utility = Utility()
+    utility.root = SessionRoot(str(served))
+    utility.local_working_directory = utility.root.chdir("")
+    yield utility
+    utility.root.close()
+
+def statuses(response) -> list:
+    return [(item.status, item.code) for item in response.responses]
+
+def test_runs_items_in_order(utility):
+    response = runBatch(utility, Request(cmd="batch", requests=[Request(cmd="mkdir", remote_path="d"),
+                                                                Request(cmd="cd", remote_path="d"),
+                                                                Request(cmd="pwd")]))
+    assert response.status == "success"
+    assert response.responses[2].message == os.path.join(utility.root.path, "d")
+
+def test_denies_items_outside_the_root(utility, tmp_path):
+    response = runBatch(utility, Request(cmd="batch", requests=[Request(cmd="cat", remote_path="../secret"),
+                                                                Request(cmd="cat", remote_path=str(tmp_path / "secret")),
+                                                                Request(cmd="cd", remote_path=".."),
+                                                                Request(cmd="mkdir", remote_path="../made"),
+                                                                Request(cmd="cp", remote_path="a.txt", local_path="../copy"),
+                                                                Request(cmd="cat", remote_path="a.txt")]))
+    assert response.status == "error" and response.code == "ERR_BATCH"
+    assert statuses(response)[:5] == [("error", "ERR_PERMISSION_DENIED")] * 5
+    assert response.responses[5].status == "success"
+    assert sorted(os.listdir(tmp_path)) == ["secret", "served"]
+    assert utility.local_working_directory == utility.root.path
+
+def test_denies_symlinks_out_of_the_root(utility):
+    response = runBatch(utility, Request(cmd="batch", requests=[Request(cmd="cat", remote_path="escape")]))
+    assert response.status == "error"
+    assert statuses(response) == [("error", "ERR_PERMISSION_DENIED")]
+
+def test_refuses_commands_with_payloads(utility):
+    response = runBatch(utility, Request(cmd="batch", requests=[Request(cmd="get", remote_path="a.txt"),
+                                                                Request(cmd="batch", requests=[]),
+                                                                Request(cmd="exit")]))
+    assert statuses(response) == [("error", "ERR_BATCH_UNSUPPORTED")] * 3
+
+def test_stop_on_error(utility):
+    response = runBatch(utility, Request(cmd="batch", options=["-e"], requests=[Request(cmd="cat", remote_path="../secret"),
+                                                                               Request(cmd="mkdir", remote_path="d")]))
+    assert len(response.responses) == 1
+    assert not os.path.exists(os.path.join(utility.root.path, "d"))
@@ -0,0 +1,74 @@
+# Trey Rubino
+
+import sys
+import os
+import json
+import socket
+import subprocess
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+CLIENT = os.path.join(project_root, "src", "start_client.py")
+
+def client(port: int, *arguments, stdin: str = None, cwd: str = None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, CLIENT, "-h", "127.0.0.1", "-p", str(port), *arguments],
+                          input=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                          cwd=cwd, timeout=60)
+
+def served(server, *parts) -> str:
+    return os.path.join(server.root, *parts)
+
+def test_every_command_succeeds(server, tmp_path):
+    (tmp_path / "report.txt").write_text("report\n")
+    result = client(server.port, "-c", "mkdir out", "-c", "put report.txt out", "-c", "cd out", "-c", "ls",
+                    cwd=str(tmp_path))
+    assert result.returncode == 0, result.stderr
+    assert open(served(server, "out", "report.txt")).read() == "report\n"
+
+def test_stops_at_the_first_failure(server):
+    result = client(server.port, "-c", "mkdir a", "-c", "mkdir a", "-c", "mkdir b")
+    assert result.returncode == 1
+    assert os.path.isdir(served(server, "a")) and not os.path.exists(served(server, "b"))
+
+def test_keep_going_runs_the_rest(server):
+    result = client(server.port, "-c", "mkdir a", "-c", "mkdir a", "-c", "mkdir b", "--keep-going")
+    assert result.returncode == 1
+    assert os.path.isdir(served(server, "b"))
+
+def test_connection_failure():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]                               # bound but not listening, connecting is refused
+    try:
+        result = client(port, "-c", "pwd")
+    finally:
+        probe.close()
+    assert result.returncode == 2 and "Fatal Error" in result.stderr
+
+def test_missing_batch_file(server, tmp_path):
+    assert client(server.port, "-b", str(tmp_path / "missing")).returncode == 2
+
+@pytest.mark.parametrize("from_stdin", [False, True])
+def test_batch_file_and_timings(server, tmp_path, from_stdin):
+    commands = "# set up\nmkdir logs\n\ncd missing\nmkdir logs/2024\n"
+    (tmp_path / "commands").write_text(commands)
+    source = ["-b", "-"] if from_stdin else ["-b", str(tmp_path / "commands")]
+    result = client(server.port, *source, "--keep-going", "--timings", str(tmp_path / "timings.jsonl"),
+                    stdin=commands if from_stdin else None)
+    assert result.returncode == 1
+    assert os.path.isdir(served(server, "logs", "2024"))
+    timings = [json.loads(line) for line in (tmp_path / "timings.jsonl").read_text().splitlines()]
+    assert [(timing["line"], timing["command"], timing["status"]) for timing in timings] == \
+        [(2, "mkdir logs", "success"), (4, "cd missing", "error"), (5, "mkdir logs/2024", "success")]
+    assert timings[1]["code"] == "ERR_INVALID_DIR" and timings[0]["code"] is None
+    assert all(timing["seconds"] >= 0 and timing["bytes_sent"] > 0 and timing["bytes_received"] > 0 for timing in timings)
+
+def test_timings_on_stderr(server):
+    result = client(server.port, "-c", "pwd", "--timings", "-")
+    assert result.returncode == 0
+    timings = [json.loads(line) for line in result.stderr.splitlines() if line.startswith("{")]
+    assert [(timing["line"], timing["command"], timing["status"]) for timing in timings] == [(1, "pwd", "success")]
@@ -0,0 +1,71 @@
+# Trey Rubino
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Model.Codec import CODECS, JSON, negotiate
+from inc.Model.Request import Request
+from inc.Model.Response import Response, Content
+
+def listing(entries: int) -> Response:
+    return Response(status="success", message="é ✓", contents=[Content(mode="-rw-r--r--", nlink=1, user="user", group="group",
+                                                                      size=i * 4096, mtime="2024-11-26 12:00", name=f"file-{i}.txt")
+                                                              for i in range(entries)])
+
+def round_trip(codec, obj, cls):
+    fields, rest = codec.decode(obj.prepare(codec))
+    assert rest == b""
+    return cls.from_dict(fields, cls)
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_request_round_trip(name):
+    request = Request(cmd="get", options=["-v"], remote_path="dir/file.txt", local_path=".", size=2 ** 40,
+                      validator={"size": 3, "mtime": 1.5, "sha256": "ab"}, trace_id="t-1")
+    assert round_trip(CODECS[name], request, Request) == request
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+@pytest.mark.parametrize("entries", [0, 1, 250])
+def test_listing_round_trip(name, entries):
+    response = listing(entries)
+    decoded = round_trip(CODECS[name], response, Response)
+    assert decoded == response
+    assert all(isinstance(entry, Content) for entry in decoded.contents)
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_none_fields_are_left_out(name):
+    fields, _ = CODECS[name].decode(Request(cmd="pwd").prepare(CODECS[name]))
+    assert "codecs" not in fields and "protocol" not in fields
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_split_and_back_to_back_messages(name):
+    codec = CODECS[name]
+    first, second = Request(cmd="ls").prepare(codec), Request(cmd="cd", remote_path="a}b").prepare(codec)
+    stream = first + second
+    assert codec.decode(first[:-1]) is None                     # incomplete, keep reading
+    fields, rest = codec.decode(stream)
+    assert fields["cmd"] == "ls" and rest == second
+    fields, rest = codec.decode(rest)
+    assert fields["remote_path"] == "a}b" and rest == b""
+
+def test_binary_values():
+    codec = CODECS["binary"]
+    values = {"none": None, "flag": True, "negative": -7, "float": 0.25, "raw": b"\x00\xff", "nested": [{"a": [1, "x"]}]}
+    response = Response(status="success", validator=values)
+    fields, _ = codec.decode(codec.encode(response))
+    assert fields["validator"] == values
+
+def test_binary_rejects_other_framing():
+    with pytest.raises(ValueError):
+        CODECS["binary"].decode(Request(cmd="ls").encode())
+
+def test_negotiate_picks_in_client_order():
+    assert negotiate(["zstd", "binary", "json"]) is CODECS["binary"]
+    assert negotiate(["json", "binary"]) is JSON
+    assert negotiate(None) is None
+    assert negotiate(["unknown"]) is None
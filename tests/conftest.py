@@ -0,0 +1,52 @@
+# Trey Rubino
+
+import sys
+import os
+import time
+import signal
+import socket
+import subprocess
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Server:
+    """
+    A real file server in its own process group, serving a temporary directory on a free local port.
+    """
+
+    def __init__(self, root: str, *options):
+        probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        probe.bind(("127.0.0.1", 0))
+        self.port = probe.getsockname()[1]
+        probe.close()
+        self.root = root
+        self.process = subprocess.Popen([sys.executable, os.path.join(project_root, "src", "start_server.py"),
+                                         "-p", str(self.port), "-d", root, *options],
+                                        cwd=root, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL, start_new_session=True)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port)).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("The server did not start")
+                time.sleep(0.05)
+
+    def stop(self) -> None:
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)         # the acceptor, the monitor and every worker
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "served").mkdir()
+    server = Server(str(tmp_path / "served"))
+    yield server
+    server.stop()
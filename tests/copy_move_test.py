@@ -0,0 +1,97 @@
+# Trey Rubino
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Model.Request import Request
+from inc.Utility.SessionRoot import SessionRoot
+from inc.Utility.Utility import Utility
+
+@pytest.fixture
+def utility(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    served = tmp_path / "served"
+    (served / "dir" / "sub").mkdir(parents=True)
+    (served / "a.txt").write_text("original\n")
+    (served / "dir" / "sub" / "f").write_text("nested\n")
+    (tmp_path / "secret").write_text("outside\n")
+    os.symlink("../secret", served / "escape")
+    os.symlink("..", served / "up")
+    utility = Utility()
+    utility.root = SessionRoot(str(served))
+    utility.local_working_directory = utility.root.chdir("")
+    yield utility
+    utility.root.close()
+
+def cp(utility, source, destination, *options):
+    return utility.cp(Request(cmd="cp", options=list(options), remote_path=source, local_path=destination))
+
+def mv(utility, source, destination):
+    return utility.mv(Request(cmd="mv", remote_path=source, local_path=destination))
+
+def served(utility, *parts) -> str:
+    return os.path.join(utility.root.path, *parts)
+
+def test_copy_file_and_into_directory(utility):
+    assert cp(utility, "a.txt", "b.txt").status == "success"
+    assert cp(utility, "a.txt", "dir").status == "success"
+    assert open(served(utility, "b.txt")).read() == open(served(utility, "dir", "a.txt")).read() == "original\n"
+
+def test_copy_replaces_destination_atomically(utility):
+    (open(served(utility, "b.txt"), "w")).write("older and longer\n")
+    os.chmod(served(utility, "b.txt"), 0o600)
+    before = os.stat(served(utility, "b.txt")).st_ino
+    assert cp(utility, "a.txt", "b.txt").status == "success"
+    after = os.stat(served(utility, "b.txt"))
+    assert open(served(utility, "b.txt")).read() == "original\n"
+    assert after.st_ino != before                               # renamed over, not rewritten in place
+    assert after.st_mode & 0o777 == 0o600
+    assert not [name for name in os.listdir(utility.root.path) if name.endswith(".part")]
+
+@pytest.mark.parametrize("destination", ["a.txt", "./a.txt", ".", "hard"])
+def test_copy_onto_itself_keeps_the_file(utility, destination):
+    os.link(served(utility, "a.txt"), served(utility, "hard"))
+    response = cp(utility, "a.txt" if destination != "." else served(utility, "a.txt"), destination)
+    assert response.status == "error" and response.code == "ERR_COPY"
+    assert open(served(utility, "a.txt")).read() == "original\n"
+
+def test_copy_does_not_write_through_symlinks(utility, tmp_path):
+    response = cp(utility, "a.txt", "escape")
+    assert response.status == "error"
+    assert (tmp_path / "secret").read_text() == "outside\n"
+
+def test_copy_tree(utility):
+    assert cp(utility, "dir", "copy").code == "ERR_IS_DIRECTORY"
+    assert cp(utility, "dir", "copy", "-r").status == "success"
+    assert open(served(utility, "copy", "sub", "f")).read() == "nested\n"
+    assert cp(utility, "dir", "dir/sub", "-r").code == "ERR_COPY"
+
+@pytest.mark.parametrize("source, destination", [("../secret", "stolen"), ("escape", "stolen"), ("up/secret", "stolen"),
+                                                 ("a.txt", "../planted"), ("a.txt", "up/planted")])
+def test_copy_stays_inside_the_root(utility, tmp_path, source, destination):
+    assert cp(utility, source, destination).code == "ERR_PERMISSION_DENIED"
+    assert sorted(os.listdir(tmp_path)) == ["secret", "served"]
+    assert not os.path.exists(served(utility, "stolen"))
+
+def test_move_and_rename(utility):
+    assert mv(utility, "a.txt", "dir").status == "success"
+    assert mv(utility, "dir/a.txt", "dir/b.txt").status == "success"
+    assert sorted(os.listdir(served(utility, "dir"))) == ["b.txt", "sub"]
+
+def test_move_symlink_moves_the_link(utility, tmp_path):
+    assert mv(utility, "escape", "dir").status == "success"
+    assert os.readlink(served(utility, "dir", "escape")) == "../secret"
+    assert (tmp_path / "secret").read_text() == "outside\n"
+
+@pytest.mark.parametrize("source, destination", [("../secret", "stolen"), ("up/secret", "stolen"),
+                                                 ("a.txt", "../planted"), ("a.txt", "up/planted")])
+def test_move_stays_inside_the_root(utility, tmp_path, source, destination):
+    assert mv(utility, source, destination).code == "ERR_PERMISSION_DENIED"
+    assert sorted(os.listdir(tmp_path)) == ["secret", "served"]
+    assert os.path.exists(served(utility, "a.txt"))
@@ -0,0 +1,123 @@
+# Trey Rubino
+
+import sys
+import os
+import time
+import socket
+import hashlib
+import threading
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Model.Request import Request
+from inc.Utility.DownloadCache import DownloadCache
+from inc.Utility.SessionRoot import SessionRoot
+from inc.Utility.Utility import Utility
+
+def validator(data: bytes, mtime: int = 1) -> dict:
+    return {"size": len(data), "mtime": mtime, "sha256": hashlib.sha256(data).hexdigest()}
+
+def blobs(cache) -> list:
+    return sorted(os.listdir(os.path.join(cache.directory, "blobs")))
+
+@pytest.fixture
+def cache(tmp_path):
+    return DownloadCache(str(tmp_path / "cache"), max_bytes=10, namespace="host:1")
+
+def test_store_and_lookup(cache, tmp_path):
+    entry = cache.store("d/f", validator(b"hello"), b"hello")
+    assert cache.lookup("./d//f") == entry                      # keys are normalized
+    assert cache.lookup("g") is None
+    reopened = DownloadCache(str(tmp_path / "cache"), max_bytes=10, namespace="host:1")
+    assert reopened.lookup("d/f") == entry
+    assert DownloadCache(str(tmp_path / "cache"), max_bytes=10, namespace="host:2").lookup("d/f") is None
+
+def test_contents_larger_than_the_cache_are_not_stored(cache):
+    assert cache.store("f", validator(b"x" * 11), b"x" * 11) is None
+    assert cache.lookup("f") is None and blobs(cache) == []
+
+def test_eviction_counts_shared_blobs_once(cache):
+    cache.store("a", validator(b"same!"), b"same!")
+    cache.store("b", validator(b"same!"), b"same!")             # shares a's blob, still 5 bytes in total
+    cache.store("c", validator(b"other"), b"other")
+    assert list(cache.entries) == ["host:1:a", "host:1:b", "host:1:c"]
+    assert len(blobs(cache)) == 2
+
+    cache.lookup("a")                                           # b is now the least recently used
+    cache.store("d", validator(b"third"), b"third")
+    assert list(cache.entries) == ["host:1:a", "host:1:d"]      # dropping b freed nothing, c went too
+    assert blobs(cache) == sorted([validator(b"same!")["sha256"], validator(b"third")["sha256"]])
+
+def test_entry_edited_in_place_is_dropped(cache, tmp_path):
+    entry = cache.store("f", validator(b"hello"), b"hello")
+    target = str(tmp_path / "f")
+    cache.materialize(entry, target)
+    assert open(target, "rb").read() == b"hello"
+    with open(target, "r+b") as file:                           # the download is a hardlink to the blob
+        file.write(b"HELLO")
+    later = time.time() + 5
+    os.utime(target, (later, later))
+    assert cache.lookup("f") is None
+    assert cache.entries == {} and blobs(cache) == []
+
+def test_revalidate_keeps_the_contents(cache):
+    cache.store("f", validator(b"hello"), b"hello")
+    cache.revalidate("f", validator(b"hello", mtime=2))
+    assert cache.lookup("f")["validator"]["mtime"] == 2
+    cache.revalidate("f", validator(b"other", mtime=3))         # different contents need a new download
+    assert cache.lookup("f")["validator"]["mtime"] == 2
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    # A server-side Utility answering `get`s on one end of a socket pair, a caching client on the other
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "served").mkdir()
+    (tmp_path / "local").mkdir()
+    server, client = socket.socketpair()
+    client.settimeout(10)
+    utility = Utility()
+    utility.root = SessionRoot(str(tmp_path / "served"))
+    utility.local_working_directory = utility.root.chdir("")
+
+    def run():
+        while True:
+            try:
+                request = utility.recv_all(server, Request)
+            except (OSError, ValueError):
+                return
+            utility.send_all(server, utility.send_file(server, request))
+    threading.Thread(target=run, daemon=True).start()
+    receiver = Utility()
+    receiver.cache = DownloadCache(str(tmp_path / "cache"), max_bytes=1 << 20)
+    yield receiver, client
+    client.close()
+    server.close()
+    utility.root.close()
+
+def test_not_modified_round_trip(session, tmp_path):
+    receiver, client = session
+    served = tmp_path / "served" / "f"
+    served.write_bytes(b"contents" * 100)
+
+    def get():
+        return receiver.get(client, Request(cmd="get", remote_path="f", local_path=str(tmp_path / "local")))
+
+    assert get().code is None                                   # downloaded and stored
+    received = receiver.bytes_received
+    os.remove(tmp_path / "local" / "f")
+    assert get().code == "NOT_MODIFIED"
+    assert receiver.bytes_received - received < 800             # the contents were not sent again
+    assert (tmp_path / "local" / "f").read_bytes() == b"contents" * 100
+
+    later = time.time() + 5
+    os.utime(served, (later, later))                            # touched, same contents
+    assert get().code == "NOT_MODIFIED"
+    assert receiver.cache.lookup("f")["validator"]["mtime"] == os.stat(served).st_mtime_ns
+
+    served.write_bytes(b"changed")
+    assert get().code is None
+    assert (tmp_path / "local" / "f").read_bytes() == b"changed"
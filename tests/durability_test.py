@@ -0,0 +1,88 @@
+# Trey Rubino
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Model.Request import Request
+from inc.Utility.Durability import Durability, temporary_name
+from inc.Utility.SessionRoot import SessionRoot
+from inc.Utility.Utility import Utility
+
+@pytest.fixture(params=[None, "none", "fsync", "async"])
+def utility(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    utility = Utility()
+    utility.root = SessionRoot(str(tmp_path))
+    utility.local_working_directory = utility.root.chdir("")
+    if request.param:
+        utility.durability = Durability(request.param, group_files=2)
+    yield utility
+    if utility.durability:
+        utility.durability.flush()
+    utility.root.close()
+
+def put(utility, name: str, data: bytes):
+    request = Request(cmd="put", remote_path=".", local_path=name, size=len(data))
+    request.attach_binary_data(data)
+    return utility.receive_file(None, request)
+
+def leftovers(path) -> list:
+    return [name for name in os.listdir(path) if name.endswith(".part")]
+
+@pytest.mark.parametrize("name", ["x" * 255, "é" * 127, "short"])
+def test_temporary_names_fit_name_max(name):
+    temporary = temporary_name(name, f"{2 ** 22}.{10 ** 9}")
+    assert len(os.fsencode(temporary)) <= 255
+    assert temporary.startswith(".") and temporary.endswith(".part")
+    assert temporary_name(name, "1") != temporary_name(name + "y", "1")
+
+def test_durability_names_are_unique():
+    durability = Durability()
+    assert durability.temporary_name("f") != durability.temporary_name("f")
+
+def test_put_replaces_the_file(utility, tmp_path):
+    (tmp_path / "f.txt").write_bytes(b"old contents")
+    os.chmod(tmp_path / "f.txt", 0o640)
+    assert put(utility, "f.txt", b"new").status == "success"
+    assert (tmp_path / "f.txt").read_bytes() == b"new"
+    assert os.stat(tmp_path / "f.txt").st_mode & 0o777 == 0o640
+    assert leftovers(tmp_path) == []
+
+def test_put_with_the_longest_name(utility, tmp_path):
+    assert put(utility, "n" * 255, b"data").status == "success"
+    assert (tmp_path / ("n" * 255)).read_bytes() == b"data"
+    assert leftovers(tmp_path) == []
+
+def test_failed_put_leaves_the_old_version(utility, tmp_path):
+    (tmp_path / "d").mkdir()
+    (tmp_path / "d" / "keep").write_bytes(b"kept")
+    response = put(utility, "d", b"replacement")                # rename over a non-empty directory fails
+    assert response.status == "error" and response.code == "ERR_PUT_SERVER"
+    assert (tmp_path / "d" / "keep").read_bytes() == b"kept"
+    assert leftovers(tmp_path) == []
+
+def test_async_mode_syncs_in_groups(tmp_path):
+    dir_fd = os.open(str(tmp_path), os.O_RDONLY | os.O_DIRECTORY)
+    durability = Durability("async", group_files=3, group_window=60)
+    try:
+        for i in range(2):
+            name = durability.temporary_name("f")
+            fd = os.open(name, os.O_WRONLY | os.O_CREAT, dir_fd=dir_fd)
+            durability.commit(fd, dir_fd, name, f"f{i}", 0)
+            os.close(fd)
+        assert sorted(os.listdir(tmp_path)) == ["f0", "f1"]     # renamed, and acknowledged, before the sync
+        assert len(durability.pending) == 2
+        durability.flush()
+        assert durability.pending == [] and durability.oldest is None
+    finally:
+        os.close(dir_fd)
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        Durability("group")
@@ -0,0 +1,127 @@
+# Trey Rubino
+
+import sys
+import os
+import json
+import socket
+import threading
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.FileClient import (FileClient, FileClientError, NotFoundError, PermissionDeniedError, AlreadyExistsError,
+                            IsDirectoryError, ConnectionLostError)
+from inc.Model.Request import Request
+
+ENTRY = {"mode": "-rw-r--r--", "nlink": 1, "user": "u", "group": "g", "size": 100, "mtime": "2024-11-26 12:00", "name": "f"}
+
+class FailingServer:
+    """
+    Answers `pwd`, and fails the way a server can mid-request: `ls` is answered with a shutdown notice,
+    `get` announces 100 bytes and sends 10, and `cat` is not answered at all. Each ends the session.
+    """
+
+    def __init__(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        self.sessions = 0
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            self.sessions += 1
+            threading.Thread(target=self.session, args=(conn,), daemon=True).start()
+
+    def session(self, conn):
+        with conn:
+            buffer = b""
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                buffer += chunk
+                try:
+                    cmd = json.loads(buffer)["cmd"]
+                except ValueError:
+                    continue
+                buffer = b""
+                if cmd == "pwd":
+                    conn.sendall(json.dumps({"status": "success", "message": "/served"}).encode())
+                    continue
+                if cmd == "ls":
+                    conn.sendall(json.dumps({"status": "shutdown", "message": "Server shutting down"}).encode())
+                elif cmd == "get":
+                    conn.sendall(json.dumps({"status": "success", "contents": [ENTRY], "size": 100}).encode())
+                    conn.recv(4096)                             # the client's acknowledgement
+                    conn.sendall(b"x" * 10)
+                return
+
+    def close(self):
+        self.listener.close()
+
+@pytest.fixture
+def failing():
+    server = FailingServer()
+    yield server
+    server.close()
+
+@pytest.mark.parametrize("call, error", [(lambda client, _: client.ls("."), ConnectionLostError),
+                                         (lambda client, local: client.get("f", local), ConnectionLostError),
+                                         (lambda client, _: client.cat("f"), OSError)])
+def test_lost_connections_are_discarded(failing, tmp_path, call, error):
+    with FileClient("127.0.0.1", failing.port, max_connections=1, warm=1) as client:
+        with pytest.raises(error):
+            call(client, str(tmp_path))
+        assert client.opened == 0 and client.idle.empty()
+        assert client.pwd() == "/served"                        # on a new session
+        assert failing.sessions == 2
+    assert os.listdir(tmp_path) == []
+
+def test_cd_follows_on_every_pooled_connection(server):
+    os.makedirs(os.path.join(server.root, "a", "b"))
+    open(os.path.join(server.root, "a", "b", "f"), "w").close()
+    with FileClient("127.0.0.1", server.port, max_connections=2, warm=2) as client:
+        assert client.cd("a") == os.path.join(server.root, "a")
+        for path in ("b", "..", "b"):
+            with client.connection() as first, client.connection() as second:
+                assert first is not second
+                for connection in (first, second):
+                    assert connection.cwd == client.cwd
+                    assert connection.request(Request(cmd="pwd")).message == client.cwd
+            client.cd(path)
+        assert client.cwd == os.path.join(server.root, "a", "b")
+        assert [[entry.name for entry in client.ls()] for _ in range(2)] == [["f"], ["f"]]
+        assert client.opened == 2
+
+@pytest.mark.parametrize("call, error, code", [
+    (lambda client: client.ls("missing"), NotFoundError, "ERR_DIR_NOT_FOUND"),
+    (lambda client: client.cat("missing"), NotFoundError, "ERR_FILE_NOT_FOUND"),
+    (lambda client: client.rm("missing"), NotFoundError, "ERR_INVALID_PATH"),
+    (lambda client: client.cd("f"), NotFoundError, "ERR_INVALID_DIR"),
+    (lambda client: client.ls(".."), PermissionDeniedError, "ERR_PERMISSION_DENIED"),
+    (lambda client: client.cd("/"), PermissionDeniedError, "ERR_PERMISSION_DENIED"),
+    (lambda client: client.mkdir("d"), AlreadyExistsError, "ERR_DIR_EXISTS"),
+    (lambda client: client.rm("d"), IsDirectoryError, "ERR_IS_DIRECTORY"),
+    (lambda client: client.cat("d"), IsDirectoryError, "ERR_IS_DIRECTORY"),
+    (lambda client: client.get("d"), FileClientError, "ERR_GET_SERVER"),
+])
+def test_errors_are_typed(server, tmp_path, monkeypatch, call, error, code):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir(os.path.join(server.root, "d"))
+    open(os.path.join(server.root, "f"), "w").close()
+    with FileClient("127.0.0.1", server.port, max_connections=1, warm=1) as client:
+        connection = client.idle.queue[0]
+        with pytest.raises(error) as raised:
+            call(client)
+        assert raised.value.code == code
+        assert client.idle.queue == [connection]                # an error reply leaves the session in step
+        assert [entry.name for entry in client.ls()] == ["d", "f"]
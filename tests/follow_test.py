@@ -0,0 +1,118 @@
+# Trey Rubino
+
+import sys
+import os
+import io
+import time
+import signal
+import socket
+import argparse
+import threading
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import inc.Utility.Utility as utility_module
+from inc.client import Client
+from inc.Model.Request import Request
+from inc.Model.Response import Response
+from inc.Utility.FileWatcher import FileWatcher
+from inc.Utility.SessionRoot import SessionRoot
+from inc.Utility.Utility import Utility
+
+def wait_for(condition, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    # A server-side Utility that runs one `follow` and then answers one more request, on a socket pair
+    monkeypatch.chdir(tmp_path)
+    served = tmp_path / "served"
+    served.mkdir()
+    (served / "log").write_bytes(b"old\n")
+    watching = threading.Event()
+
+    class SignallingWatcher(FileWatcher):
+        def __init__(self, path):
+            super().__init__(path)
+            watching.set()                                      # the file is open at its end
+    monkeypatch.setattr(utility_module, "FileWatcher", SignallingWatcher)
+
+    server, client = socket.socketpair()
+    client.settimeout(10)
+    utility = Utility()
+    utility.root = SessionRoot(str(served))
+    utility.local_working_directory = utility.root.chdir("")
+    results = []
+
+    def run():
+        response = utility.follow(server, utility.recv_all(server, Request))
+        utility.send_all(server, response)
+        results.append(response)
+        if response.status == "success":
+            results.append(utility.recv_all(server, Request))
+            utility.send_all(server, utility.pwd())
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    yield served, client, watching, results
+    thread.join(10)
+    utility.root.close()
+    server.close()
+    client.close()
+
+def test_follow_streams_appends_and_rotation_until_cancelled(session, monkeypatch):
+    served, client, watching, results = session
+    output = io.TextIOWrapper(io.BytesIO())
+    monkeypatch.setattr(sys, "stdout", output)
+    follower = Client(argparse.Namespace(host="localhost", port="0"))
+
+    def drive():
+        watching.wait(10)
+        with open(served / "log", "ab") as file:
+            file.write(b"one\n")
+        wait_for(lambda: b"one\n" in output.buffer.getvalue())
+        os.rename(served / "log", served / "log.1")
+        with open(served / "log.1", "ab") as file:
+            file.write(b"rest\n")                               # still sent, before the new file
+        (served / "log").write_bytes(b"two\n")
+        wait_for(lambda: output.buffer.getvalue().endswith(b"two\n"))
+        os.kill(os.getpid(), signal.SIGINT)
+    driver = threading.Thread(target=drive, daemon=True)
+    driver.start()
+    response = follower.followCmd(client, Request(cmd="follow", remote_path="log"))
+    driver.join(10)
+    output.flush()
+    assert response.status == "success" and response.size == 0
+    assert output.buffer.getvalue() == b"one\nrest\ntwo\n\n"    # not what the file held before the follow
+
+    follower.utility.send_all(client, Request(cmd="pwd"))      # the session is still in step
+    assert follower.utility.recv_all(client, Response).message == str(served)
+    assert results[0].message == "Stopped following log." and results[1].cmd == "pwd"
+
+def test_follow_stops_on_a_refused_announcement(session):
+    served, client, watching, results = session
+    receiver = Utility()
+    receiver.send_all(client, Request(cmd="follow", remote_path="log"))
+    watching.wait(10)
+    with open(served / "log", "ab") as file:
+        file.write(b"new\n")
+    assert receiver.recv_message(client, Response).size == 4
+    receiver.send_all(client, Response(status="cancel", message="Follow cancelled"))
+    assert receiver.recv_message(client, Response).size == 0
+    receiver.send_all(client, Request(cmd="pwd"))
+    assert receiver.recv_all(client, Response).message == str(served)
+
+@pytest.mark.parametrize("path, code", [("missing", "ERR_FILE_NOT_FOUND"), (".", "ERR_IS_DIRECTORY"),
+                                        ("../outside", "ERR_PERMISSION_DENIED")])
+def test_follow_errors(session, path, code):
+    _, client, _, results = session
+    receiver = Utility()
+    receiver.send_all(client, Request(cmd="follow", remote_path=path))
+    assert receiver.recv_all(client, Response).code == code
+    assert results[0].code == code
@@ -0,0 +1,104 @@
+# Trey Rubino
+
+import sys
+import os
+import json
+import socket
+import asyncio
+import threading
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.AsyncFileClient import AsyncFileClient
+from inc.FileClient import FileClient, UnsupportedError
+from inc.Model.Request import Request
+from inc.Model.Handshake import PROTOCOL_VERSION, CAPABILITIES, agree, supported
+
+ORIGINAL_FIELDS = {"cmd", "options", "remote_path", "local_path", "size"}   # all the original server knows
+
+class OriginalServer:
+    """
+    Stands in for a server from before the handshake: each session reads JSON requests and, like
+    `Request(**fields)` there, drops the connection on a field it does not know. It answers `pwd` and `ls`.
+    """
+
+    def __init__(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        self.requests = []
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.session, args=(conn,), daemon=True).start()
+
+    def session(self, conn):
+        with conn:
+            buffer = b""
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                buffer += chunk
+                try:
+                    fields = json.loads(buffer)
+                except ValueError:
+                    continue
+                buffer = b""
+                self.requests.append(fields)
+                if not fields.keys() <= ORIGINAL_FIELDS:
+                    return
+                if fields["cmd"] == "exit":
+                    return
+                reply = {"status": "success", "message": "/served"} if fields["cmd"] == "pwd" else \
+                        {"status": "success", "contents": []}
+                conn.sendall(json.dumps(reply).encode())
+
+    def close(self):
+        self.listener.close()
+
+@pytest.fixture
+def original():
+    server = OriginalServer()
+    yield server
+    server.close()
+
+def test_agree():
+    assert agree(PROTOCOL_VERSION + 5, list(CAPABILITIES) + ["future"]) == (PROTOCOL_VERSION, list(CAPABILITIES))
+    assert agree(None, None) == (1, [])
+    assert agree(2, ["follow", "batch"]) == (2, ["batch", "follow"])
+
+def test_supported():
+    assert supported(None, "cp")                                # no handshake, no opinion
+    assert supported(set(), "ls")
+    assert not supported(set(), "cp") and not supported({"batch"}, "follow")
+    assert supported({"copy"}, "mv")
+
+def test_file_client_falls_back_without_the_hello(original):
+    with FileClient("127.0.0.1", original.port, max_connections=2, warm=2) as client:
+        assert client.legacy
+        assert client.ls(".") == []
+        with pytest.raises(UnsupportedError):
+            client.cp("a", "b")
+        assert [response.status for response in client.batch([Request(cmd="pwd"), Request(cmd="ls")])] == ["success"] * 2
+    hellos = [fields for fields in original.requests if "protocol" in fields]
+    assert len(hellos) == 1                                     # later connections skip the hello
+
+def test_async_client_falls_back_without_the_hello(original):
+    async def run():
+        async with AsyncFileClient("127.0.0.1", original.port, max_connections=2) as client:
+            assert await client.ls(".") == []
+            with pytest.raises(UnsupportedError):
+                await client.mv("a", "b")
+            return client.legacy
+    assert asyncio.run(run())
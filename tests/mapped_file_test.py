@@ -0,0 +1,148 @@
+# Trey Rubino
+
+import sys
+import os
+import time
+import socket
+import threading
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Model.Request import Request
+from inc.Model.Response import Response
+from inc.Utility.MappedFile import MappedFile, MMAP_THRESHOLD, MMAP_SETTLE
+from inc.Utility.SessionRoot import SessionRoot
+from inc.Utility.Utility import Utility
+
+def write(path, data: bytes, age: float) -> int:
+    path.write_bytes(data)
+    then = time.time() - age
+    os.utime(path, (then, then))
+    return os.open(str(path), os.O_RDONLY)
+
+@pytest.fixture
+def data():
+    return os.urandom(MMAP_THRESHOLD + 12345)
+
+def test_settled_large_file_is_mapped(tmp_path, data):
+    fd = write(tmp_path / "f", data, MMAP_SETTLE + 60)
+    try:
+        with MappedFile(fd) as payload:
+            assert payload.map is not None
+            assert len(payload) == len(data) and payload.view == data
+    finally:
+        os.close(fd)
+
+@pytest.mark.parametrize("size, age", [(100, 3600), (0, 3600), (MMAP_THRESHOLD + 1, 0)])
+def test_small_or_recently_changed_file_is_read(tmp_path, size, age):
+    data = os.urandom(size)
+    fd = write(tmp_path / "f", data, age)
+    try:
+        with MappedFile(fd) as payload:
+            assert payload.map is None and payload.view == data
+    finally:
+        os.close(fd)
+
+def test_recheck_keeps_an_unchanged_mapping(tmp_path, data):
+    fd = write(tmp_path / "f", data, 3600)
+    with MappedFile(fd) as payload:
+        os.close(fd)                                            # the mapping does not need the caller's descriptor
+        payload.recheck()
+        assert payload.map is not None and payload.view == data
+
+def test_recheck_copies_a_file_changed_after_mapping(tmp_path, data):
+    fd = write(tmp_path / "f", data, 3600)
+    try:
+        with MappedFile(fd) as payload:
+            with open(tmp_path / "f", "r+b") as file:
+                file.write(b"changed")
+            payload.recheck()
+            assert payload.map is None
+            assert payload.view == b"changed" + data[7:]
+            with open(tmp_path / "f", "r+b") as file:
+                file.truncate(0)                                # a copy cannot fault
+            assert bytes(payload.view[-5:]) == data[-5:]
+    finally:
+        os.close(fd)
+
+def test_recheck_refuses_a_truncated_file(tmp_path, data):
+    fd = write(tmp_path / "f", data, 3600)
+    try:
+        with MappedFile(fd) as payload:
+            with open(tmp_path / "f", "r+b") as file:
+                file.truncate(1000)
+            with pytest.raises(OSError):
+                payload.recheck()
+    finally:
+        os.close(fd)
+
+def truncate_after_ack(utility, path, obj_type):
+    # Shrinks the file as soon as `utility` has received the acknowledgement of its size
+    receive = utility.recv_all
+
+    def recv_all(conn, expected):
+        obj = receive(conn, expected)
+        if expected is obj_type:
+            with open(path, "r+b") as file:
+                file.truncate(1000)
+        return obj
+    utility.recv_all = recv_all
+
+@pytest.fixture
+def sockets():
+    server, client = socket.socketpair()
+    server.settimeout(10)                                       # a stream out of step fails the test instead of hanging it
+    client.settimeout(10)
+    yield server, client
+    server.close()
+    client.close()
+
+def test_get_of_a_file_truncated_after_the_ack_closes_the_connection(tmp_path, monkeypatch, sockets, data):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "served").mkdir()
+    (tmp_path / "local").mkdir()
+    os.close(write(tmp_path / "served" / "f", data, 3600))
+    server, client = sockets
+    utility = Utility()
+    utility.root = SessionRoot(str(tmp_path / "served"))
+    utility.local_working_directory = utility.root.chdir("")
+    truncate_after_ack(utility, tmp_path / "served" / "f", Response)
+    errors = []
+
+    def run():
+        try:
+            utility.send_file(server, utility.recv_all(server, Request))
+        except ConnectionError as e:
+            errors.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    response = Utility().get(client, Request(cmd="get", remote_path="f", local_path=str(tmp_path / "local")))
+    thread.join(10)
+    utility.root.close()
+    assert response.code == "ERR_GET_CLIENT"
+    assert len(errors) == 1                                     # no error reply the client would read as payload
+    assert client.recv(1) == b""
+    assert os.listdir(tmp_path / "local") == []
+
+def test_put_of_a_file_truncated_after_the_ack_closes_the_connection(tmp_path, sockets, data):
+    os.close(write(tmp_path / "f", data, 3600))
+    server, client = sockets
+    errors = []
+
+    def run():
+        try:
+            Utility().recv_all(server, Request)
+        except ConnectionError as e:
+            errors.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    sender = Utility()
+    truncate_after_ack(sender, tmp_path / "f", Response)
+    response = sender.put(client, Request(cmd="put", remote_path=".", local_path="f"), source=str(tmp_path / "f"))
+    thread.join(10)
+    assert response.code == "ERR_PUT_CLIENT"
+    assert len(errors) == 1                                     # the server never takes a later message for data
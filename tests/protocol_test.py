@@ -0,0 +1,60 @@
+# Trey Rubino
+
+import sys
+import os
+import re
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Model.Codec import CODECS
+from inc.Model.CustomProtocol import CustomProtocol
+from inc.Model.Request import Request
+from inc.Model.Response import Response, Content, CODES
+
+def test_models_are_slotted():
+    request = Request(cmd="ls")
+    assert not hasattr(request, "__dict__")
+    with pytest.raises(AttributeError):
+        request.unknown = 1
+    request.attach_binary_data(b"")                             # `binary_data` has its own slot
+    assert request.get_binary_data() == b""
+
+def test_to_wire_leaves_out_none():
+    assert Request(cmd="ls", remote_path="d").to_wire() == {"cmd": "ls", "options": [], "remote_path": "d", "size": 0}
+
+def test_from_wire_ignores_unknown_fields():
+    request = Request.from_wire({"cmd": "ls", "remote_path": "d", "added_later": True})
+    assert request == Request(cmd="ls", remote_path="d")
+
+def test_json_decode_matches_from_wire():
+    request = Request(cmd="put", remote_path=".", local_path="f", size=5, trace_id="t")
+    assert CustomProtocol.decode(request.encode(), Request) == request
+
+def test_contents_from_wire():
+    entry = Content(mode="drwxr-xr-x", nlink=2, user="u", group="g", size=4096, mtime="2024-11-26 12:00", name="d")
+    assert Content.list_from_wire([entry.to_wire()]) == [entry]
+    assert Response.from_wire({"status": "success", "contents": [entry.to_wire()]}).contents == [entry]
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_nested_requests_round_trip(name):
+    codec = CODECS[name]
+    batch = Request(cmd="batch", requests=[Request(cmd="mkdir", remote_path="d"), Request(cmd="cd", remote_path="d"),
+                                           Request(cmd="ls", options=["-l"])])
+    fields, _ = codec.decode(codec.encode(batch))
+    decoded = Request.from_dict(fields, Request)
+    assert decoded == batch
+    assert all(isinstance(item, Request) for item in decoded.requests)
+
+def test_every_code_in_use_is_listed():
+    used = set()
+    for directory in ("inc", "src"):
+        for parent, _, names in os.walk(os.path.join(project_root, directory)):
+            for name in names:
+                if name.endswith(".py"):
+                    with open(os.path.join(parent, name)) as file:
+                        used.update(re.findall(r'"((?:ERR|NOT)_[A-Z_]+)"', file.read()))
+    assert used and used <= set(CODES)
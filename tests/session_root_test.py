@@ -0,0 +1,116 @@
+# Trey Rubino
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Utility import SessionRoot as session_root
+from inc.Model.Request import Request
+from inc.Utility.SessionRoot import SessionRoot, walk_beneath
+from inc.Utility.Utility import Utility
+
+@pytest.fixture(params=["openat2", "walk"])
+def root(request, tmp_path, monkeypatch):
+    # Every containment test runs against the kernel check and against the user-space walk
+    if request.param == "walk":
+        monkeypatch.setattr(session_root, "_openat2_supported", False)
+    served = tmp_path / "served"
+    (served / "sub").mkdir(parents=True)
+    (served / "a.txt").write_bytes(b"inside")
+    (tmp_path / "secret").write_bytes(b"outside")
+    os.symlink("../secret", served / "escape")
+    os.symlink(str(tmp_path / "secret"), served / "absolute")
+    os.symlink("../a.txt", served / "sub" / "back")
+    os.symlink("..", served / "sub" / "up")
+    session = SessionRoot(str(served))
+    yield session
+    session.close()
+
+def read(session: SessionRoot, path: str) -> bytes:
+    fd = session.open(path)
+    try:
+        return os.read(fd, 100)
+    finally:
+        os.close(fd)
+
+def test_opens_paths_inside_the_root(root):
+    assert read(root, "a.txt") == b"inside"
+    assert read(root, "sub/../a.txt") == b"inside"
+    assert read(root, os.path.join(root.path, "a.txt")) == b"inside"
+
+def test_refuses_dot_dot_above_the_root(root):
+    with pytest.raises(PermissionError):
+        root.open("../secret")
+    with pytest.raises(PermissionError):
+        root.open("sub/../../secret")
+
+def test_refuses_absolute_paths_outside_the_root(root):
+    with pytest.raises(PermissionError):
+        root.open(os.path.join(os.path.dirname(root.path), "secret"))
+    with pytest.raises(PermissionError):
+        root.open(root.path + "-sibling/file")
+
+def test_refuses_symlinks_leaving_the_root(root):
+    with pytest.raises(PermissionError):
+        root.open("escape")
+    with pytest.raises(PermissionError):
+        root.open("absolute")
+    with pytest.raises(PermissionError):
+        root.open("sub/up/escape")
+
+def test_follows_symlinks_that_stay_inside(root):
+    assert read(root, "sub/back") == b"inside"
+    assert read(root, "sub/up/a.txt") == b"inside"
+
+def test_symlink_may_leave_the_current_directory_but_not_the_root(root):
+    root.chdir("sub")
+    assert root.working_directory == os.path.join(root.path, "sub")
+    assert read(root, "back") == b"inside"
+    assert read(root, "../a.txt") == b"inside"
+    with pytest.raises(PermissionError):
+        root.open("../../secret")
+    with pytest.raises(PermissionError):
+        root.chdir("../..")
+
+def test_parent_does_not_follow_the_last_component(root):
+    fd, name = root.parent("escape")
+    try:
+        assert name == "escape"
+        assert os.readlink(name, dir_fd=fd) == "../secret"
+    finally:
+        os.close(fd)
+    with pytest.raises(PermissionError):
+        root.parent(".")
+
+def test_cat_through_the_root(root):
+    utility = Utility()
+    utility.root = root
+    utility.local_working_directory = root.chdir("")
+    assert utility.cat(Request(cmd="cat", remote_path="sub/back")).message == "inside"
+    assert utility.cat(Request(cmd="cat", remote_path="sub")).code == "ERR_IS_DIRECTORY"
+    assert utility.cat(Request(cmd="cat", remote_path="escape")).code == "ERR_PERMISSION_DENIED"
+
+def test_walk_beneath_directly(tmp_path):
+    (tmp_path / "dir" / "deep").mkdir(parents=True)
+    (tmp_path / "dir" / "deep" / "file").write_bytes(b"data")
+    os.symlink("deep/file", tmp_path / "dir" / "link")
+    os.symlink("loop", tmp_path / "dir" / "loop")
+    dir_fd = os.open(str(tmp_path / "dir"), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        fd = walk_beneath(dir_fd, "deep/../link", os.O_RDONLY)
+        assert os.read(fd, 10) == b"data"
+        os.close(fd)
+        fd = walk_beneath(dir_fd, "created", os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        os.close(fd)
+        assert (tmp_path / "dir" / "created").exists()
+        with pytest.raises(PermissionError):
+            walk_beneath(dir_fd, "..", os.O_RDONLY)
+        with pytest.raises(OSError):
+            walk_beneath(dir_fd, "loop", os.O_RDONLY)
+    finally:
+        os.close(dir_fd)
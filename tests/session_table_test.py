@@ -0,0 +1,87 @@
+# Trey Rubino
+
+import sys
+import os
+import struct
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Model.Connection import Connection
+from inc.Utility.SessionTable import SessionTable, SLOT_SIZE, SEQ_FORMAT
+
+UPDATES = 20000
+
+@pytest.fixture
+def table():
+    table = SessionTable(slots=2)
+    yield table
+    table.memory.close()
+
+def connection(command: str = None, directory: str = None) -> Connection:
+    connection = Connection(("10.0.0.1", 5000), 7)
+    connection.update_connection(command=command, pwd=directory)
+    return connection
+
+def test_snapshot_of_an_open_session(table):
+    slot = table.acquire()
+    assert table.snapshot() == {}                               # reserved slots are not sessions yet
+    table.open(slot, connection())
+    table.update(slot, connection("ls", "/served/d"), 10, 2000)
+    session = table.snapshot()[os.getpid()]
+    assert session["ip_address"] == ["10.0.0.1", 5000]
+    assert (session["last_command"], session["current_working_directory"]) == ("ls", "/served/d")
+    assert (session["commands"], session["bytes_in"], session["bytes_out"]) == (1, 10, 2000)
+    assert session["seq"] % 2 == 0
+
+def test_reaped_slots_are_reused(table):
+    first, second = table.acquire(), table.acquire()
+    assert (first, second) == (0, 1)
+    assert table.acquire() is None                              # full
+    table.assign(first, 101)
+    table.assign(second, 102)
+    table.open(first, connection())
+    table.reap(101)
+    table.reap(999)                                             # not a worker
+    assert table.snapshot() == {} and table.owners == {102: 1}
+    assert table.acquire() == first
+
+def test_slot_of_a_writer_that_died_mid_write(table):
+    slot = table.acquire()
+    table.assign(slot, 101)
+    table.open(slot, connection())
+    seq = struct.unpack_from(SEQ_FORMAT, table.memory, slot * SLOT_SIZE)[0]
+    struct.pack_into(SEQ_FORMAT, table.memory, slot * SLOT_SIZE, seq + 1)   # left odd, as by a killed worker
+    assert table.snapshot() == {}
+    table.reap(101)
+    assert struct.unpack_from(SEQ_FORMAT, table.memory, slot * SLOT_SIZE)[0] % 2 == 0
+    assert table.acquire() == slot
+
+def test_snapshot_never_sees_a_torn_update(table):
+    slot = table.acquire()
+    pid = os.fork()
+    if pid == 0:                                                # the worker, writing as fast as it can
+        try:
+            table.open(slot, connection())
+            for i in range(1, UPDATES + 1):
+                table.update(slot, connection(str(i % 10), str(i) * (i % 50)), i, 2 * i)
+        finally:
+            os._exit(0)
+    table.assign(slot, pid)
+    seen = 0
+    while os.waitpid(pid, os.WNOHANG) == (0, 0):
+        session = table.snapshot().get(pid)
+        if session is None or session["commands"] == 0:
+            continue
+        i = session["commands"]
+        assert (session["bytes_in"], session["bytes_out"]) == (i, 2 * i)
+        assert session["last_command"] == str(i % 10)
+        assert (session["current_working_directory"] or "") == (str(i) * (i % 50))[:256]
+        seen += 1
+    assert seen > 0
+    assert table.snapshot()[pid]["commands"] == UPDATES
+    table.reap(pid)
+    assert table.snapshot() == {}
@@ -0,0 +1,157 @@
+# Trey Rubino
+
+import sys
+import os
+import socket
+import threading
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import inc.Utility.Throttle as throttle_module
+from inc.Model.Request import Request
+from inc.Model.Response import Response
+from inc.Utility.SessionRoot import SessionRoot
+from inc.Utility.Throttle import charge, TokenBucket, SharedBuckets, Throttle, THROTTLE_CHUNK
+from inc.Utility.Utility import Utility
+
+class FakeClock:
+    """
+    Stands in for the `time` module in Throttle.py: `sleep` advances `monotonic` instead of blocking.
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(throttle_module, "time", clock)
+    return clock
+
+def test_charge():
+    full_at, wait = charge(0.0, 250, 100.0, rate=1000, burst=250)
+    assert (full_at, wait) == pytest.approx((100.25, 0.0))      # an empty history starts with a full bucket
+    full_at, wait = charge(full_at, 250, 100.0, rate=1000, burst=250)
+    assert (full_at, wait) == pytest.approx((100.5, 0.25))      # reserved now, usable once refilled
+    full_at, wait = charge(full_at, 100, 101.0, rate=1000, burst=250)
+    assert full_at == pytest.approx(101.1) and wait < 0         # refilled while idle
+
+def test_token_bucket_queues_reservations():
+    bucket = TokenBucket(rate=1000, burst=500)
+    assert [bucket.reserve(500, 10.0) for _ in range(3)] == pytest.approx([0.0, 0.5, 1.0])
+    assert bucket.reserve(500, 12.0) == pytest.approx(0.0)
+
+def test_shared_buckets_take_the_stricter_limit():
+    shared = SharedBuckets(global_rate=10000, ip_rate=1000, burst=0.5, slots=4)
+    assert shared.reserve(b"10.0.0.1", 500, 10.0) == pytest.approx(0.0)
+    assert shared.reserve(b"10.0.0.1", 1000, 10.0) == pytest.approx(1.0)      # the IP's bucket
+    assert shared.reserve(b"10.0.0.2", 500, 10.0) == pytest.approx(0.0)       # another IP, same global bucket
+    assert shared.reserve(b"10.0.0.2", 5000, 10.0) == pytest.approx(5.0)
+    assert shared.reserve(b"10.0.0.3", 3000, 10.0) == pytest.approx(2.5)      # the global bucket
+    shared.memory.close()
+
+def test_shared_buckets_reuse_refilled_slots():
+    shared = SharedBuckets(ip_rate=1000, burst=1, slots=1)
+    shared.reserve(b"10.0.0.1", 2000, 10.0)
+    assert shared.reserve(b"10.0.0.2", 1000, 10.0) == pytest.approx(2.0)      # hashed onto the busy slot
+    assert shared.reserve(b"10.0.0.3", 1000, 20.0) == pytest.approx(0.0)      # refilled, claimed afresh
+    shared.memory.close()
+
+def test_shared_buckets_are_shared_across_fork():
+    shared = SharedBuckets(global_rate=1000, burst=1)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            shared.reserve(b"10.0.0.1", 3000, 10.0)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert shared.reserve(b"10.0.0.2", 1000, 10.0) == pytest.approx(3.0)
+    shared.memory.close()
+
+def test_held_lock_is_skipped(monkeypatch):
+    monkeypatch.setattr(throttle_module, "LOCK_TIMEOUT", 0.05)
+    shared = SharedBuckets(global_rate=1000, burst=1)
+    shared.lock.acquire()                                       # as if a worker died holding it
+    try:
+        assert shared.reserve(b"10.0.0.1", 10000, 10.0) == 0.0
+    finally:
+        shared.lock.release()
+    assert shared.reserve(b"10.0.0.1", 1000, 10.0) == pytest.approx(0.0)       # nothing was charged meanwhile
+    shared.memory.close()
+
+def test_sendall_paces_each_chunk(clock):
+    throttle = Throttle(("10.0.0.1", 5000), session_rate=THROTTLE_CHUNK)
+    data = os.urandom(4 * THROTTLE_CHUNK)
+    server, client = socket.socketpair()
+    received = bytearray()
+
+    def read():
+        for chunk in iter(lambda: client.recv(65536), b""):
+            received.extend(chunk)
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    throttle.sendall(server, data)
+    server.close()
+    reader.join(10)
+    client.close()
+    assert bytes(received) == data
+    assert clock.slept == pytest.approx([0.75, 1.0, 1.0, 1.0])   # a quarter second of burst, then one chunk a second
+    assert throttle.waited == pytest.approx(3.75)
+
+class CountingThrottle(Throttle):
+    def __init__(self):
+        super().__init__("10.0.0.1", session_rate=1)
+        self.charged = []
+
+    def wait(self, size: int) -> None:
+        self.charged.append(size)
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "served").mkdir()
+    (tmp_path / "served" / "f").write_bytes(b"a" * (3 * THROTTLE_CHUNK + 1))
+    server, client = socket.socketpair()
+    client.settimeout(10)
+    utility = Utility()
+    utility.root = SessionRoot(str(tmp_path / "served"))
+    utility.local_working_directory = utility.root.chdir("")
+    utility.throttle = CountingThrottle()
+    yield utility, server, client
+    utility.root.close()
+    server.close()
+    client.close()
+
+def test_only_payloads_are_throttled(session, tmp_path):
+    utility, server, client = session
+    receiver = Utility()
+
+    for cmd in ("ls", "pwd", "cat"):
+        receiver.send_all(client, Request(cmd=cmd, remote_path="f"))
+        request = utility.recv_all(server, Request)
+        utility.send_all(server, utility.pwd() if cmd == "pwd" else getattr(utility, cmd)(request))
+        assert receiver.recv_all(client, Response).status == "success"
+    assert utility.throttle.charged == []
+
+    def serve():
+        request = utility.recv_all(server, Request)
+        utility.send_all(server, utility.send_file(server, request))
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    response = receiver.get(client, Request(cmd="get", remote_path="f", local_path=str(tmp_path)))
+    thread.join(10)
+    assert response.status == "success"
+    assert utility.throttle.charged == [THROTTLE_CHUNK] * 3 + [1]
@@ -0,0 +1,110 @@
+# Trey Rubino
+
+import sys
+import os
+import socket
+import threading
+
+import pytest
+
+# Add the project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from inc.Model.Request import Request
+from inc.Model.Response import Response
+from inc.Utility.SessionRoot import SessionRoot
+from inc.Utility.Utility import Utility
+from inc.Utility.WriteBehind import WriteBehind
+
+BUFFER = 64 * 1024
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    # A server-side Utility on one end of a socket pair and a client-side one on the other
+    monkeypatch.chdir(tmp_path)
+    served = tmp_path / "served"
+    served.mkdir()
+    server, client = socket.socketpair()
+    utility = Utility()
+    utility.root = SessionRoot(str(served))
+    utility.local_working_directory = utility.root.chdir("")
+    utility.write_behind = WriteBehind(buffers=2, buffer_size=BUFFER)
+    yield utility, server, client
+    utility.root.close()
+    server.close()
+    client.close()
+
+def serve(utility, server, handle) -> tuple:
+    """
+    Runs `handle(request)` for the next request in a thread, then reads one more request, which shows
+    whether the stream is still in step. Returns the thread and a list holding [response, next request]
+    once it is joined.
+    """
+    results = []
+
+    def run():
+        request = utility.recv_all(server, Request)
+        response = handle(request)
+        utility.send_all(server, response)
+        results.extend([response, utility.recv_all(server, Request)])
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, results
+
+def upload(client, local, name: str, remote: str = ".") -> Response:
+    sender = Utility()
+    response = sender.put(client, Request(cmd="put", remote_path=remote, local_path=name), source=str(local))
+    sender.send_all(client, Request(cmd="pwd"))
+    return response
+
+@pytest.mark.parametrize("size", [1000, BUFFER, BUFFER + 1, 5 * BUFFER + 17])
+def test_put_is_written_whole(session, tmp_path, size):
+    utility, server, client = session
+    data = os.urandom(size)
+    (tmp_path / "local").write_bytes(data)
+    thread, results = serve(utility, server, lambda request: utility.receive_file(server, request))
+    assert upload(client, tmp_path / "local", "f").status == "success"
+    thread.join(10)
+    assert results[0].status == "success" and results[1].cmd == "pwd"
+    assert (tmp_path / "served" / "f").read_bytes() == data
+    assert os.listdir(tmp_path / "served") == ["f"]
+    assert utility.pending_payload == 0
+
+def test_large_put_is_left_on_the_socket(session, tmp_path):
+    utility, server, client = session
+    (tmp_path / "local").write_bytes(os.urandom(3 * BUFFER))
+    seen = []
+
+    def handle(request):
+        seen.append((request.get_binary_data(), utility.pending_payload))
+        return utility.receive_file(server, request)
+    thread, results = serve(utility, server, handle)
+    upload(client, tmp_path / "local", "f")
+    thread.join(10)
+    assert seen == [(b"", 3 * BUFFER)]                         # nothing read yet
+
+def test_refused_put_is_discarded(session, tmp_path):
+    utility, server, client = session
+    (tmp_path / "local").write_bytes(os.urandom(4 * BUFFER))
+
+    def refuse(request):
+        utility.discard_payload(server)                         # as the server does for a denied path
+        return Response(status="error", message="Permission denied", code="ERR_PERMISSION_DENIED")
+    thread, results = serve(utility, server, refuse)
+    assert upload(client, tmp_path / "local", "f").code == "ERR_PERMISSION_DENIED"
+    thread.join(10)
+    assert results[1].cmd == "pwd"
+    assert os.listdir(tmp_path / "served") == []
+
+def test_failed_put_keeps_the_stream_in_step(session, tmp_path):
+    utility, server, client = session
+    (tmp_path / "served" / "d").mkdir()
+    (tmp_path / "served" / "d" / "keep").write_bytes(b"kept")
+    (tmp_path / "local").write_bytes(os.urandom(4 * BUFFER))
+    thread, results = serve(utility, server, lambda request: utility.receive_file(server, request))
+    assert upload(client, tmp_path / "local", "d").code == "ERR_PUT_SERVER"   # rename over a non-empty directory fails
+    thread.join(10)
+    assert results[1].cmd == "pwd"
+    assert sorted(os.listdir(tmp_path / "served")) == ["d"]
+    assert (tmp_path / "served" / "d" / "keep").read_bytes() == b"kept"